@@ -1,11 +1,29 @@
+import importlib.util, threading
 import numpy as np
 import cv2
 
-try:
-    from deepface import DeepFace
-    HAS_DEEPFACE = True
-except ImportError:
-    HAS_DEEPFACE = False
+# DeepFace arrastra TensorFlow (varios segundos de import): solo miro si está
+# instalado y lo importo la primera vez que se pide una emoción.
+HAS_DEEPFACE = importlib.util.find_spec("deepface") is not None
+DeepFace = None
+_deepface_lock = threading.Lock()
+
+def _cargar_deepface():
+    global DeepFace, HAS_DEEPFACE
+    if DeepFace is None and HAS_DEEPFACE:
+        with _deepface_lock:
+            if DeepFace is None:
+                try:
+                    from deepface import DeepFace as _DF
+                    DeepFace = _DF
+                except ImportError:
+                    HAS_DEEPFACE = False
+    return DeepFace
+
+def precargar_emocion():
+    """Importa DeepFace en segundo plano para que la primera emoción no congele el video."""
+    if HAS_DEEPFACE and DeepFace is None:
+        threading.Thread(target=_cargar_deepface, name="deepface-import", daemon=True).start()
 
 def get_head_pose(shape, w, h):
     """
@@ -82,6 +100,10 @@ def get_emotion(name, face_img):
     """
     if not HAS_DEEPFACE:
         return "N/A (Instalar deepface)"
+    if DeepFace is None:
+        # Si todavía se está importando en segundo plano, no bloqueo el bucle
+        if _deepface_lock.locked() or _cargar_deepface() is None:
+            return "-"
     
     # Filtro: Si la imagen es muy pequeña, no analizar (ahorra CPU)
     if face_img.shape[0] < 40 or face_img.shape[1] < 40:
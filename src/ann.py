@@ -0,0 +1,210 @@
+# src/ann.py
+# Índice aproximado (IVF) para galerías grandes, solo con NumPy.
+# Con k-means se reparten los encodings en NLIST listas (una por centroide). Para
+# una cara se buscan los NPROBE centroides más cercanos y solo se recorren esas
+# listas; los mejores RERANK candidatos pasan a la distancia exacta en float64
+# (Gallery.nearest). Con 500k encodings y los valores por defecto se recorren unos
+# pocos miles de vectores por cara en vez de 500k.
+#
+# El índice se guarda junto a la galería (models/embeddings_mtcnn.ivf.npz) con la
+# cantidad de encodings y un hash de los nombres: si no coincide con la galería
+# cargada se ignora. Galerías con menos de ANN_MIN encodings siguen con la búsqueda
+# exacta.
+#
+# Uso:
+#   python -m src.ann --build                     # construye para models/embeddings_mtcnn.pkl
+#   python -m src.ann --sample 2000 --nprobe 16   # recall y tiempo contra fuerza bruta
+
+import argparse, hashlib, os, time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+MODEL_PATH = Path("models/embeddings_mtcnn.pkl")
+ANN_MIN = 20000         # Por debajo, la búsqueda exacta ya es barata
+NPROBE = 16             # Listas recorridas por cara
+RERANK = 32             # Candidatos que pasan a la distancia exacta
+KMEANS_ITERS = 12
+KMEANS_PER_LIST = 50    # Muestra para entrenar k-means: NLIST * esto
+ASSIGN_BLOCK = 16384
+
+def default_nlist(n: int) -> int:
+    return int(max(1, min(n, round(4 * np.sqrt(n)))))
+
+def names_hash(names: List[str]) -> str:
+    return hashlib.sha1("\n".join(names).encode("utf-8")).hexdigest()
+
+def index_path_for(model: Path) -> Path:
+    # embeddings_mtcnn.pkl y embeddings_mtcnn.int8.npz comparten el mismo índice
+    model = Path(model)
+    return model.parent / (model.name.split(".")[0] + ".ivf.npz")
+
+def _assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Centroide más cercano de cada fila, por bloques (memoria O(block × nlist))."""
+    cn = (centroids ** 2).sum(axis=1)
+    out = np.empty(len(x), dtype=np.int32)
+    for a in range(0, len(x), ASSIGN_BLOCK):
+        xb = x[a:a+ASSIGN_BLOCK]
+        out[a:a+ASSIGN_BLOCK] = np.argmin(cn[None, :] - 2.0 * xb @ centroids.T, axis=1)
+    return out
+
+def kmeans(x: np.ndarray, k: int, iters: int = KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        lab = _assign(x, centroids)
+        counts = np.bincount(lab, minlength=k)
+        sums = np.stack([np.bincount(lab, weights=x[:, j], minlength=k) for j in range(x.shape[1])], axis=1)
+        vacios = counts == 0
+        centroids[~vacios] = sums[~vacios] / counts[~vacios, None]
+        if vacios.any():  # Lista vacía: la reubico en un punto al azar
+            centroids[vacios] = x[rng.choice(len(x), int(vacios.sum()), replace=False)]
+    return centroids
+
+class IVFIndex:
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray,
+                 vecs: np.ndarray, n: int, names_sha: str, nprobe: int = NPROBE):
+        self.centroids = centroids.astype(np.float32)
+        self.order = order            # Posición en la galería de cada fila de `vecs`
+        self.offsets = offsets        # Lista i = vecs[offsets[i]:offsets[i+1]]
+        self.vecs = vecs.astype(np.float32)
+        self.sq = (self.vecs ** 2).sum(axis=1)
+        self.cn = (self.centroids ** 2).sum(axis=1)
+        self.n = int(n)
+        self.names_sha = names_sha
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.centroids, self.order, self.offsets, self.vecs, self.sq, self.cn))
+
+    @classmethod
+    def build(cls, encodings: np.ndarray, names: List[str], nlist: Optional[int] = None,
+              seed: int = 0) -> "IVFIndex":
+        x = np.asarray(encodings, dtype=np.float32)
+        nlist = nlist or default_nlist(len(x))
+        rng = np.random.default_rng(seed)
+        sample = x if len(x) <= nlist * KMEANS_PER_LIST else x[rng.choice(len(x), nlist * KMEANS_PER_LIST, replace=False)]
+        centroids = kmeans(sample, nlist, seed=seed)
+        lab = _assign(x, centroids)
+        order = np.argsort(lab, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(lab, minlength=nlist))]).astype(np.int64)
+        return cls(centroids, order, offsets, x[order], len(x), names_hash(names))
+
+    def candidates(self, q: np.ndarray, k: int = RERANK, nprobe: Optional[int] = None) -> np.ndarray:
+        """Índices en la galería de los k candidatos más cercanos dentro de las listas sondeadas."""
+        q = np.asarray(q, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        dc = self.cn - 2.0 * (self.centroids @ q)
+        probe = np.argpartition(dc, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+        rows = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in probe])
+        if rows.size == 0: return rows
+        d = self.sq[rows] - 2.0 * (self.vecs[rows] @ q)
+        if rows.size > k:
+            rows = rows[np.argpartition(d, k - 1)[:k]]
+        return self.order[rows]
+
+    def save(self, path: Path):
+        path = Path(path)
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez(tmp, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                 vecs=self.vecs, n=self.n, names_sha=np.asarray(self.names_sha))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFIndex":
+        with np.load(path) as z:
+            return cls(z["centroids"], z["order"], z["offsets"], z["vecs"], int(z["n"]), str(z["names_sha"]))
+
+def load_for(model: Path, gallery) -> Optional[IVFIndex]:
+    """El índice de esta galería, o None si no hay, es chica o el índice es de otra versión."""
+    path = index_path_for(model)
+    if len(gallery) < ANN_MIN or not path.exists():
+        return None
+    try:
+        idx = IVFIndex.load(path)
+    except Exception as e:
+        print(f"[WARN] No pude leer el índice ANN {path}: {e}")
+        return None
+    if idx.n != len(gallery) or idx.names_sha != names_hash(gallery.names):
+        print(f"[WARN] El índice ANN {path} no corresponde a la galería actual: búsqueda exacta "
+              f"(reconstruir con: python -m src.ann --build)")
+        return None
+    return idx
+
+def build_for(model: Path, encodings, names: List[str], force: bool = False) -> Optional[Path]:
+    """Construye y guarda el índice si la galería lo amerita (lo llama el entrenamiento)."""
+    if len(names) < ANN_MIN and not force:
+        return None
+    t0 = time.perf_counter()
+    idx = IVFIndex.build(np.asarray(encodings), names)
+    path = index_path_for(model)
+    idx.save(path)
+    print(f"[OK] Índice ANN: {idx.n} encodings en {idx.nlist} listas ({idx.nbytes/2**20:.1f} MB) "
+          f"en {time.perf_counter()-t0:.1f}s -> {path}")
+    return path
+
+def recall(gallery, idx: IVFIndex, sample: int = 1000, nprobe: Optional[int] = None,
+           seed: int = 0) -> Tuple[float, float, float, float]:
+    """
+    Encodings de la galería como consultas (dejándose afuera). Devuelve
+    (recall@1, recall del top-2, ms por cara con ANN, ms por cara exacta).
+    """
+    rng = np.random.default_rng(seed)
+    qi = rng.choice(len(gallery), min(sample, len(gallery)), replace=False)
+    hit1 = hit2 = 0
+    t_ann = t_exact = 0.0
+    for i in qi:
+        q = np.asarray(gallery.encodings[i])
+        t0 = time.perf_counter()
+        d = gallery.distances(q); d[i] = np.inf
+        ex = np.argsort(d)[:2]
+        t_exact += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        rows = idx.candidates(q, RERANK + 1, nprobe)
+        rows = rows[rows != i]
+        da = np.linalg.norm(gallery.encodings[rows] - q, axis=1)
+        ap = rows[np.argsort(da)[:2]]
+        t_ann += time.perf_counter() - t0
+        hit1 += int(len(ap) > 0 and ap[0] == ex[0])
+        hit2 += int(set(ap.tolist()) == set(ex.tolist()))
+    n = len(qi)
+    return hit1 / n, hit2 / n, t_ann / n * 1000, t_exact / n * 1000
+
+def main():
+    from src.gallery import load_gallery
+    ap = argparse.ArgumentParser(description="Índice IVF (ANN) de la galería: construir y medir recall")
+    ap.add_argument("--model", default=str(MODEL_PATH))
+    ap.add_argument("--build", action="store_true", help="(Re)construir el índice aunque la galería sea chica")
+    ap.add_argument("--nlist", type=int, default=None)
+    ap.add_argument("--nprobe", type=int, default=NPROBE)
+    ap.add_argument("--sample", type=int, default=1000, help="Consultas para el reporte de recall")
+    args = ap.parse_args()
+
+    g = load_gallery(args.model)
+    if args.build:
+        t0 = time.perf_counter()
+        idx = IVFIndex.build(g.encodings, g.names, nlist=args.nlist)
+        idx.save(index_path_for(Path(args.model)))
+        print(f"[OK] {idx.n} encodings en {idx.nlist} listas en {time.perf_counter()-t0:.1f}s")
+    path = index_path_for(Path(args.model))
+    if not path.exists():
+        print(f"No hay índice en {path} (usar --build)")
+        return
+    idx = IVFIndex.load(path)
+    if idx.n != len(g) or idx.names_sha != names_hash(g.names):
+        print(f"[WARN] {path} es de otra versión de la galería (usar --build)")
+        return
+    r1, r2, ms_ann, ms_exact = recall(g, idx, sample=args.sample, nprobe=args.nprobe)
+    print(f"[INFO] nlist={idx.nlist} nprobe={args.nprobe} | recall@1 {r1:.2%} | top-2 igual {r2:.2%} | "
+          f"{ms_ann:.3f} ms/cara (exacta {ms_exact:.3f} ms)")
+    if len(g) < ANN_MIN:
+        print(f"[INFO] Galería de {len(g)} < ANN_MIN={ANN_MIN}: el reconocimiento en vivo usa la búsqueda exacta.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# src/bench_detectors.py
+# Comparativa de detectores sobre fotos etiquetadas (por defecto data/dataset, donde
+# cada foto tiene al menos la cara del estudiante).
+#   recall  -> fotos con al menos una cara detectada
+#   extra   -> cajas de más por foto (gente detrás o falsos positivos)
+#   p50/p95 -> latencia por imagen
+# --scale 0.25 reproduce el tamaño con que detecta el bucle en vivo. Para elegir por
+# cámara, apunta --images a los snapshots/capturas de esa cámara.
+#
+# Uso:
+#   python -m src.bench_detectors --scale 0.25
+#   python -m src.bench_detectors --detectors hog,cascade --images data/snapshots --min-recall 0.95
+
+import argparse, csv, os, time
+from pathlib import Path
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from src.detectors import DETECTORS, get_detector
+
+DATASET_DIR = Path("data/dataset")
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+def cargar_imagenes(root: Path, scale: float, limit: int) -> List[np.ndarray]:
+    paths = sorted(Path(r) / f for r, _, files in os.walk(root) for f in files if Path(f).suffix.lower() in IMG_EXTS)
+    if limit: paths = paths[:limit]
+    imgs = []
+    for p in paths:
+        img = cv2.imread(str(p))
+        if img is None: continue
+        if scale != 1.0:
+            img = cv2.resize(img, (0, 0), fx=scale, fy=scale)
+        imgs.append(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    return imgs
+
+def medir(nombre: str, imgs: List[np.ndarray]) -> Dict:
+    t0 = time.perf_counter()
+    det = get_detector(nombre)
+    carga = time.perf_counter() - t0
+    det.detect(imgs[0])  # Calentamiento (primer llamado carga pesos / compila)
+    lat, hits, extra = [], 0, 0
+    for rgb in imgs:
+        t = time.perf_counter()
+        boxes = det.detect(rgb)
+        lat.append(time.perf_counter() - t)
+        hits += bool(boxes)
+        extra += max(0, len(boxes) - 1)
+    lat_ms = np.asarray(lat) * 1000
+    return {"detector": nombre, "imagenes": len(imgs), "recall": hits / len(imgs),
+            "extra_por_foto": extra / len(imgs), "p50_ms": float(np.percentile(lat_ms, 50)),
+            "p95_ms": float(np.percentile(lat_ms, 95)), "carga_s": carga}
+
+def main():
+    ap = argparse.ArgumentParser(description="Latencia y recall de los detectores de rostro")
+    ap.add_argument("--images", default=str(DATASET_DIR))
+    ap.add_argument("--detectors", default=",".join(DETECTORS))
+    ap.add_argument("--scale", type=float, default=1.0, help="Escala de la imagen (0.25 = como en vivo)")
+    ap.add_argument("--limit", type=int, default=0, help="Máximo de imágenes (0 = todas)")
+    ap.add_argument("--min-recall", type=float, default=0.95, help="Recall mínimo para recomendar")
+    ap.add_argument("--csv", default=None)
+    args = ap.parse_args()
+
+    imgs = cargar_imagenes(Path(args.images), args.scale, args.limit)
+    if not imgs:
+        print(f"No hay imágenes en {args.images}")
+        return
+    print(f"[INFO] {len(imgs)} imágenes de {args.images} a escala {args.scale}")
+
+    filas = []
+    for nombre in [d.strip() for d in args.detectors.split(",") if d.strip()]:
+        try:
+            filas.append(medir(nombre, imgs))
+        except Exception as e:  # Backend sin su librería instalada
+            print(f"[WARN] {nombre}: no disponible ({e})")
+
+    print(f"\n{'detector':<9} {'recall':>7} {'extra':>6} {'p50 ms':>8} {'p95 ms':>8} {'carga s':>8}")
+    for r in sorted(filas, key=lambda r: r["p50_ms"]):
+        print(f"{r['detector']:<9} {r['recall']:>7.1%} {r['extra_por_foto']:>6.2f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['carga_s']:>8.2f}")
+
+    aptos = [r for r in filas if r["recall"] >= args.min_recall]
+    if aptos:
+        mejor = min(aptos, key=lambda r: r["p95_ms"])
+        print(f"\n✅ Más barato con recall >= {args.min_recall:.0%}: {mejor['detector']} "
+              f"(usar --detector {mejor['detector']} o VISION_DETECTOR={mejor['detector']})")
+    else:
+        print(f"\n[WARN] Ningún detector llega a recall {args.min_recall:.0%} con estas imágenes.")
+
+    if args.csv and filas:
+        out = Path(args.csv); out.parent.mkdir(parents=True, exist_ok=True)
+        with out.open("w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=list(filas[0])); w.writeheader(); w.writerows(filas)
+        print(f"📂 Resultados en: {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# src/bench_gallery.py
+# Cómo escala el matching cuando crece la galería.
+# Genera galerías sintéticas de 128-d con la forma de las de face_recognition
+# (estudiantes separados ~0.8 entre sí, fotos del mismo a ~0.3) desde 10 hasta 1M de
+# encodings, y lotes de 1..64 caras (mitad de estudiantes inscritos, mitad de
+# desconocidos). Mide cada estrategia de matching del proyecto:
+#   face_distance -> train_model_v1.process_image (norma contra todo y argmin, por cara)
+#   nearest       -> decidir_identidad con Gallery.nearest sin prototipos
+#   prototypes    -> Gallery.nearest con prototipos (src/compact_gallery.py)
+#   matmul        -> lote contra la galería en float32 por bloques, como src/calibrate.py
+#   int8/float16  -> galería cuantizada con re-ranking exacto (src/quantize.py); "MB"
+#                    cuenta solo lo que queda en memoria (los float64 van a un mmap)
+#   ivf           -> índice IVF con re-ranking exacto (src/ann.py); "build s" es el k-means
+# y reporta: latencia por lote (p50/p95) y por cara, memoria de la estructura,
+# memoria extra durante la búsqueda (pico de tracemalloc), tiempo de construcción y
+# acuerdo del top-1 con face_distance (la referencia exacta).
+#
+# Las estrategias están en STRATEGIES: una estrategia nueva se agrega ahí y entra
+# sola en la comparativa.
+#
+# Uso:
+#   python -m src.bench_gallery
+#   python -m src.bench_gallery --sizes 10,1000,100000,1000000 --batches 1,64 --csv data/out/bench_gallery.csv
+
+import argparse, csv, time, tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from src.gallery import ENCODING_DIM, Gallery
+
+SIZES = "10,100,1000,10000,100000,1000000"
+BATCHES = "1,8,64"
+PER_STUDENT = 5        # Fotos por estudiante en la galería sintética
+CENTER_STD = 0.05      # ~0.8 de distancia entre estudiantes
+SAMPLE_STD = 0.018     # ~0.3 entre fotos del mismo estudiante
+MATMUL_BLOCK = 65536   # Filas de galería por bloque en la estrategia matmul
+
+# Un matcher recibe Q (B×128) y devuelve (índice, mejor distancia, segunda) por cara
+Matcher = Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray, np.ndarray]]
+
+# ---------- datos sintéticos ----------
+def galeria_sintetica(n: int, rng: np.random.Generator, per_student: int = PER_STUDENT):
+    """(encodings N×128 float64, nombres, centros de cada estudiante)."""
+    n_students = max(1, n // per_student)
+    centers = rng.normal(0.0, CENTER_STD, (n_students, ENCODING_DIM))
+    owner = np.arange(n) % n_students
+    enc = centers[owner] + rng.normal(0.0, SAMPLE_STD, (n, ENCODING_DIM))
+    return enc, [f"S{int(o):07d}" for o in owner], centers
+
+def consultas(centers: np.ndarray, b: int, rng: np.random.Generator) -> np.ndarray:
+    """b caras: la mitad de estudiantes inscritos (foto nueva), la otra mitad desconocidos."""
+    known = b - b // 2
+    q_known = centers[rng.integers(0, len(centers), known)] + rng.normal(0.0, SAMPLE_STD, (known, ENCODING_DIM))
+    q_unknown = rng.normal(0.0, CENTER_STD, (b - known, ENCODING_DIM))
+    return np.vstack([q_known, q_unknown])
+
+# ---------- estrategias ----------
+def _top2(d: np.ndarray) -> Tuple[int, float, float]:
+    if d.size == 1: return 0, float(d[0]), 1.0
+    two = np.argpartition(d, 1)[:2]
+    i, j = (two[0], two[1]) if d[two[0]] <= d[two[1]] else (two[1], two[0])
+    return int(i), float(d[i]), float(d[j])
+
+def _por_cara(fn) -> Matcher:
+    def run(Q):
+        out = [fn(q) for q in Q]
+        return (np.array([o[0] for o in out]), np.array([o[1] for o in out]), np.array([o[2] for o in out]))
+    return run
+
+def build_face_distance(enc, names) -> Tuple[Matcher, int]:
+    return _por_cara(lambda q: _top2(np.linalg.norm(enc - q, axis=1))), enc.nbytes
+
+def build_nearest(enc, names) -> Tuple[Matcher, int]:
+    g = Gallery(enc, names)
+    return _por_cara(g.nearest), g.encodings.nbytes
+
+def build_prototypes(enc, names) -> Tuple[Matcher, int]:
+    from src.compact_gallery import prototypes
+    rows: Dict[str, List[int]] = {}
+    for i, n in enumerate(names):
+        rows.setdefault(n, []).append(i)
+    protos, proto_names = [], []
+    for n, r in rows.items():
+        x = enc[r]
+        protos.extend(x[j] for j in prototypes(x))
+        proto_names.extend([n] * (len(protos) - len(proto_names)))
+    g = Gallery(enc, names, prototypes=np.asarray(protos), proto_names=proto_names)
+    extra = g.prototypes.nbytes + sum(r.nbytes for r in g._rows.values())
+    return _por_cara(g.nearest), g.encodings.nbytes + extra
+
+def build_matmul(enc, names) -> Tuple[Matcher, int]:
+    e32 = enc.astype(np.float32)
+    sq = (e32 ** 2).sum(axis=1)
+    def run(Q):
+        q = Q.astype(np.float32)
+        qq = (q ** 2).sum(axis=1)
+        best_d = np.full((len(q), 2), np.inf, dtype=np.float32)
+        best_i = np.full((len(q), 2), -1, dtype=np.int64)
+        for a in range(0, len(e32), MATMUL_BLOCK):
+            d2 = qq[:, None] + sq[None, a:a+MATMUL_BLOCK] - 2.0 * q @ e32[a:a+MATMUL_BLOCK].T
+            k = min(2, d2.shape[1])
+            part = np.argpartition(d2, k - 1, axis=1)[:, :k]
+            cand_d = np.concatenate([best_d, np.take_along_axis(d2, part, axis=1)], axis=1)
+            cand_i = np.concatenate([best_i, part + a], axis=1)
+            order = np.argsort(cand_d, axis=1)[:, :2]
+            best_d, best_i = np.take_along_axis(cand_d, order, axis=1), np.take_along_axis(cand_i, order, axis=1)
+        best_d = np.sqrt(np.maximum(best_d, 0.0))
+        second = np.where(np.isfinite(best_d[:, 1]), best_d[:, 1], 1.0)
+        return best_i[:, 0], best_d[:, 0], second
+    return run, e32.nbytes + sq.nbytes
+
+def _build_quant(mode: str):
+    def build(enc, names) -> Tuple[Matcher, int]:
+        from src.quantize import QuantizedCodes
+        q = QuantizedCodes.fit(enc, mode)
+        g = Gallery(enc, names, quant=q)
+        return _por_cara(g.nearest), q.nbytes
+    return build
+
+def build_ivf(enc, names) -> Tuple[Matcher, int]:
+    from src.ann import IVFIndex
+    idx = IVFIndex.build(enc, names)
+    g = Gallery(enc, names, ann=idx)
+    return _por_cara(g.nearest), g.encodings.nbytes + idx.nbytes
+
+STRATEGIES: Dict[str, Callable] = {
+    "face_distance": build_face_distance,
+    "nearest": build_nearest,
+    "prototypes": build_prototypes,
+    "matmul": build_matmul,
+    "int8": _build_quant("int8"),
+    "float16": _build_quant("float16"),
+    "ivf": build_ivf,
+}
+REFERENCE = "face_distance"
+
+# ---------- medición ----------
+def medir(match: Matcher, Q: np.ndarray, repeats: int, max_seconds: float) -> Dict:
+    lat = []
+    t_total = time.perf_counter()
+    for _ in range(repeats):
+        t0 = time.perf_counter(); match(Q); lat.append(time.perf_counter() - t0)
+        if time.perf_counter() - t_total > max_seconds: break
+    tracemalloc.start()
+    match(Q)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    lat_ms = np.asarray(lat) * 1000
+    return {"p50_ms": float(np.percentile(lat_ms, 50)), "p95_ms": float(np.percentile(lat_ms, 95)),
+            "us_por_cara": float(np.median(lat_ms)) * 1000 / len(Q), "pico_mb": peak / 2**20,
+            "repeticiones": len(lat)}
+
+def main():
+    ap = argparse.ArgumentParser(description="Latencia y memoria del matching según el tamaño de la galería")
+    ap.add_argument("--sizes", default=SIZES, help="Encodings en la galería, separados por coma")
+    ap.add_argument("--batches", default=BATCHES, help="Caras por consulta, separadas por coma")
+    ap.add_argument("--strategies", default=",".join(STRATEGIES))
+    ap.add_argument("--repeats", type=int, default=20)
+    ap.add_argument("--max-seconds", type=float, default=10.0,
+                    help="Tiempo máximo por celda; si una estrategia lo pasa, no se prueba en tamaños mayores")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--csv", default=None)
+    args = ap.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    batches = [int(b) for b in args.batches.split(",") if b.strip()]
+    names_s = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    rng = np.random.default_rng(args.seed)
+    lentas = set()
+    filas = []
+
+    print(f"{'galería':>9} {'estrategia':<14} {'lote':>4} {'p50 ms':>9} {'p95 ms':>9} {'us/cara':>9} "
+          f"{'MB':>8} {'pico MB':>8} {'build s':>8} {'acuerdo':>8}")
+    for n in sizes:
+        enc, names, centers = galeria_sintetica(n, rng)
+        lotes = {b: consultas(centers, b, rng) for b in batches}
+        ref: Dict[int, np.ndarray] = {}
+        for s in [REFERENCE] + [x for x in names_s if x != REFERENCE]:  # La referencia primero
+            if s in lentas: continue
+            t0 = time.perf_counter()
+            match, nbytes = STRATEGIES[s](enc, names)
+            build_s = time.perf_counter() - t0
+            for b, Q in lotes.items():
+                idx = match(Q)[0]
+                if s == REFERENCE: ref[b] = idx
+                if s not in names_s: continue
+                r = medir(match, Q, args.repeats, args.max_seconds)
+                acuerdo = float((idx == ref[b]).mean()) if b in ref else float("nan")
+                fila = {"galeria": n, "estrategia": s, "lote": b, **r, "mb": nbytes / 2**20,
+                        "build_s": build_s, "acuerdo": acuerdo}
+                filas.append(fila)
+                print(f"{n:>9} {s:<14} {b:>4} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['us_por_cara']:>9.1f} "
+                      f"{fila['mb']:>8.1f} {r['pico_mb']:>8.1f} {build_s:>8.2f} {acuerdo:>8.1%}")
+                if r["p50_ms"] / 1000 > args.max_seconds:
+                    print(f"[WARN] {s} pasa {args.max_seconds:.0f}s con {n} encodings: no se prueba en tamaños mayores")
+                    lentas.add(s)
+                    break
+            del match
+        del enc, names, centers
+
+    if args.csv and filas:
+        out = Path(args.csv); out.parent.mkdir(parents=True, exist_ok=True)
+        with out.open("w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=list(filas[0])); w.writeheader(); w.writerows(filas)
+        print(f"📂 Resultados en: {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# src/calibrate.py
+# Calibración de THRESH / MARGIN con la galería completa.
+# Calcula todas las distancias entre pares por bloques (nunca la matriz N×N entera,
+# solo BLOCK×BLOCK a la vez) y acumula:
+#   - histogramas de distancias genuinas (mismo estudiante) e impostoras (distinto),
+#   - por cada encoding, los 2 vecinos más cercanos (sin contarse a sí mismo) y los
+#     2 más cercanos de OTROS estudiantes.
+# Con eso simula la regla del reconocimiento en vivo (best <= THRESH y
+# second - best >= MARGIN) dejando cada encoding fuera como si fuera una cara nueva:
+#   FRR = genuinos que no se aceptan con su nombre correcto
+#   FAR = impostores aceptados (el mismo encoding con su estudiante quitado de la galería)
+#
+# Uso:
+#   python -m src.calibrate                       # reporte y recomendación
+#   python -m src.calibrate --far 0.001 --csv data/out/calibracion.csv
+
+import argparse, csv, time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.gallery import load_gallery
+
+MODEL_PATH = Path("models/embeddings_mtcnn.pkl")
+BLOCK = 2048
+BIN_W = 0.005          # Ancho de cada barra del histograma
+MAX_DIST = 1.5
+THRESH_GRID = np.round(np.arange(0.30, 0.701, 0.01), 2)
+MARGIN_GRID = np.round(np.arange(0.00, 0.151, 0.01), 2)
+
+def _merge_top2(best_d, best_i, d, idx_offset):
+    """Mezcla los 2 menores de cada fila de `d` con los que ya llevo (best_d/best_i: n×2)."""
+    if d.shape[1] == 0: return best_d, best_i
+    k = min(2, d.shape[1])
+    part = np.argpartition(d, k - 1, axis=1)[:, :k]
+    cand_d = np.concatenate([best_d, np.take_along_axis(d, part, axis=1)], axis=1)
+    cand_i = np.concatenate([best_i, part + idx_offset], axis=1)
+    order = np.argsort(cand_d, axis=1)[:, :2]
+    return np.take_along_axis(cand_d, order, axis=1), np.take_along_axis(cand_i, order, axis=1)
+
+def all_pairs(enc: np.ndarray, labels: np.ndarray, block: int = BLOCK) -> Dict:
+    """
+    Recorre los bloques (i, j) con j >= i; cada bloque sirve para las filas de i
+    (D) y para las de j (D.T). Memoria: O(block² + N).
+    """
+    n = len(enc)
+    enc = enc.astype(np.float32)
+    sq = (enc ** 2).sum(axis=1)
+    nbins = int(MAX_DIST / BIN_W) + 1
+    gen_hist = np.zeros(nbins, dtype=np.int64)
+    imp_hist = np.zeros(nbins, dtype=np.int64)
+    top_d = np.full((n, 2), np.inf, dtype=np.float32); top_i = np.full((n, 2), -1, dtype=np.int64)
+    imp_d = np.full((n, 2), np.inf, dtype=np.float32); imp_i = np.full((n, 2), -1, dtype=np.int64)
+
+    for a in range(0, n, block):
+        ea, la = enc[a:a+block], labels[a:a+block]
+        for b in range(a, n, block):
+            eb, lb = enc[b:b+block], labels[b:b+block]
+            d = np.sqrt(np.maximum(sq[a:a+block, None] + sq[None, b:b+block] - 2.0 * ea @ eb.T, 0.0))
+            same = la[:, None] == lb[None, :]
+            if a == b:
+                np.fill_diagonal(d, np.inf)
+                upper = np.triu(np.ones_like(same), k=1)
+            else:
+                upper = np.ones_like(same)
+            bins = np.minimum((d / BIN_W).astype(np.int64), nbins - 1)
+            gen_hist += np.bincount(bins[same & upper], minlength=nbins)
+            imp_hist += np.bincount(bins[~same & upper], minlength=nbins)
+
+            d_imp = np.where(same, np.inf, d)
+            top_d[a:a+block], top_i[a:a+block] = _merge_top2(top_d[a:a+block], top_i[a:a+block], d, b)
+            imp_d[a:a+block], imp_i[a:a+block] = _merge_top2(imp_d[a:a+block], imp_i[a:a+block], d_imp, b)
+            if a != b:
+                top_d[b:b+block], top_i[b:b+block] = _merge_top2(top_d[b:b+block], top_i[b:b+block], d.T, a)
+                imp_d[b:b+block], imp_i[b:b+block] = _merge_top2(imp_d[b:b+block], imp_i[b:b+block], d_imp.T, a)
+
+    return {"gen_hist": gen_hist, "imp_hist": imp_hist, "top_d": top_d, "top_i": top_i,
+            "imp_d": imp_d, "imp_i": imp_i}
+
+def evaluar(labels: np.ndarray, r: Dict, thresh_grid=THRESH_GRID, margin_grid=MARGIN_GRID) -> np.ndarray:
+    """
+    Tabla (thresh, margin, FAR, FRR) de la regla en vivo.
+    Solo cuentan como genuinos los encodings cuyo estudiante tiene otro encoding.
+    """
+    counts = np.bincount(labels)
+    genuine = counts[labels] > 1
+    d1, d2 = r["top_d"][:, 0], r["top_d"][:, 1]
+    correct = labels[np.maximum(r["top_i"][:, 0], 0)] == labels
+    i1, i2 = r["imp_d"][:, 0], r["imp_d"][:, 1]
+    n_gen, n_imp = max(int(genuine.sum()), 1), max(int(np.isfinite(i1).sum()), 1)
+    rows = []
+    for t in thresh_grid:
+        for m in margin_grid:
+            acc = (d1 <= t) & ((d2 - d1) >= m)
+            frr = float((genuine & ~(acc & correct)).sum()) / n_gen
+            far = float(((i1 <= t) & ((i2 - i1) >= m)).sum()) / n_imp
+            rows.append((float(t), float(m), far, frr))
+    return np.asarray(rows)
+
+def eer(gen_hist: np.ndarray, imp_hist: np.ndarray) -> Tuple[float, float]:
+    """(umbral, tasa) donde FAR ≈ FRR comparando solo distancias de pares."""
+    frr = 1.0 - np.cumsum(gen_hist) / max(gen_hist.sum(), 1)
+    far = np.cumsum(imp_hist) / max(imp_hist.sum(), 1)
+    k = int(np.argmin(np.abs(far - frr)))
+    return (k + 1) * BIN_W, float((far[k] + frr[k]) / 2)
+
+def recomendar(tabla: np.ndarray, far_max: float) -> Optional[Tuple[float, float, float, float]]:
+    ok = tabla[tabla[:, 2] <= far_max]
+    if len(ok) == 0: return None
+    # Menor FRR; a igualdad, el margen más chico y el umbral más alto (más tolerante)
+    best = sorted(ok.tolist(), key=lambda r: (r[3], r[1], -r[0]))[0]
+    return tuple(best)
+
+def main():
+    ap = argparse.ArgumentParser(description="Distribuciones genuino/impostor y umbrales recomendados")
+    ap.add_argument("--model", default=str(MODEL_PATH))
+    ap.add_argument("--block", type=int, default=BLOCK, help="Tamaño de bloque (memoria ~ block² floats)")
+    ap.add_argument("--far", type=float, default=0.001, help="FAR máximo aceptable para recomendar")
+    ap.add_argument("--csv", default=None, help="Guardar la tabla thresh,margin,far,frr")
+    args = ap.parse_args()
+
+    g = load_gallery(args.model)
+    g.validate()
+    ids = {n: k for k, n in enumerate(sorted(g.identities))}
+    labels = np.asarray([ids[n] for n in g.names], dtype=np.int64)
+    print(f"[INFO] {len(g)} encodings de {len(ids)} estudiantes, bloques de {args.block}")
+
+    t0 = time.time()
+    r = all_pairs(g.encodings, labels, block=args.block)
+    print(f"[OK] {int(r['gen_hist'].sum())} pares genuinos y {int(r['imp_hist'].sum())} impostores en {time.time()-t0:.1f}s")
+    t_eer, v_eer = eer(r["gen_hist"], r["imp_hist"])
+    print(f"   EER por pares: {v_eer:.2%} en distancia {t_eer:.3f}")
+
+    tabla = evaluar(labels, r)
+    from src.recognize import THRESH, MARGIN
+    actual = tabla[(np.isclose(tabla[:, 0], THRESH)) & (np.isclose(tabla[:, 1], MARGIN))]
+    if len(actual):
+        print(f"   Actual  THRESH={THRESH:.2f} MARGIN={MARGIN:.2f} -> FAR {actual[0, 2]:.3%} | FRR {actual[0, 3]:.2%}")
+    rec = recomendar(tabla, args.far)
+    if rec:
+        print(f"   Sugerido THRESH={rec[0]:.2f} MARGIN={rec[1]:.2f} -> FAR {rec[2]:.3%} | FRR {rec[3]:.2%} (FAR <= {args.far:.3%})")
+    else:
+        print(f"[WARN] Ninguna combinación llega a FAR <= {args.far:.3%}; revisa la galería (src.compact_gallery).")
+
+    if args.csv:
+        out = Path(args.csv); out.parent.mkdir(parents=True, exist_ok=True)
+        with out.open("w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f); w.writerow(["thresh", "margin", "far", "frr"])
+            w.writerows([[f"{t:.2f}", f"{m:.2f}", f"{fa:.6f}", f"{fr:.6f}"] for t, m, fa, fr in tabla])
+        print(f"📂 Curva guardada en: {out}")
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,12 @@ import os, time, platform
 from typing import Optional, Tuple, List
 import cv2
 
+from src.mjpeg import MJPEGCapture, is_mjpeg_url
+
+MJPEG_ASYNC = os.getenv("VISION_MJPEG_ASYNC", "1") != "0"  # 0 = siempre cv2.VideoCapture para URLs
+MJPEG_FIRST_FRAME_S = 5.0
+_NOT_MJPEG = set()  # URLs que respondieron sin multipart: en las reconexiones van directo a OpenCV
+
 def _log(msg: str, verbose=True):
     if verbose:
         print(msg)
@@ -86,6 +92,18 @@ def open_url(source_url: str, verbose=True) -> Tuple[Optional[cv2.VideoCapture],
     Para abrir cámaras IP o archivos de video cuando uso la estrategia 'URL'.
     """
     _log(f"[TRY] Intentando conectar a URL: {source_url}", verbose)
+    if MJPEG_ASYNC and is_mjpeg_url(source_url) and source_url not in _NOT_MJPEG:
+        # MJPEG por HTTP (DroidCam): cliente asyncio compartido, solo decodifica los frames que se leen.
+        # Si la respuesta no es multipart, wait_new vuelve en el acto (no espera MJPEG_FIRST_FRAME_S).
+        cap = MJPEGCapture(source_url)
+        if cap.stream.wait_new(0, MJPEG_FIRST_FRAME_S):
+            ok, frame = cap.read()
+            if ok:
+                _log(f"[OK] Conectado a URL MJPEG ({frame.shape[1]}x{frame.shape[0]})", verbose)
+                return cap, "MJPEG"
+        if cap.stream.not_mjpeg: _NOT_MJPEG.add(source_url)
+        _log(f"[INFO] Sin video MJPEG ({cap.stream.last_error or 'sin partes'}), pruebo con OpenCV", verbose)
+        cap.release()
     cap = cv2.VideoCapture(source_url)
     if not cap.isOpened():
         _log(f"[FAIL-OPEN] No pude conectar a la URL", verbose)
@@ -136,41 +154,55 @@ def open_any(
     _log("[ERROR] Lo intenté todo pero no encontré ninguna fuente de video.", verbose)
     return None, None, ""
 
-def read_loop(cap: cv2.VideoCapture, reopen_fn, reopen_args: tuple, max_misses=15, delay_s=0.02, verbose=True):
+def read_loop(cap: cv2.VideoCapture, reopen_fn, reopen_args: tuple, max_misses=15, delay_s=0.02, verbose=True,
+              on_miss=None, on_reconnect=None, reuse_buffer=False):
     """
     Generador de frames resiliente. 
     Si la cámara se desconecta (ej: fallo de WiFi), intento reconectarla automáticamente
     para que el sistema no se caiga.
+    on_miss / on_reconnect: callbacks opcionales para contar lecturas fallidas y reconexiones.
+    reuse_buffer: leo cada frame dentro del array del anterior (sin asignar memoria);
+    el consumidor debe terminar de usar un frame antes de pedir el siguiente.
     """
     misses = 0
-    while True:
-        ok, frame = cap.read()
-        if ok and frame is not None and frame.size > 0:
-            misses = 0
-            yield True, frame
-            continue
-        
-        # Si falla la lectura, cuento los errores.
-        misses += 1
-        time.sleep(delay_s)
-        
-        # Si falló muchas veces seguidas, asumo que se cayó la conexión y trato de revivirla.
-        if misses >= max_misses:
-            _log("[INFO] Perdí la señal... intentando reconectar la fuente...", verbose)
-            try:
-                cap.release()
-            except Exception:
-                pass
+    buf = None
+    try:
+        while True:
+            ok, frame = cap.read(buf) if buf is not None else cap.read()
+            if ok and frame is not None and frame.size > 0:
+                misses = 0
+                if reuse_buffer: buf = frame
+                yield True, frame
+                continue
             
-            # Llamo a la función de reapertura con los mismos argumentos originales
-            _, cap, _ = reopen_fn(*reopen_args)
-            if cap is None:
-                _log("[FATAL] No pude reconectar. Me rindo.", verbose)
-                yield False, None
-                break
+            # Si falla la lectura, cuento los errores.
+            misses += 1
+            if on_miss: on_miss()
+            time.sleep(delay_s)
             
-            _log("[INFO] ¡Reconexión exitosa! Seguimos.", verbose)
-            misses = 0
+            # Si falló muchas veces seguidas, asumo que se cayó la conexión y trato de revivirla.
+            if misses >= max_misses:
+                _log("[INFO] Perdí la señal... intentando reconectar la fuente...", verbose)
+                try:
+                    cap.release()
+                except Exception:
+                    pass
+                
+                # Llamo a la función de reapertura con los mismos argumentos originales
+                _, cap, _ = reopen_fn(*reopen_args)
+                if cap is None:
+                    _log("[FATAL] No pude reconectar. Me rindo.", verbose)
+                    yield False, None
+                    break
+                
+                _log("[INFO] ¡Reconexión exitosa! Seguimos.", verbose)
+                if on_reconnect: on_reconnect()
+                misses = 0
+    finally:
+        # Si el consumidor cierra el generador (ej: cambio de fuente), suelto la cámara actual
+        if cap is not None:
+            try: cap.release()
+            except Exception: pass
 
 if __name__ == "__main__":
     # Bloque de pruebas para correr este archivo solo
@@ -0,0 +1,139 @@
+# src/compact_gallery.py
+# Compactación de la galería (models/embeddings_mtcnn.pkl).
+# El entrenamiento guarda un encoding por cada cara de cada foto (con MTCNN, también
+# las de quien pasaba detrás), así que la galería crece con vectores casi iguales y
+# con alguno que ni siquiera es del estudiante. Este script:
+#   1. Marca contaminantes: encodings más cerca del centro de OTRO estudiante que
+#      del propio, o demasiado lejos del propio (CONTAM_THRESH). Con --drop se quitan.
+#   2. Quita casi-duplicados dentro de cada estudiante (a menos de DUP_THRESH de
+#      uno que ya se conservó).
+#   3. Guarda N_PROTO prototipos por estudiante (medoide + los más alejados entre
+#      sí) que Gallery.nearest usa como primer filtro.
+#
+# Uso:
+#   python -m src.compact_gallery                 # compacta en el mismo archivo (deja .bak)
+#   python -m src.compact_gallery --dry-run       # solo el reporte
+#   python -m src.compact_gallery --drop          # además elimina los contaminantes
+
+import argparse, os, pickle, shutil
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from src.gallery import Gallery, load_gallery
+
+MODEL_PATH = Path("models/embeddings_mtcnn.pkl")
+DUP_THRESH = 0.15     # Más cerca que esto = foto redundante
+CONTAM_THRESH = 0.60  # Más lejos que esto de su propio medoide = sospechoso
+N_PROTO = 3
+
+def _pairwise(x: np.ndarray) -> np.ndarray:
+    sq = (x ** 2).sum(axis=1)
+    return np.sqrt(np.maximum(sq[:, None] + sq[None, :] - 2.0 * x @ x.T, 0.0))
+
+def medoid(x: np.ndarray) -> int:
+    return int(np.argmin(_pairwise(x).sum(axis=1)))
+
+def prune_duplicates(x: np.ndarray, thresh: float = DUP_THRESH) -> List[int]:
+    """Índices a conservar: recorro en orden y descarto los que caen cerca de uno ya conservado."""
+    keep: List[int] = []
+    for i in range(len(x)):
+        if not keep or np.linalg.norm(x[keep] - x[i], axis=1).min() > thresh:
+            keep.append(i)
+    return keep
+
+def prototypes(x: np.ndarray, k: int = N_PROTO) -> List[int]:
+    """Medoide y después, uno a uno, el punto más alejado de los ya elegidos."""
+    chosen = [medoid(x)]
+    if len(x) <= 1: return chosen
+    d = np.linalg.norm(x - x[chosen[0]], axis=1)
+    while len(chosen) < min(k, len(x)):
+        nxt = int(np.argmax(d))
+        if d[nxt] <= DUP_THRESH: break
+        chosen.append(nxt)
+        d = np.minimum(d, np.linalg.norm(x - x[nxt], axis=1))
+    return chosen
+
+def find_contaminants(g: Gallery, thresh: float = CONTAM_THRESH) -> List[Tuple[int, str, str, float]]:
+    """(índice, dueño, estudiante más cercano, distancia al propio medoide) de cada sospechoso."""
+    by_name: Dict[str, List[int]] = {}
+    for i, n in enumerate(g.names):
+        by_name.setdefault(n, []).append(i)
+    names = sorted(by_name)
+    pos = {n: k for k, n in enumerate(names)}
+    centers = np.stack([g.encodings[by_name[n]][medoid(g.encodings[by_name[n]])] for n in names])
+    out = []
+    for i, n in enumerate(g.names):
+        d = np.linalg.norm(centers - g.encodings[i], axis=1)
+        own = float(d[pos[n]])
+        near = names[int(np.argmin(d))]
+        if (near != n and len(by_name[n]) > 1) or own > thresh:
+            out.append((i, n, near, own))
+    return out
+
+def compact(g: Gallery, drop_contaminants: bool = False, n_proto: int = N_PROTO,
+            dup_thresh: float = DUP_THRESH) -> Tuple[Dict, Dict]:
+    """Devuelve (datos para el pickle, resumen)."""
+    contam = find_contaminants(g)
+    drop = {i for i, *_ in contam} if drop_contaminants else set()
+
+    by_name: Dict[str, List[int]] = {}
+    for i, n in enumerate(g.names):
+        if i not in drop: by_name.setdefault(n, []).append(i)
+
+    encs, names, protos, proto_names = [], [], [], []
+    for n in sorted(by_name):
+        x = g.encodings[by_name[n]]
+        x = x[prune_duplicates(x, dup_thresh)]
+        encs.extend(x); names.extend([n] * len(x))
+        for j in prototypes(x, n_proto):
+            protos.append(x[j]); proto_names.append(n)
+
+    data = {"encodings": encs, "names": names, "encoder": g.encoder,
+            "prototypes": np.asarray(protos), "proto_names": proto_names}
+    resumen = {"antes": len(g), "despues": len(names), "estudiantes": len(by_name),
+               "prototipos": len(proto_names), "contaminantes": contam, "eliminados": len(drop)}
+    return data, resumen
+
+def main():
+    ap = argparse.ArgumentParser(description="Compactar la galería de encodings")
+    ap.add_argument("--model", default=str(MODEL_PATH))
+    ap.add_argument("--out", default=None, help="Archivo de salida (por defecto el mismo, con copia .bak)")
+    ap.add_argument("--drop", action="store_true", help="Eliminar los contaminantes marcados")
+    ap.add_argument("--protos", type=int, default=N_PROTO, help="Prototipos por estudiante (0 = sin prototipos)")
+    ap.add_argument("--dup", type=float, default=DUP_THRESH, help="Umbral de casi-duplicado")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    g = load_gallery(args.model)
+    g.validate()
+    data, r = compact(g, drop_contaminants=args.drop, n_proto=max(args.protos, 1), dup_thresh=args.dup)
+    if args.protos <= 0:
+        data.pop("prototypes"); data.pop("proto_names")
+
+    print(f"[OK] {r['antes']} -> {r['despues']} encodings | {r['estudiantes']} estudiantes | "
+          f"{r['prototipos'] if args.protos > 0 else 0} prototipos")
+    if r["contaminantes"]:
+        print(f"[WARN] {len(r['contaminantes'])} encodings sospechosos "
+              f"({'eliminados' if args.drop else 'usa --drop para quitarlos'}):")
+        for i, dueno, cercano, d in r["contaminantes"][:30]:
+            print(f"   #{i:<5} {dueno:<30} más cerca de {cercano:<30} (a {d:.2f} de su medoide)")
+    if args.dry_run:
+        return
+
+    out = Path(args.out or args.model)
+    if out == Path(args.model):
+        shutil.copy2(args.model, str(args.model) + ".bak")
+    # Los índices cambiaron: el índice ANN (si la galería es grande) se rehace antes del pickle
+    from src.ann import build_for
+    build_for(out, data["encodings"], data["names"])
+    # Mismo reemplazo atómico que el entrenamiento: el productor vigila este archivo
+    tmp = out.with_name(out.name + ".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(data, f)
+    os.replace(tmp, out)
+    print(f"📂 Galería compacta en: {out}")
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,14 @@ BASE_DIR = Path(__file__).resolve().parents[1]
 DATA_DIR   = BASE_DIR / "data"
 LOGS_DIR   = DATA_DIR / "logs"
 SNAP_DIR   = DATA_DIR / "snapshots"
+THUMB_DIR  = DATA_DIR / "thumbs"         # Miniaturas de snapshots para el panel
 RUN_DIR    = DATA_DIR / "run"            # <- ESTA ES LA NUEVA CONSTANTE
 LAST_FRAME = DATA_DIR / "last_frame.jpg"
 EVENTS_CSV = LOGS_DIR / "events.csv"
+EVENTS_RAW_CSV = LOGS_DIR / "events_raw.csv"   # Una fila por frame (solo con --raw-events)
+SESSIONS_CSV = LOGS_DIR / "sessions.csv"       # Una fila por sesión de presencia
+STUDENTS_CSV = DATA_DIR / "estudiantes.csv"
+STUDENTS_DB  = DATA_DIR / "estudiantes.db"
 
 # Crear carpetas necesarias
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
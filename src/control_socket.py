@@ -0,0 +1,137 @@
+# src/control_socket.py
+# Canal de control del productor por socket Unix (data/run/vision.sock).
+# Protocolo: una línea JSON por conexión, ej:
+#   {"cmd": "switch_source", "prefer": "url", "url": "http://IP:4747/mjpegfeed", "cam": 0}
+#   {"cmd": "pause"} | {"cmd": "resume"} | {"cmd": "reload_gallery"} | {"cmd": "ping"}
+#   {"cmd": "set", "thresh": 0.48, "margin": 0.06}
+# La respuesta es otra línea JSON. Los comandos se encolan y el bucle de visión
+# los aplica entre frames, nunca a mitad de uno.
+# En Windows sin AF_UNIX el canal simplemente no existe y el panel vuelve a
+# reiniciar el proceso como siempre.
+
+import json, os, queue, socket, threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.config import RUN_DIR
+
+SOCKET_PATH = RUN_DIR / "vision.sock"
+COMMANDS = ("switch_source", "pause", "resume", "set", "reload_gallery", "ping")
+SETTABLE = {"thresh": (0.0, 1.5), "margin": (0.0, 1.0), "eye_ar_thresh": (0.0, 1.0), "frame_skip": (0, 30)}
+MAX_MSG = 64 * 1024
+
+def available() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+def validate(msg: Dict) -> Optional[str]:
+    """Devuelve un mensaje de error, o None si el comando es válido."""
+    if not isinstance(msg, dict) or msg.get("cmd") not in COMMANDS:
+        return f"comando desconocido (válidos: {', '.join(COMMANDS)})"
+    if msg["cmd"] == "switch_source":
+        if msg.get("prefer", "auto") not in ("auto", "url", "local"):
+            return "prefer debe ser auto, url o local"
+        if msg.get("url") is not None and not isinstance(msg["url"], str):
+            return "url debe ser texto"
+        cam = msg.get("cam")
+        if cam is not None and (isinstance(cam, bool) or not isinstance(cam, (int, str))):
+            return "cam debe ser un índice o texto"
+    if msg["cmd"] == "set":
+        params = {k: v for k, v in msg.items() if k != "cmd"}
+        if not params:
+            return "set sin parámetros"
+        for k, v in params.items():
+            if k not in SETTABLE:
+                return f"parámetro no ajustable: {k}"
+            lo, hi = SETTABLE[k]
+            if not isinstance(v, (int, float)) or not (lo <= v <= hi):
+                return f"{k} fuera de rango [{lo}, {hi}]"
+    return None
+
+class ControlServer:
+    def __init__(self, path: Path = SOCKET_PATH):
+        self.path = Path(path)
+        self.commands: "queue.Queue[Dict]" = queue.Queue()
+        self._sock = None
+
+    def start(self) -> "ControlServer":
+        if not available():
+            print("[INFO] Sin AF_UNIX en esta plataforma: canal de control desactivado.")
+            return self
+        try:
+            self.path.unlink(missing_ok=True)  # Socket viejo de un productor anterior
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(str(self.path))
+            os.chmod(self.path, 0o600)
+            sock.listen(8)
+        except OSError as e:
+            print(f"[WARN] No pude abrir el canal de control en {self.path}: {e}")
+            return self
+        self._sock = sock
+        threading.Thread(target=self._accept_loop, name="control-socket", daemon=True).start()
+        print(f"[OK] Canal de control en {self.path}")
+        return self
+
+    def _accept_loop(self):
+        while self._sock is not None:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            with conn:
+                try: self._handle(conn)
+                except Exception as e:
+                    try: conn.sendall((json.dumps({"ok": False, "error": str(e)}) + "\n").encode("utf-8"))
+                    except OSError: pass
+
+    def _handle(self, conn):
+        conn.settimeout(2.0)
+        buf = b""
+        while b"\n" not in buf and len(buf) < MAX_MSG:
+            chunk = conn.recv(4096)
+            if not chunk: break
+            buf += chunk
+        msg = json.loads(buf.split(b"\n", 1)[0].decode("utf-8"))
+        err = validate(msg)
+        if err:
+            reply = {"ok": False, "error": err}
+        elif msg["cmd"] == "ping":
+            reply = {"ok": True, "pid": os.getpid()}
+        else:
+            self.commands.put(msg)
+            reply = {"ok": True, "queued": True, "pending": self.commands.qsize()}
+        conn.sendall((json.dumps(reply) + "\n").encode("utf-8"))
+
+    def get(self, timeout: float) -> Optional[Dict]:
+        try: return self.commands.get(timeout=timeout)
+        except queue.Empty: return None
+
+    def drain(self) -> List[Dict]:
+        out = []
+        while True:
+            try: out.append(self.commands.get_nowait())
+            except queue.Empty: return out
+
+    def close(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try: sock.close()
+            except OSError: pass
+            self.path.unlink(missing_ok=True)
+
+def send_command(msg: Dict, path: Path = SOCKET_PATH, timeout: float = 2.0) -> Optional[Dict]:
+    """Cliente: manda un comando y devuelve la respuesta, o None si no hay canal."""
+    if not available() or not Path(path).exists():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
+            s.connect(str(path))
+            s.sendall((json.dumps(msg) + "\n").encode("utf-8"))
+            buf = b""
+            while b"\n" not in buf:
+                chunk = s.recv(4096)
+                if not chunk: break
+                buf += chunk
+        return json.loads(buf.split(b"\n", 1)[0].decode("utf-8")) if buf else None
+    except (OSError, ValueError):
+        return None
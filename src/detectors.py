@@ -0,0 +1,104 @@
+# src/detectors.py
+# Detectores de rostro intercambiables. Todos reciben una imagen RGB y devuelven
+# cajas (top, right, bottom, left), el formato de face_recognition, así el resto
+# del pipeline (encodings, landmarks, dibujo) no sabe cuál se usó.
+#
+#   hog     -> dlib HOG (face_recognition, el de siempre; CPU, rápido)
+#   cnn     -> dlib CNN (mucho mejor con caras chicas/de lado; lento sin GPU)
+#   mtcnn   -> MTCNN (TensorFlow; el que usa el entrenamiento)
+#   cascade -> Haar cascade de OpenCV (el más barato, el que más falla)
+#
+# Cada backend importa su librería recién al construirse.
+# Benchmark: python -m src.bench_detectors
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Box = Tuple[int, int, int, int]  # (top, right, bottom, left)
+
+def boxes_from_xywh(rects: Iterable, shape: Optional[Tuple[int, ...]] = None) -> List[Box]:
+    """(x, y, w, h) -> (top, right, bottom, left), recortado a la imagen si se da `shape`."""
+    boxes = []
+    for x, y, w, h in rects:
+        top, left = max(0, int(y)), max(0, int(x))
+        bottom, right = top + max(0, int(h)), left + max(0, int(w))
+        if shape is not None:
+            bottom, right = min(bottom, shape[0]), min(right, shape[1])
+        if bottom > top and right > left:
+            boxes.append((top, right, bottom, left))
+    return boxes
+
+class FaceDetector:
+    name = "base"
+
+    def detect(self, rgb) -> List[Box]:
+        raise NotImplementedError
+
+class HogDetector(FaceDetector):
+    name = "hog"
+
+    def __init__(self, upsample: int = 1):
+        import face_recognition
+        self._fr = face_recognition
+        self.upsample = upsample
+
+    def detect(self, rgb) -> List[Box]:
+        return self._fr.face_locations(rgb, number_of_times_to_upsample=self.upsample, model="hog")
+
+class CnnDetector(HogDetector):
+    name = "cnn"
+
+    def detect(self, rgb) -> List[Box]:
+        return self._fr.face_locations(rgb, number_of_times_to_upsample=self.upsample, model="cnn")
+
+class MTCNNDetector(FaceDetector):
+    """
+    Por defecto devuelve todas las cajas de MTCNN sin recortarlas al borde de la
+    imagen, igual que el entrenamiento de siempre (cambiar eso cambia qué caras se
+    inscriben). min_confidence y clip son opcionales, para quien los pida.
+    """
+    name = "mtcnn"
+
+    def __init__(self, min_confidence: Optional[float] = None, clip: bool = False):
+        from mtcnn.mtcnn import MTCNN
+        self._mtcnn = MTCNN()
+        self.min_confidence = min_confidence
+        self.clip = clip
+
+    def detect(self, rgb) -> List[Box]:
+        faces = self._mtcnn.detect_faces(rgb)
+        if self.min_confidence is not None:
+            faces = [f for f in faces if f.get("confidence", 1.0) >= self.min_confidence]
+        return boxes_from_xywh([f["box"] for f in faces], rgb.shape if self.clip else None)
+
+class CascadeDetector(FaceDetector):
+    name = "cascade"
+
+    def __init__(self, scale_factor: float = 1.1, min_neighbors: int = 5, min_size: int = 24):
+        import cv2
+        self._cv2 = cv2
+        self._clf = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        if self._clf.empty():
+            raise RuntimeError("No se pudo cargar haarcascade_frontalface_default.xml")
+        self.scale_factor, self.min_neighbors, self.min_size = scale_factor, min_neighbors, min_size
+
+    def detect(self, rgb) -> List[Box]:
+        gray = self._cv2.cvtColor(rgb, self._cv2.COLOR_RGB2GRAY)
+        rects = self._clf.detectMultiScale(gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+                                           minSize=(self.min_size, self.min_size))
+        return boxes_from_xywh(rects, rgb.shape)
+
+DETECTORS = {"hog": HogDetector, "cnn": CnnDetector, "mtcnn": MTCNNDetector, "cascade": CascadeDetector}
+
+_instances: Dict[str, FaceDetector] = {}
+_lock = threading.Lock()
+
+def get_detector(name: str = "hog") -> FaceDetector:
+    """Una instancia por backend y proceso (MTCNN y el CNN tardan en cargar)."""
+    name = (name or "hog").lower()
+    if name not in DETECTORS:
+        raise ValueError(f"Detector desconocido: {name} (válidos: {', '.join(DETECTORS)})")
+    with _lock:
+        if name not in _instances:
+            _instances[name] = DETECTORS[name]()
+        return _instances[name]
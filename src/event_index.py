@@ -0,0 +1,247 @@
+# src/event_index.py
+# Índice disperso de data/logs/events.csv para consultas por rango de hora.
+# Junto al CSV vive events.csv.idx con una línea por bloque de INDEX_EVERY filas:
+#     offset_inicio,offset_fin,filas,ts_min,ts_max
+# Una consulta busca (bisect) los bloques cuyo [ts_min, ts_max] toca la ventana,
+# hace seek a esos offsets y solo parsea esas filas. El último bloque incompleto
+# no está indexado y se lee entero (menos de INDEX_EVERY filas).
+#
+# Las filas no llegan perfectamente ordenadas (una sesión se escribe al cerrarse con
+# la hora de inicio), por eso cada bloque guarda su mínimo y su máximo en vez de
+# suponer orden.
+#
+# El índice se pone al día de forma incremental (solo lee lo agregado al CSV);
+# el productor lo actualiza junto con los agregados y cada consulta lo actualiza antes.
+# Varios procesos escriben el mismo .idx (worker, panel, reporter): cada update
+# toma un lock sobre el archivo, lo relee y solo agrega bloques después del último
+# offset indexado, así nunca quedan bloques repetidos. Si encuentra líneas rotas
+# (un proceso que murió a mitad de escritura) reescribe el .idx con los bloques buenos.
+#
+# Uso:
+#   python -m src.event_index --desde "2025-11-14 07:00" --hasta "2025-11-14 07:15" --cam 2
+
+import argparse, bisect, csv, io, os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.config import EVENTS_CSV
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+INDEX_EVERY = 256
+_MAX_TS = "\uffff"  # Mayor que cualquier timestamp (bloque sin filas con fecha)
+
+def index_path_for(events_csv: Path) -> Path:
+    return Path(str(events_csv) + ".idx")
+
+def _timestamp(line: bytes, col: int) -> str:
+    if col == 0:  # Caso normal: el timestamp no lleva comas ni comillas
+        return line.split(b",", 1)[0].decode("utf-8", errors="replace")
+    row = next(csv.reader([line.decode("utf-8", errors="replace")]), [])
+    return row[col] if len(row) > col else ""
+
+@contextmanager
+def _locked(f):
+    """Lock exclusivo sobre el archivo del índice mientras dura el bloque."""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try: yield
+        finally: fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        pos = f.tell(); f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        f.seek(pos)
+        try: yield
+        finally:
+            f.seek(0); msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1); f.seek(0, os.SEEK_END)
+
+def _parse_blocks(data: bytes) -> Tuple[List[Tuple[int, int, int, str, str]], bool]:
+    """
+    Líneas del .idx; descarta las rotas (p. ej. una escritura cortada) y las que no
+    siguen al bloque anterior (repetidas). Devuelve (bloques, limpio): limpio=False
+    si se descartó algo y conviene reescribir el archivo con los bloques buenos.
+    """
+    blocks: List[Tuple[int, int, int, str, str]] = []
+    lines = data.split(b"\n")
+    clean = lines[-1] == b""  # Lo que va después del último \n quedó a medio escribir
+    for line in lines[:-1]:
+        try:
+            a, b, n, lo, hi = line.decode("utf-8").split(",")
+            blk = (int(a), int(b), int(n), lo, hi)
+        except ValueError:  # Incluye UnicodeDecodeError
+            clean = False
+            continue
+        if len(lo) not in (0, 19) or len(hi) not in (0, 19) or blk[1] < blk[0] \
+                or (blocks and blk[0] != blocks[-1][1]):
+            clean = False
+            continue
+        blocks.append(blk)
+    return blocks, clean
+
+def _format_blocks(blocks) -> bytes:
+    return "".join(f"{a},{b},{n},{lo},{hi}\n" for a, b, n, lo, hi in blocks).encode("utf-8")
+
+class EventIndex:
+    def __init__(self, events_csv: Path = EVENTS_CSV, every: int = INDEX_EVERY):
+        self.events_csv = Path(events_csv)
+        self.path = index_path_for(self.events_csv)
+        self.every = every
+        self.blocks: List[Tuple[int, int, int, str, str]] = []
+        self.header: List[str] = []
+        self.data_start = 0
+        self.bytes_read = 0  # De la última consulta (para ver cuánto se ahorró)
+        self._prefix_max: List[str] = []
+        self._suffix_min: List[str] = []
+        self._load()
+
+    # ---------- persistencia ----------
+    def _load(self):
+        try:
+            self.blocks, _ = _parse_blocks(self.path.read_bytes())
+        except OSError:
+            self.blocks = []
+        self._read_header()
+        self._rebuild_bounds()
+
+    def _read_header(self):
+        try:
+            with self.events_csv.open("rb") as f:
+                line = f.readline()
+        except OSError:
+            return
+        self.header = next(csv.reader([line.decode("utf-8", errors="replace")]), [])
+        self.data_start = len(line)
+
+    def _rebuild_bounds(self):
+        self._prefix_max, self._suffix_min = [], []
+        hi = ""
+        for blk in self.blocks:
+            hi = max(hi, blk[4]); self._prefix_max.append(hi)
+        lo = _MAX_TS
+        for blk in reversed(self.blocks):
+            lo = min(lo, blk[3]); self._suffix_min.append(lo)
+        self._suffix_min.reverse()
+
+    @property
+    def indexed_end(self) -> int:
+        return self.blocks[-1][1] if self.blocks else self.data_start
+
+    # ---------- mantenimiento incremental ----------
+    def update(self) -> int:
+        """Indexa los bloques completos nuevos. Devuelve cuántos bloques agregó este proceso."""
+        try:
+            size = self.events_csv.stat().st_size
+        except OSError:
+            return 0
+        if not self.header: self._read_header()
+        nuevos = []
+        with self.path.open("a+b") as fi, _locked(fi):
+            # Otro proceso pudo agregar bloques desde la última vez: releo bajo el lock
+            fi.seek(0)
+            self.blocks, limpio = _parse_blocks(fi.read())
+            if size < self.indexed_end:
+                print("[INFO] events.csv se achicó: reconstruyo el índice.")
+                fi.truncate(0)
+                self.blocks = []
+                self._read_header()
+            elif not limpio:
+                # Si no, lo roto quedaría en el archivo y lo que sigue se volvería a agregar en cada update
+                print("[WARN] events.csv.idx tenía líneas rotas o repetidas: lo reescribo con los bloques buenos.")
+                fi.truncate(0)
+                fi.write(_format_blocks(self.blocks))
+            with self.events_csv.open("rb") as f:
+                f.seek(self.indexed_end)
+                pos = self.indexed_end
+                ts_col = self.header.index("timestamp") if "timestamp" in self.header else 0
+                start, rows, lo, hi = pos, 0, _MAX_TS, ""
+                for line in f:
+                    if not line.endswith(b"\n"): break  # Línea a medio escribir
+                    pos += len(line)
+                    ts = _timestamp(line, ts_col)
+                    rows += 1
+                    if len(ts) >= 19 and ts[4] == "-":
+                        lo, hi = min(lo, ts[:19]), max(hi, ts[:19])
+                    if rows == self.every:
+                        nuevos.append((start, pos, rows, lo if hi else "", hi))
+                        start, rows, lo, hi = pos, 0, _MAX_TS, ""
+            if nuevos:
+                fi.write(_format_blocks(nuevos))
+                fi.flush()
+                self.blocks.extend(nuevos)
+        self._rebuild_bounds()
+        return len(nuevos)
+
+    def rebuild(self) -> int:
+        with self.path.open("a+b") as fi, _locked(fi):
+            fi.truncate(0)
+        self.blocks = []
+        self._read_header()
+        return self.update()
+
+    # ---------- consultas ----------
+    def _ranges(self, start: str, end: str) -> List[Tuple[int, int]]:
+        """Rangos de bytes a leer para [start, end] (bloques candidatos + cola sin indexar)."""
+        i0 = bisect.bisect_left(self._prefix_max, start)       # Antes de i0 todo es < start
+        i1 = bisect.bisect_right(self._suffix_min, end)        # Desde i1 todo es > end
+        out: List[Tuple[int, int]] = []
+        for a, b, _, lo, hi in self.blocks[i0:i1]:
+            if hi and (hi < start or lo > end): continue
+            if out and out[-1][1] == a: out[-1] = (out[-1][0], b)  # Junto bloques contiguos
+            else: out.append((a, b))
+        try: size = self.events_csv.stat().st_size
+        except OSError: size = self.indexed_end
+        if size > self.indexed_end:
+            out.append((self.indexed_end, size))
+        return out
+
+    def query(self, start: str, end: str, cam_id: Optional[str] = None,
+              name: Optional[str] = None, refresh: bool = True) -> Iterator[Dict[str, str]]:
+        """
+        Filas con start <= timestamp <= end ('YYYY-MM-DD HH:MM[:SS]'), opcionalmente
+        de una cámara o identidad, como dicts con las columnas del CSV.
+        """
+        if refresh: self.update()
+        start, end = start[:19], (end + ":59" if len(end) == 16 else end)[:19]
+        self.bytes_read = 0
+        cols = self.header
+        with self.events_csv.open("rb") as f:
+            for a, b in self._ranges(start, end):
+                f.seek(a)
+                chunk = f.read(b - a)
+                self.bytes_read += len(chunk)
+                cut = chunk.rfind(b"\n")
+                if cut < 0: continue
+                for row in csv.reader(io.StringIO(chunk[:cut + 1].decode("utf-8", errors="replace"))):
+                    if len(row) < len(cols): continue
+                    r = dict(zip(cols, row))
+                    ts = r.get("timestamp", "")[:19]
+                    if not (start <= ts <= end): continue
+                    if cam_id is not None and r.get("cam_id") != str(cam_id): continue
+                    if name is not None and r.get("name") != name: continue
+                    yield r
+
+def main():
+    ap = argparse.ArgumentParser(description="Consulta events.csv por rango de hora usando el índice")
+    ap.add_argument("--desde", required=True, help="'YYYY-MM-DD HH:MM[:SS]'")
+    ap.add_argument("--hasta", required=True)
+    ap.add_argument("--cam", default=None)
+    ap.add_argument("--nombre", default=None)
+    ap.add_argument("--events", default=str(EVENTS_CSV))
+    ap.add_argument("--rebuild", action="store_true")
+    args = ap.parse_args()
+    idx = EventIndex(Path(args.events))
+    if args.rebuild: idx.rebuild()
+    n = 0
+    for r in idx.query(args.desde, args.hasta, cam_id=args.cam, name=args.nombre):
+        print(r.get("timestamp"), r.get("cam_id"), r.get("name"), r.get("decision"), r.get("distancia"))
+        n += 1
+    total = os.path.getsize(args.events) if os.path.exists(args.events) else 0
+    print(f"[OK] {n} eventos | leídos {idx.bytes_read/1024:.1f} KB de {total/1024:.1f} KB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# src/gallery.py
+# La "galería": los encodings entrenados y el nombre de cada uno.
+# La envuelvo en un objeto inmutable para poder cargarla cuando haga falta
+# (no al importar) y reemplazarla de un golpe sin tocar el bucle.
+# Si el pickle trae prototipos (ver src/compact_gallery.py), la búsqueda es en dos
+# pasos: primero contra unos pocos prototipos por estudiante y después, exacta,
+# solo contra los encodings de los SHORTLIST estudiantes más cercanos.
+# Si viene cuantizada (ver src/quantize.py), `encodings` es un mmap del disco y el
+# recorrido completo se hace sobre los códigos int8/float16; solo los mejores
+# candidatos se leen y se comparan en float64.
+# Con un índice IVF (src/ann.py, solo para galerías grandes) los candidatos salen
+# de unas pocas listas y también se re-rankean en float64.
+# Los encodings salen de face_recognition con model=ENCODER_MODEL (alineación con
+# los 68 puntos, ver src/landmarks.py); el pickle lo anota en "encoder". Una galería
+# de encodings de 5 puntos ("small", la de antes) no es comparable: hay que reentrenar.
+
+import os, pickle, threading, time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+ENCODING_DIM = 128
+ENCODER_MODEL = "large"  # Igual en entrenamiento y en vivo (face_encodings(..., model=ENCODER_MODEL))
+SHORTLIST = 4  # Estudiantes candidatos que pasan a la comparación exacta
+BATCH_CAND = 8      # nearest_many: finalistas por cara que pasan a la distancia exacta
+BATCH_BLOCK = 65536 # nearest_many: filas de la galería por bloque
+
+class Gallery:
+    def __init__(self, encodings, names: List[str], path: str = "", mtime: float = 0.0,
+                 prototypes=None, proto_names: Optional[List[str]] = None, quant=None, ann=None,
+                 encoder: str = ENCODER_MODEL):
+        enc = np.asarray(encodings, dtype=np.float64)  # Si ya es float64 (o mmap) no se copia
+        self.encodings = enc.reshape(-1, ENCODING_DIM) if enc.size else np.empty((0, ENCODING_DIM))
+        self.names = list(names)
+        self.path = str(path)
+        self.mtime = mtime
+        self.quant = quant
+        self.ann = ann
+        self.encoder = encoder
+        self.prototypes = None
+        self.proto_names: List[str] = []
+        self._rows: Dict[str, np.ndarray] = {}
+        self._sq: Optional[np.ndarray] = None  # ||e||² de cada encoding (para nearest_many)
+        if prototypes is not None and proto_names:
+            self.prototypes = np.asarray(prototypes, dtype=np.float64).reshape(-1, ENCODING_DIM)
+            self.proto_names = list(proto_names)
+            rows: Dict[str, List[int]] = {}
+            for i, n in enumerate(self.names):
+                rows.setdefault(n, []).append(i)
+            self._rows = {n: np.asarray(r, dtype=np.intp) for n, r in rows.items()}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def identities(self) -> Set[str]:
+        return set(self.names)
+
+    def distances(self, encoding) -> np.ndarray:
+        """Lo mismo que face_recognition.face_distance, sin importar dlib."""
+        if len(self) == 0: return np.empty((0,))
+        return np.linalg.norm(self.encodings - encoding, axis=1)
+
+    def nearest(self, encoding, exclude: int = -1) -> Tuple[int, float, float]:
+        """
+        (índice del encoding más cercano, su distancia, distancia del segundo).
+        Con prototipos, el costo depende de la cantidad de estudiantes y no de fotos.
+        `exclude` deja afuera un índice (para usar la galería como set de calibración).
+        """
+        if self.ann is not None:
+            from src.ann import RERANK
+            rows = self.ann.candidates(encoding, RERANK + (exclude >= 0))
+            d = np.linalg.norm(self.encodings[rows] - encoding, axis=1)
+        elif self.prototypes is not None and len(self.proto_names) > 0:
+            pd_ = np.linalg.norm(self.prototypes - encoding, axis=1)
+            cand: List[str] = []
+            for i in np.argsort(pd_):
+                n = self.proto_names[int(i)]
+                if n not in cand:
+                    cand.append(n)
+                    if len(cand) == SHORTLIST: break
+            rows = np.concatenate([self._rows[n] for n in cand if n in self._rows])
+            d = np.linalg.norm(self.encodings[rows] - encoding, axis=1)
+        elif self.quant is not None:
+            from src.quantize import RERANK
+            rows = self.quant.candidates(encoding, RERANK + (exclude >= 0))
+            d = np.linalg.norm(self.encodings[rows] - encoding, axis=1)
+        else:
+            d = self.distances(encoding)
+            rows = None
+        if exclude >= 0:
+            d = np.where((rows if rows is not None else np.arange(d.size)) == exclude, np.inf, d)
+        if d.size == 0:
+            return -1, 1.0, 1.0
+        order = np.argsort(d)
+        best = int(order[0])
+        if not np.isfinite(d[best]):
+            return -1, 1.0, 1.0
+        second = float(d[order[1]]) if len(order) > 1 and np.isfinite(d[order[1]]) else 1.0
+        return (int(rows[best]) if rows is not None else best), float(d[best]), second
+
+    def nearest_many(self, encodings) -> List[Tuple[int, float, float]]:
+        """
+        nearest() para varias caras a la vez (p. ej. un micro-lote del servicio).
+        En la búsqueda exacta, un producto matricial por bloque preselecciona
+        BATCH_CAND finalistas por cara y la distancia exacta decide, así que el
+        resultado es el mismo que llamar nearest() cara por cara.
+        Con índice, cuantización o prototipos, se usa nearest() por cara.
+        """
+        Q = np.asarray(encodings, dtype=np.float64).reshape(-1, ENCODING_DIM)
+        if len(Q) == 0: return []
+        if (self.ann is not None or self.quant is not None or self.prototypes is not None
+                or len(self) <= BATCH_CAND):
+            return [self.nearest(q) for q in Q]
+        if self._sq is None:
+            self._sq = (self.encodings ** 2).sum(axis=1)
+        k = BATCH_CAND
+        cand_d = np.full((len(Q), k), np.inf); cand_i = np.zeros((len(Q), k), dtype=np.int64)
+        for a in range(0, len(self), BATCH_BLOCK):
+            d2 = self._sq[None, a:a+BATCH_BLOCK] - 2.0 * Q @ self.encodings[a:a+BATCH_BLOCK].T
+            kk = min(k, d2.shape[1])
+            part = np.argpartition(d2, kk - 1, axis=1)[:, :kk]
+            all_d = np.concatenate([cand_d, np.take_along_axis(d2, part, axis=1)], axis=1)
+            all_i = np.concatenate([cand_i, part + a], axis=1)
+            keep = np.argpartition(all_d, k - 1, axis=1)[:, :k]
+            cand_d, cand_i = np.take_along_axis(all_d, keep, axis=1), np.take_along_axis(all_i, keep, axis=1)
+        out = []
+        for q, rows in zip(Q, cand_i):
+            d = np.linalg.norm(self.encodings[rows] - q, axis=1)
+            order = np.argsort(d)
+            out.append((int(rows[order[0]]), float(d[order[0]]), float(d[order[1]])))
+        return out
+
+    def validate(self):
+        """Lanza ValueError si la galería no sirve para reconocer."""
+        if self.encodings.shape[0] != len(self.names):
+            raise ValueError(f"{self.encodings.shape[0]} encodings pero {len(self.names)} nombres")
+        if self.encodings.shape[1] != ENCODING_DIM:
+            raise ValueError(f"Encodings de dimensión {self.encodings.shape[1]} (se esperaba {ENCODING_DIM})")
+        if self.quant is not None:
+            # No recorro el mmap entero: basta con los códigos, que son los que se buscan
+            if len(self.quant.codes) != len(self.names):
+                raise ValueError(f"{len(self.quant.codes)} códigos pero {len(self.names)} nombres")
+            if not (np.isfinite(self.quant.scale).all() and np.isfinite(self.quant.center).all()):
+                raise ValueError("La cuantización tiene escala/centro NaN/inf")
+        elif not np.isfinite(self.encodings).all():
+            raise ValueError("La galería tiene valores NaN/inf")
+        if self.prototypes is not None:
+            if self.prototypes.shape[0] != len(self.proto_names):
+                raise ValueError(f"{self.prototypes.shape[0]} prototipos pero {len(self.proto_names)} nombres")
+            if set(self.proto_names) != self.identities:
+                raise ValueError("Los prototipos no cubren las mismas identidades que la galería")
+
+    def diff(self, other: "Gallery") -> Tuple[Set[str], Set[str]]:
+        """(agregados, eliminados) de `other` respecto a esta galería."""
+        return other.identities - self.identities, self.identities - other.identities
+
+def load_gallery(path) -> Gallery:
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"No se encontró el modelo entrenado: {path}")
+    if path.suffix == ".npz":
+        from src.quantize import load_quantized
+        g = load_quantized(path)
+    else:
+        mtime = os.path.getmtime(path)
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        g = Gallery(data["encodings"], data["names"], path=str(path), mtime=mtime,
+                    prototypes=data.get("prototypes"), proto_names=data.get("proto_names"),
+                    encoder=data.get("encoder", "small"))  # Los pickles viejos no lo anotan: 5 puntos
+    if g.encoder != ENCODER_MODEL:
+        print(f"[WARN] {path} tiene encodings model='{g.encoder}' y el reconocimiento usa model='{ENCODER_MODEL}': "
+              f"las distancias no son comparables. Reentrenar: python -m src.train_model_mtcnn")
+    from src.ann import load_for
+    g.ann = load_for(path, g)  # None si la galería es chica o no hay índice para esta versión
+    return g
+
+class GalleryWatcher:
+    """
+    Vigila el archivo de la galería (y una bandera de recarga) en un hilo aparte.
+    Cuando cambia, carga la nueva galería en segundo plano, la valida y llama a
+    `on_swap(nueva)`; el bucle sigue reconociendo con la vieja mientras tanto.
+    Si la nueva no es válida, se queda la anterior y solo se avisa en consola.
+    """
+    def __init__(self, path, current: Gallery, on_swap, interval: float = 2.0, flag_file=None):
+        self.path = Path(path)
+        self.current = current
+        self.on_swap = on_swap
+        self.interval = interval
+        self.flag_file = Path(flag_file) if flag_file else None
+        self._forced = threading.Event()
+        self._stop = threading.Event()
+        self._rejected_mtime: Optional[float] = None  # mtime del último archivo que no pasó la validación
+        self._thread = threading.Thread(target=self._run, name="gallery-watch", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def request_reload(self):
+        """Recarga aunque el mtime no haya cambiado (señal, bandera o comando)."""
+        self._forced.set()
+
+    def _stable_mtime(self) -> float:
+        # El entrenador escribe el pickle directamente: espero a que deje de cambiar
+        m1 = os.path.getmtime(self.path)
+        time.sleep(0.5)
+        m2 = os.path.getmtime(self.path)
+        return m2 if m1 == m2 else -1.0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            mtime = None
+            try:
+                if self.flag_file is not None and self.flag_file.exists():
+                    self.flag_file.unlink(missing_ok=True)
+                    self._forced.set()
+                forced = self._forced.is_set()
+                if not self.path.exists(): continue
+                # Un archivo ya rechazado no se reintenta hasta que cambie (o se pida a mano)
+                if not forced and os.path.getmtime(self.path) in (self.current.mtime, self._rejected_mtime): continue
+                mtime = self._stable_mtime()
+                if mtime < 0: continue
+                self._forced.clear()
+                self.reload()
+                self._rejected_mtime = None
+            except Exception as e:
+                self._rejected_mtime = mtime
+                print(f"[WARN] Recarga de galería falló, sigo con la anterior: {e}")
+
+    def reload(self) -> Optional[Gallery]:
+        t0 = time.perf_counter()
+        new = load_gallery(self.path)
+        new.validate()
+        added, removed = self.current.diff(new)
+        old = self.current
+        self.current = new
+        self.on_swap(new)
+        print(f"[GALERIA] Recargada en {time.perf_counter()-t0:.2f}s: {len(old)} -> {len(new)} encodings, "
+              f"+{len(added)} identidades {sorted(added)[:10]} | -{len(removed)} {sorted(removed)[:10]}")
+        return new
@@ -0,0 +1,116 @@
+# src/health.py
+# Endpoint HTTP local (opcional) con la salud del productor.
+# /healthz -> vivo (el bucle sigue latiendo)       200 / 503
+# /readyz  -> listo (fuente abierta y modelo cargado) 200 / 503
+# /status  -> JSON completo (fps, edad del último frame, colas, galería)
+# /metrics -> texto Prometheus de StageMetrics (si se registró)
+
+import json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from src.config import RUN_DIR
+
+PORT_FILE = RUN_DIR / "vision.port"
+STALL_S = 10.0  # Sin latido en este tiempo = productor colgado aunque el PID viva
+
+class HealthState:
+    """Estado compartido entre el bucle de visión y el servidor HTTP."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.source_open = False
+        self.paused = False
+        self.model_loaded = False
+        self.source = ""
+        self.gallery_size = 0
+        self.last_beat = 0.0
+        self.last_frame = 0.0
+        self.queues: Dict[str, int] = {}
+        self.fps_fn: Optional[Callable[[], float]] = None
+        self.metrics_fn: Optional[Callable[[], str]] = None
+
+    def update(self, **kw):
+        with self._lock:
+            for k, v in kw.items():
+                setattr(self, k, v)
+
+    def beat(self, frame: bool = False):
+        now = time.time()
+        self.last_beat = now
+        if frame: self.last_frame = now
+
+    def set_queue(self, name: str, depth: int):
+        with self._lock:
+            self.queues[name] = int(depth)
+
+    def alive(self) -> bool:
+        return self.last_beat > 0 and (time.time() - self.last_beat) < STALL_S
+
+    def ready(self) -> bool:
+        return self.alive() and self.source_open and self.model_loaded
+
+    def as_dict(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            return {
+                "alive": self.alive(),
+                "ready": self.ready(),
+                "source_open": self.source_open,
+                "model_loaded": self.model_loaded,
+                "source": self.source,
+                "paused": self.paused,
+                "uptime_s": round(now - self.started, 1),
+                "fps": round(self.fps_fn(), 2) if self.fps_fn else 0.0,
+                "last_frame_age_s": round(now - self.last_frame, 3) if self.last_frame else None,
+                "queues": dict(self.queues),
+                "gallery_size": self.gallery_size,
+            }
+
+def _make_handler(state: HealthState):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, body: bytes, ctype: str):
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, code: int, payload: Dict):
+            self._send(code, json.dumps(payload).encode("utf-8"), "application/json")
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/healthz":
+                ok = state.alive()
+                self._json(200 if ok else 503, {"alive": ok})
+            elif path == "/readyz":
+                ok = state.ready()
+                self._json(200 if ok else 503, {"ready": ok})
+            elif path in ("/", "/status"):
+                self._json(200, state.as_dict())
+            elif path == "/metrics" and state.metrics_fn:
+                self._send(200, state.metrics_fn().encode("utf-8"), "text/plain; version=0.0.4")
+            else:
+                self._json(404, {"error": "not found"})
+
+        def log_message(self, *args):
+            pass  # Sin ruido en la consola del productor
+    return Handler
+
+def serve_health(state: HealthState, port: int, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """
+    Levanto el servidor en un hilo demonio y dejo el puerto en data/run/vision.port
+    para que el panel sepa dónde preguntar.
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _make_handler(state))
+    except OSError as e:
+        print(f"[WARN] No pude abrir el endpoint de salud en {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="health-http", daemon=True).start()
+    try: PORT_FILE.write_text(str(server.server_address[1]), encoding="utf-8")
+    except Exception: pass
+    print(f"[OK] Endpoint de salud en http://{host}:{server.server_address[1]}/status")
+    return server
@@ -0,0 +1,52 @@
+# src/landmarks.py
+# Landmarks de 68 puntos calculados UNA vez por rostro y reutilizados para el
+# descriptor (encoding), el parpadeo (EAR) y la pose de la cabeza.
+# face_recognition.face_encodings y face_recognition.face_landmarks corren cada uno
+# su propio shape predictor sobre las mismas cajas; aquí se corre solo el de 68
+# puntos y ese `shape` va al modelo de reconocimiento. Es exactamente
+# face_encodings(..., model="large"): por eso todos los entrenadores usan
+# model=ENCODER_MODEL (src/gallery.py). Una galería entrenada antes (5 puntos)
+# hay que reentrenarla; load_gallery avisa si no coincide.
+#
+# Índices (convención de dlib / iBUG 68):
+#   0-16 mentón | 31-35 nariz (punta) | 36-41 ojo izq | 42-47 ojo der | 48-59 boca
+
+from typing import List, Tuple
+
+import numpy as np
+
+from src.gallery import ENCODER_MODEL
+from src.lazy import lazy_import
+
+face_recognition = lazy_import("face_recognition")
+dlib = lazy_import("dlib")
+
+LEFT_EYE = slice(36, 42)
+RIGHT_EYE = slice(42, 48)
+
+def shapes(rgb, locations) -> list:
+    """Un full_object_detection de dlib (68 puntos) por caja (top, right, bottom, left)."""
+    predictor = face_recognition.api.pose_predictor_68_point
+    return [predictor(rgb, dlib.rectangle(left, top, right, bottom)) for top, right, bottom, left in locations]
+
+def points(shape) -> np.ndarray:
+    """68×2 (x, y) int."""
+    return np.array([(p.x, p.y) for p in shape.parts()], dtype=np.int32)
+
+def descriptors(rgb, shape_list, num_jitters: int = 1) -> List[np.ndarray]:
+    """Encodings de 128-d desde los shapes de 68 puntos (= face_encodings(model=ENCODER_MODEL))."""
+    enc = face_recognition.api.face_encoder
+    return [np.array(enc.compute_face_descriptor(rgb, s, num_jitters)) for s in shape_list]
+
+def eyes(pts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return pts[LEFT_EYE], pts[RIGHT_EYE]
+
+def pose_points(pts: np.ndarray, scale: int = 1) -> dict:
+    """
+    Puntos que usa analytics.get_head_pose, con las mismas posiciones que antes
+    salían del dict de face_landmarks (nose_tip[0], chin[0], left_eye[0],
+    right_eye[3], top_lip[0], top_lip[6]).
+    """
+    p = pts * scale
+    return {30: tuple(p[31]), 8: tuple(p[0]), 36: tuple(p[36]),
+            45: tuple(p[45]), 48: tuple(p[48]), 54: tuple(p[54])}
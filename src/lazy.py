@@ -0,0 +1,30 @@
+# src/lazy.py
+# Importación diferida de módulos pesados (dlib, TensorFlow...).
+# El módulo real se importa la primera vez que alguien usa un atributo,
+# así importar src.recognize desde el panel o desde herramientas no paga
+# el costo de cargar los modelos.
+
+import importlib, threading
+
+class LazyModule:
+    def __init__(self, name: str):
+        self._name = name
+        self._mod = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._mod is None:
+            with self._lock:
+                if self._mod is None:
+                    self._mod = importlib.import_module(self._name)
+        return self._mod
+
+    @property
+    def loaded(self) -> bool:
+        return self._mod is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -0,0 +1,190 @@
+# src/metrics.py
+# Instrumentación del productor: tiempos por etapa, contadores y exportación
+# en formato de texto de Prometheus (un archivo en RUN_DIR que cualquier
+# node_exporter con textfile collector puede leer).
+
+import bisect, json, os, time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from src.config import RUN_DIR
+
+METRICS_FILE = RUN_DIR / "vision.prom"
+STARTUP_FILE = RUN_DIR / "vision.startup"
+
+# Etapas del bucle de loop_panel, en el orden en que ocurren
+STAGES = ("grab", "resize", "detect", "encode", "landmarks", "match", "pose",
+          "emotion", "snapshot", "csv", "draw", "publish")
+
+# Cubetas (segundos) pensadas para un bucle de ~30 fps en CPU
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class RollingHistogram:
+    """
+    Histograma sobre las últimas `window` muestras.
+    Así veo cómo se comporta la etapa *ahora*, no el promedio desde que arrancó.
+    Además lleva las cubetas acumuladas desde el arranque, que son las que se
+    exportan: en Prometheus un histograma nunca baja (rate/histogram_quantile).
+    """
+    def __init__(self, window: int = 512, buckets: Iterable[float] = BUCKETS):
+        self.buckets = tuple(buckets)
+        self.samples = deque(maxlen=window)
+        self.cum_counts = [0] * len(self.buckets)
+        self.cum_sum = 0.0
+        self.cum_n = 0
+
+    def observe(self, value: float):
+        self.samples.append(value)
+        i = bisect.bisect_left(self.buckets, value)  # Primera cubeta con le >= value
+        if i < len(self.buckets): self.cum_counts[i] += 1
+        self.cum_sum += value
+        self.cum_n += 1
+
+    def cumulative(self):
+        """(conteos acumulados por cubeta, suma, total) desde el arranque."""
+        counts, acc = [], 0
+        for c in list(self.cum_counts):
+            acc += c; counts.append(acc)
+        return counts, self.cum_sum, self.cum_n
+
+    def snapshot(self):
+        values = list(self.samples)
+        counts = [sum(1 for v in values if v <= le) for le in self.buckets]
+        return counts, sum(values), len(values)
+
+    def mean(self) -> float:
+        values = list(self.samples)
+        return (sum(values) / len(values)) if values else 0.0
+
+class StageMetrics:
+    def __init__(self, stages: Iterable[str] = STAGES, window: int = 512):
+        self.window = window
+        self.hist: Dict[str, RollingHistogram] = {s: RollingHistogram(window) for s in stages}
+        self.counters: Dict[str, float] = {
+            "frames_total": 0, "processed_frames_total": 0,
+            "dropped_frames_total": 0, "reconnects_total": 0,
+        }
+        self.gauges: Dict[str, float] = {}
+        self._frame_times = deque(maxlen=120)
+        self._faces = deque(maxlen=window)
+        self._last_export = 0.0
+
+    def observe(self, stage: str, seconds: float):
+        h = self.hist.get(stage)
+        if h is None:
+            h = self.hist[stage] = RollingHistogram(self.window)
+        h.observe(seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0)
+
+    def inc(self, name: str, n: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def frame_done(self):
+        self.inc("frames_total")
+        self._frame_times.append(time.monotonic())
+
+    def faces_in_frame(self, n: int):
+        self.inc("processed_frames_total")
+        self._faces.append(n)
+
+    def fps(self) -> float:
+        if len(self._frame_times) < 2: return 0.0
+        span = self._frame_times[-1] - self._frame_times[0]
+        return (len(self._frame_times) - 1) / span if span > 0 else 0.0
+
+    def faces_per_frame(self) -> float:
+        return (sum(self._faces) / len(self._faces)) if self._faces else 0.0
+
+    def render(self) -> str:
+        """Texto en formato de exposición de Prometheus."""
+        # Copias: el hilo de /metrics lee mientras el bucle agrega etapas y contadores
+        hist = list(self.hist.items())
+        out = [
+            "# HELP vision_stage_seconds Tiempo por etapa del bucle (acumulado desde el arranque).",
+            "# TYPE vision_stage_seconds histogram",
+        ]
+        for stage, h in hist:
+            counts, total, n = h.cumulative()
+            for le, c in zip(h.buckets, counts):
+                out.append(f'vision_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {c}')
+            out.append(f'vision_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {n}')
+            out.append(f'vision_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            out.append(f'vision_stage_seconds_count{{stage="{stage}"}} {n}')
+        out.append("# HELP vision_stage_window_mean_seconds Promedio por etapa en la ventana móvil.")
+        out.append("# TYPE vision_stage_window_mean_seconds gauge")
+        for stage, h in hist:
+            out.append(f'vision_stage_window_mean_seconds{{stage="{stage}"}} {h.mean():.6f}')
+
+        for name, value in list(self.counters.items()):
+            out.append(f"# TYPE vision_{name} counter")
+            out.append(f"vision_{name} {value}")
+
+        gauges = dict(self.gauges)
+        gauges["fps"] = round(self.fps(), 3)
+        gauges["faces_per_frame"] = round(self.faces_per_frame(), 3)
+        for name, value in gauges.items():
+            out.append(f"# TYPE vision_{name} gauge")
+            out.append(f"vision_{name} {value}")
+        return "\n".join(out) + "\n"
+
+    def export(self, path: Path = METRICS_FILE):
+        """Escritura atómica: el colector nunca lee un archivo a medias."""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            tmp.write_text(self.render(), encoding="utf-8")
+            os.replace(tmp, path)
+        except Exception:
+            pass
+
+    def maybe_export(self, every_s: float = 5.0, path: Optional[Path] = None):
+        now = time.monotonic()
+        if now - self._last_export >= every_s:
+            self._last_export = now
+            self.export(path or METRICS_FILE)
+
+    def summary(self) -> str:
+        """Una línea legible con el promedio (ms) de cada etapa, para el log."""
+        parts = [f"{s}={h.mean()*1000:.1f}" for s, h in list(self.hist.items()) if h.samples]
+        return f"fps={self.fps():.1f} " + " ".join(parts)
+
+class StartupTimeline:
+    """
+    Línea de tiempo del arranque (import, galería, cámara, primer frame,
+    primera detección). Cada hito se imprime y se deja en data/run/vision.startup
+    para que el panel muestre en qué fase va el productor.
+    """
+    def __init__(self, t0: Optional[float] = None, path: Path = STARTUP_FILE):
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.path = Path(path)
+        self.marks: Dict[str, float] = {}
+        self._write()
+
+    def has(self, name: str) -> bool:
+        return name in self.marks
+
+    def mark(self, name: str, once: bool = True):
+        if once and name in self.marks: return
+        self.marks[name] = round(time.perf_counter() - self.t0, 3)
+        print(f"[STARTUP] {name} +{self.marks[name]:.2f}s")
+        self._write()
+
+    def _write(self):
+        try:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps({"pid": os.getpid(), "marks": self.marks}), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
@@ -0,0 +1,354 @@
+# src/mjpeg.py
+# Cliente MJPEG (HTTP multipart/x-mixed-replace) con asyncio: muchas cámaras IP en
+# un solo hilo con un solo event loop, en vez de un cv2.VideoCapture bloqueante (y
+# un hilo) por URL. Las URL tipo DroidCam (.../mjpegfeed) son exactamente esto.
+#
+# - Cada parte del multipart se guarda como bytes JPEG SIN decodificar; solo se
+#   decodifica cuando alguien pide el frame (latest / read). Si el consumidor
+#   procesa 1 de cada 3, los otros 2 nunca pasan por cv2.imdecode.
+# - Soporta partes con Content-Length y sin él (se busca el siguiente boundary).
+# - Reconexión con espera exponencial (BACKOFF_MIN..BACKOFF_MAX, con jitter) si la
+#   conexión se cae o deja de llegar video por STALL_S.
+# - Qué es MJPEG lo decide la respuesta (Content-Type multipart/x-mixed-replace), no
+#   la URL: si el servidor responde otra cosa (un .mp4, HLS...) el stream se marca
+#   not_mjpeg, no se reintenta y quien espera el primer frame se entera en el acto.
+#
+# MJPEGHub     -> event loop en un hilo demonio con N streams; latest(nombre), stats()
+# MJPEGCapture -> adaptador con read()/release()/get() como cv2.VideoCapture, para
+#                 usarlo en capture_faces.open_url / read_loop sin tocar el bucle
+# serve_fake   -> servidor MJPEG local de prueba (con cortes para probar reconexión)
+#
+# Uso:
+#   python -m src.mjpeg --fake 8089 --streams 24 --seconds 10   # prueba local
+#   python -m src.mjpeg http://192.168.1.20:4747/mjpegfeed http://192.168.1.21:4747/mjpegfeed
+
+import argparse, asyncio, random, threading, time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+BACKOFF_MIN = 0.5
+BACKOFF_MAX = 30.0
+STALL_S = 5.0            # Sin partes nuevas en este tiempo = reconectar
+CONNECT_TIMEOUT_S = 5.0
+READ_LIMIT = 8 * 2**20   # Tamaño máximo de una parte (JPEG) en bytes
+
+class NotMJPEG(ConnectionError):
+    """El servidor respondió, pero no con multipart/x-mixed-replace."""
+
+def is_mjpeg_url(url: str) -> bool:
+    """URLs http(s): candidatas a MJPEG. La respuesta decide (ver MJPEGStream.not_mjpeg)."""
+    return (url or "").lower().startswith(("http://", "https://"))
+
+class MJPEGStream:
+    """Un stream. Vive en el event loop del hub; latest()/wait_new() se llaman desde otros hilos."""
+    def __init__(self, url: str, name: Optional[str] = None, every: int = 1):
+        self.url = url
+        self.name = name or url
+        self.every = max(1, int(every))  # Guardar solo 1 de cada `every` partes
+        self._cond = threading.Condition()
+        self._jpeg: Optional[bytes] = None
+        self._seq = 0
+        self._ts = 0.0
+        self._decoded: Tuple[int, Optional[np.ndarray]] = (-1, None)
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+        self.not_mjpeg = False  # La respuesta no fue multipart: no se reintenta
+        self.stats = {"parts": 0, "kept": 0, "decoded": 0, "bytes": 0, "reconnects": 0, "errors": 0}
+        self.last_error = ""
+
+    # ---------- lado consumidor (cualquier hilo) ----------
+    def latest(self) -> Tuple[int, Optional[np.ndarray]]:
+        """(seq, frame BGR) de la última parte; decodifica solo si es nueva."""
+        with self._cond:
+            seq, jpeg = self._seq, self._jpeg
+        if jpeg is None:
+            return 0, None
+        dseq, frame = self._decoded
+        if dseq != seq:
+            frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            self._decoded = (seq, frame)
+            self.stats["decoded"] += 1
+        return seq, frame
+
+    def wait_new(self, after_seq: int, timeout: float) -> bool:
+        """True si llegó una parte después de after_seq; False al vencer o si no es MJPEG."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq or self.not_mjpeg, timeout=timeout)
+            return self._seq > after_seq
+
+    def age_s(self) -> Optional[float]:
+        return (time.time() - self._ts) if self._ts else None
+
+    # ---------- lado asyncio ----------
+    def _publish(self, jpeg: bytes):
+        self.stats["parts"] += 1
+        self.stats["bytes"] += len(jpeg)
+        if self.stats["parts"] % self.every: return
+        with self._cond:
+            self._jpeg, self._seq, self._ts = jpeg, self._seq + 1, time.time()
+            self._cond.notify_all()
+        self.stats["kept"] += 1
+
+    async def run(self):
+        backoff = BACKOFF_MIN
+        while True:
+            t_start = time.monotonic()
+            try:
+                await self._session()
+            except asyncio.CancelledError:
+                raise
+            except NotMJPEG as e:
+                self.last_error = str(e)
+                with self._cond:
+                    self.not_mjpeg = True
+                    self._cond.notify_all()
+                return
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+            self.connected = False
+            if time.monotonic() - t_start > BACKOFF_MAX:
+                backoff = BACKOFF_MIN  # Estuvo bien un buen rato: empiezo de nuevo desde abajo
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(backoff * random.uniform(0.8, 1.2))
+            backoff = min(BACKOFF_MAX, backoff * 2)
+
+    async def _session(self):
+        u = urlsplit(self.url)
+        port = u.port or (443 if u.scheme == "https" else 80)
+        path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(u.hostname, port, ssl=(u.scheme == "https") or None, limit=READ_LIMIT),
+            timeout=CONNECT_TIMEOUT_S)
+        try:
+            # HTTP/1.0: sin chunked, el servidor manda el multipart tal cual
+            writer.write(f"GET {path} HTTP/1.0\r\nHost: {u.hostname}\r\nUser-Agent: vision-mjpeg\r\n"
+                         f"Accept: multipart/x-mixed-replace\r\n\r\n".encode("latin-1"))
+            await writer.drain()
+            status = (await asyncio.wait_for(reader.readline(), STALL_S)).decode("latin-1").split()
+            if len(status) < 2 or status[1] != "200":
+                raise ConnectionError(f"respuesta HTTP {' '.join(status[1:]) or 'vacía'}")
+            headers = await _read_headers(reader)
+            ctype = headers.get("content-type", "")
+            if "multipart/x-mixed-replace" not in ctype.lower() or "boundary=" not in ctype:
+                raise NotMJPEG(f"no es multipart: {ctype!r}")
+            boundary = ctype.split("boundary=", 1)[1].split(";")[0].strip().strip('"').lstrip("-").encode("latin-1")
+            self.connected = True
+            await self._parts(reader, boundary)
+        finally:
+            writer.close()
+            try: await writer.wait_closed()
+            except Exception: pass
+
+    async def _parts(self, reader: asyncio.StreamReader, boundary: bytes):
+        marker = b"--" + boundary
+        at_part = False  # True si el último read ya consumió el boundary
+        while True:
+            if not at_part:
+                # Hasta la línea del boundary (puede haber líneas en blanco o un preámbulo)
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), STALL_S)
+                    if not line: raise ConnectionError("el servidor cerró el stream")
+                    if line.strip().lstrip(b"-") == boundary: break
+            else:
+                await asyncio.wait_for(reader.readline(), STALL_S)  # Resto de la línea del boundary
+            headers = await asyncio.wait_for(_read_headers(reader), STALL_S)
+            n = headers.get("content-length")
+            if n and n.isdigit():
+                jpeg = await asyncio.wait_for(reader.readexactly(int(n)), STALL_S)
+                at_part = False
+            else:
+                data = await asyncio.wait_for(reader.readuntil(marker), STALL_S)
+                jpeg = data[:-len(marker)].rstrip(b"-").rstrip(b"\r\n")
+                at_part = True
+            self._publish(jpeg)
+
+async def _read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+    h: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if not line: raise ConnectionError("el servidor cerró el stream")
+        line = line.strip()
+        if not line:
+            if h: return h
+            continue  # Líneas en blanco antes de los encabezados
+        k, _, v = line.decode("latin-1").partition(":")
+        h[k.strip().lower()] = v.strip()
+
+class MJPEGHub:
+    """Un event loop (en su propio hilo) con todos los streams."""
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.streams: Dict[str, MJPEGStream] = {}
+        self._thread = threading.Thread(target=self.loop.run_forever, name="mjpeg-hub", daemon=True)
+        self._thread.start()
+
+    def add(self, url: str, name: Optional[str] = None, every: int = 1) -> MJPEGStream:
+        s = MJPEGStream(url, name, every)
+        def _start():
+            s._task = self.loop.create_task(s.run())
+        self.streams[s.name] = s
+        self.loop.call_soon_threadsafe(_start)
+        return s
+
+    def remove(self, name: str):
+        s = self.streams.pop(name, None)
+        if s is not None and s._task is not None:
+            self.loop.call_soon_threadsafe(s._task.cancel)
+
+    def latest(self, name: str) -> Optional[np.ndarray]:
+        s = self.streams.get(name)
+        return s.latest()[1] if s is not None else None
+
+    def stats(self) -> Dict[str, Dict]:
+        return {n: dict(s.stats, connected=s.connected, age_s=s.age_s(), error=s.last_error)
+                for n, s in self.streams.items()}
+
+    async def _cancelar(self):
+        tareas = [s._task for s in self.streams.values() if s._task is not None]
+        self.streams.clear()
+        # wait_for (3.10/3.11) puede tragarse la cancelación si la lectura termina justo a la vez: reintento
+        while tareas:
+            for t in tareas: t.cancel()
+            _, tareas = await asyncio.wait(tareas, timeout=0.2)
+
+    def stop(self, timeout: float = 2.0):
+        """Cancela los streams, espera a que cierren sus conexiones y detiene el loop."""
+        try: asyncio.run_coroutine_threadsafe(self._cancelar(), self.loop).result(timeout)
+        except Exception: pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+_hub: Optional[MJPEGHub] = None
+_hub_lock = threading.Lock()
+
+def get_hub() -> MJPEGHub:
+    """Hub compartido del proceso (se crea la primera vez)."""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = MJPEGHub()
+    return _hub
+
+class MJPEGCapture:
+    """
+    Lo mínimo de cv2.VideoCapture que usa el proyecto (read, isOpened, get, release).
+    read() devuelve la parte más nueva que no se leyó todavía; las que llegaron en
+    el medio se descartan sin decodificar.
+    """
+    def __init__(self, url: str, hub: Optional[MJPEGHub] = None, read_timeout: float = 1.0):
+        self.hub = hub or get_hub()
+        self.name = f"{url}#{id(self)}"
+        self.stream = self.hub.add(url, self.name)
+        self.read_timeout = read_timeout
+        self._last = 0
+        self._shape: Tuple[int, ...] = (0, 0)
+        self._open = True
+
+    def isOpened(self) -> bool:
+        return self._open
+
+    def read(self, image=None):
+        # `image` se acepta por compatibilidad con read_loop(reuse_buffer=True); imdecode siempre crea uno nuevo
+        if not self._open or not self.stream.wait_new(self._last, self.read_timeout):
+            return False, None
+        seq, frame = self.stream.latest()
+        self._last = seq
+        if frame is None:
+            return False, None
+        self._shape = frame.shape
+        return True, frame
+
+    def get(self, prop) -> float:
+        if prop == cv2.CAP_PROP_FRAME_WIDTH: return float(self._shape[1]) if len(self._shape) > 1 else 0.0
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT: return float(self._shape[0])
+        return 0.0
+
+    def set(self, prop, value) -> bool:
+        return False
+
+    def release(self):
+        if self._open:
+            self._open = False
+            self.hub.remove(self.name)
+
+# ---------- servidor de prueba ----------
+def _frames_prueba(n: int = 30, w: int = 640, h: int = 480) -> List[bytes]:
+    out = []
+    for i in range(n):
+        img = np.full((h, w, 3), (40 + 5 * i) % 255, dtype=np.uint8)
+        cv2.putText(img, f"frame {i}", (30, h // 2), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3)
+        out.append(cv2.imencode(".jpg", img)[1].tobytes())
+    return out
+
+async def serve_fake(port: int = 0, fps: float = 15.0, with_length: bool = True,
+                     drop_after: int = 0, host: str = "127.0.0.1") -> asyncio.AbstractServer:
+    """
+    Servidor MJPEG local. with_length=False manda partes sin Content-Length;
+    drop_after=N corta cada conexión después de N partes (para probar reconexión).
+    """
+    frames = _frames_prueba()
+
+    async def handle(reader, writer):
+        try:
+            await _read_headers(reader)  # Pedido GET
+            writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary=frame\r\n\r\n")
+            i = 0
+            while not drop_after or i < drop_after:
+                jpeg = frames[i % len(frames)]
+                head = b"--frame\r\nContent-Type: image/jpeg\r\n"
+                if with_length: head += f"Content-Length: {len(jpeg)}\r\n".encode("latin-1")
+                writer.write(head + b"\r\n" + jpeg + b"\r\n")
+                await writer.drain()
+                i += 1
+                await asyncio.sleep(1.0 / fps)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+def main():
+    ap = argparse.ArgumentParser(description="Cliente MJPEG asyncio para varias cámaras HTTP")
+    ap.add_argument("urls", nargs="*")
+    ap.add_argument("--fake", type=int, default=None, metavar="PORT", help="Levantar un servidor de prueba en este puerto")
+    ap.add_argument("--streams", type=int, default=8, help="Con --fake: cuántos clientes conectar")
+    ap.add_argument("--fps", type=float, default=15.0, help="Con --fake: fps del servidor")
+    ap.add_argument("--drop-after", type=int, default=0, help="Con --fake: cortar cada conexión tras N partes")
+    ap.add_argument("--no-length", action="store_true", help="Con --fake: partes sin Content-Length")
+    ap.add_argument("--every", type=int, default=3, help="Procesar 1 de cada N frames (los demás no se decodifican)")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    args = ap.parse_args()
+
+    hub = MJPEGHub()
+    urls = list(args.urls)
+    if args.fake is not None:
+        fut = asyncio.run_coroutine_threadsafe(
+            serve_fake(args.fake, args.fps, with_length=not args.no_length, drop_after=args.drop_after), hub.loop)
+        server = fut.result(timeout=5)
+        port = server.sockets[0].getsockname()[1]
+        urls += [f"http://127.0.0.1:{port}/mjpegfeed?c={i}" for i in range(args.streams)]
+        print(f"[OK] Servidor MJPEG de prueba en http://127.0.0.1:{port}/mjpegfeed")
+    if not urls:
+        ap.error("Indica URLs o --fake PORT")
+
+    streams = [hub.add(u, f"cam{i}", every=args.every) for i, u in enumerate(urls)]
+    t_end = time.time() + args.seconds
+    while time.time() < t_end:
+        # Consumidor de ejemplo: toma el frame más nuevo de cada cámara (solo ese se decodifica)
+        for s in streams: s.latest()
+        time.sleep(0.1)
+
+    print(f"\n{'stream':<8} {'partes':>7} {'guard.':>7} {'decod.':>7} {'MB':>7} {'reconex':>8} {'edad s':>7}  error")
+    for n, st in hub.stats().items():
+        age = f"{st['age_s']:.2f}" if st["age_s"] is not None else "-"
+        print(f"{n:<8} {st['parts']:>7} {st['kept']:>7} {st['decoded']:>7} {st['bytes']/2**20:>7.1f} "
+              f"{st['reconnects']:>8} {age:>7}  {st['error']}")
+    hub.stop()
+
+if __name__ == "__main__":
+    main()
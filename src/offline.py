@@ -0,0 +1,142 @@
+# src/offline.py
+# Procesamiento offline de video grabado, más rápido que tiempo real.
+# Parto el video en trozos de tiempo, cada trozo lo procesa un proceso distinto
+# con el mismo pipeline del productor (analizar_frame) y al final junto todos
+# los eventos en un solo CSV ordenado con la hora del video.
+#
+# Uso:
+#   python -m src.offline --video grabacion.mp4 --start "2025-11-14 07:00:00"
+
+import argparse, csv, os, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import cv2
+
+from src.config import DATA_DIR
+
+OUT_DIR = DATA_DIR / "out"
+CHUNK_S = 60.0  # Duración de cada trozo (segundos de video)
+STRIDE = 3      # Igual que FRAME_SKIP=2 en vivo: analizo 1 de cada 3 frames
+
+def probe_video(path: str) -> Tuple[int, float]:
+    """Devuelve (total_frames, fps). Si el contenedor no trae fps, asumo 25."""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"No pude abrir el video: {path}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0) or 25.0
+    cap.release()
+    return total, fps
+
+def plan_chunks(total_frames: int, fps: float, chunk_s: float) -> List[Tuple[int, int]]:
+    step = max(1, int(round(chunk_s * fps)))
+    return [(s, min(total_frames, s + step)) for s in range(0, total_frames, step)]
+
+def _procesar_chunk(args):
+    """
+    Trabajo de un proceso: recorre [start, end) del video y devuelve los eventos.
+    Arranco unos frames antes (warm-up) para que la ventana de votos llegue
+    "caliente" al inicio del trozo; los eventos del warm-up se descartan.
+    """
+    path, start, end, fps, stride, cam_id, t0_iso, with_emotion = args
+    # Importo aquí: cada proceso carga su propia galería y modelos
+    from src import recognize
+    from src.metrics import StageMetrics
+
+    warm = recognize.VOTES_WINDOW * stride
+    first = max(0, start - warm)
+    t0 = datetime.fromisoformat(t0_iso)
+
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    recent_votes = deque(maxlen=recognize.VOTES_WINDOW)
+    liveness_states = {}
+    metrics = StageMetrics()
+    events = []
+
+    idx = first
+    while idx < end:
+        # grab() avanza sin convertir el frame; solo decodifico los que voy a analizar
+        if (idx - first) % stride != 0:
+            if not cap.grab(): break
+            idx += 1; continue
+        ok, frame = cap.read()
+        if not ok or frame is None: break
+
+        faces = recognize.analizar_frame(frame, recent_votes, liveness_states, metrics, with_emotion=with_emotion)
+        if idx >= start:
+            ts = t0 + timedelta(seconds=idx / fps)
+            for face in faces:
+                if face["decision"] not in ("ACCESO", "ALERTA"): continue
+                nombre, codigo, grado = recognize.enriquecer(face["name"])
+                events.append([
+                    ts.strftime("%Y-%m-%d %H:%M:%S"), cam_id, nombre, codigo, grado,
+                    f"{face['dist']:.2f}", "accepted" if face["decision"] == "ACCESO" else "rejected",
+                    f"{face['attn_status']}|{face['emotion']}", "",
+                ])
+        idx += 1
+
+    cap.release()
+    return start, events, metrics.counters.get("processed_frames_total", 0)
+
+def procesar_video(path: str, out_csv: Optional[Path] = None, workers: Optional[int] = None,
+                   chunk_s: float = CHUNK_S, stride: int = STRIDE, cam_id: str = "video",
+                   start: Optional[datetime] = None, with_emotion: bool = False) -> Path:
+    from src.recognize import EVENT_COLUMNS
+
+    total, fps = probe_video(path)
+    if total <= 0:
+        raise RuntimeError("El video no reporta número de frames; no puedo partirlo en trozos.")
+    chunks = plan_chunks(total, fps, chunk_s)
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    t0 = start or datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=total / fps)
+    out_csv = Path(out_csv) if out_csv else OUT_DIR / f"offline_{Path(path).stem}.csv"
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+
+    print(f"[INFO] {total} frames a {fps:.1f} fps ({total/fps/60:.1f} min) -> {len(chunks)} trozos con {workers} procesos")
+    t_start = time.time()
+    results, analizados = [], 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futs = [pool.submit(_procesar_chunk, (path, a, b, fps, stride, cam_id, t0.isoformat(), with_emotion))
+                for a, b in chunks]
+        for n, fut in enumerate(as_completed(futs), 1):
+            chunk_start, events, frames_done = fut.result()
+            results.append((chunk_start, events))
+            analizados += frames_done
+            print(f"🧾 Trozo {n}/{len(chunks)} listo ({len(events)} eventos)")
+
+    # Los trozos no se solapan en eventos, así que basta ordenar por inicio y luego por hora
+    merged = [ev for _, evs in sorted(results, key=lambda r: r[0]) for ev in evs]
+    merged.sort(key=lambda ev: ev[0])
+    with out_csv.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(EVENT_COLUMNS)
+        w.writerows(merged)
+
+    dt = time.time() - t_start
+    print(f"✅ {len(merged)} eventos en {out_csv} | {analizados} frames analizados en {dt:.1f}s "
+          f"({(total/fps)/max(dt, 1e-6):.1f}x tiempo real)")
+    return out_csv
+
+def main():
+    ap = argparse.ArgumentParser(description="Procesa un video grabado en paralelo y genera un log de eventos.")
+    ap.add_argument("--video", required=True, help="Ruta del archivo de video.")
+    ap.add_argument("--out", type=str, default=None, help="CSV de salida (por defecto data/out/offline_<video>.csv).")
+    ap.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto núcleos-1).")
+    ap.add_argument("--chunk", type=float, default=CHUNK_S, help="Duración de cada trozo en segundos.")
+    ap.add_argument("--stride", type=int, default=STRIDE, help="Analizar 1 de cada N frames.")
+    ap.add_argument("--cam", type=str, default="video", help="cam_id que se escribe en los eventos.")
+    ap.add_argument("--start", type=str, default=None, help="Hora de inicio de la grabación (YYYY-MM-DD HH:MM:SS).")
+    ap.add_argument("--emotion", action="store_true", help="Incluir emoción (lento: DeepFace por rostro).")
+    args = ap.parse_args()
+
+    start = datetime.fromisoformat(args.start) if args.start else None
+    procesar_video(args.video, out_csv=args.out, workers=args.workers, chunk_s=args.chunk,
+                   stride=max(1, args.stride), cam_id=args.cam, start=start, with_emotion=args.emotion)
+
+if __name__ == "__main__":
+    main()
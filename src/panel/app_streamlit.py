@@ -1,10 +1,11 @@
-import os, sys, time, pathlib, datetime, socket
+import os, sys, time, pathlib, datetime
 import streamlit as st
 import pandas as pd
 
-from src.panel.assets import APP_TITLE, APP_SUBTITLE, REFRESH_MS_DEFAULT, LOGO
-from src.panel.control import start_worker, stop_worker, get_pid
-from src.panel.helpers import leer_eventos, recientes, ultimo_evento
+from src.panel.assets import APP_TITLE, APP_SUBTITLE, REFRESH_MS_DEFAULT, REFRESH_EVENTS_MS, REFRESH_KPI_MS, LOGO
+from src.panel.control import start_worker, stop_worker, read_startup, switch_source, control_command
+from src.panel.helpers import recientes, ultimo_evento
+from src.panel.data import eventos, eventos_rango, file_version, fragment, lan_host, miniaturas, pid_productor, resumen_hoy, salud_productor
 
 st.set_page_config(page_title="Neuromech Vision | Panel", page_icon="🧠", layout="wide")
 
@@ -37,6 +38,8 @@ PREV = pathlib.Path("data/last_frame_prev.jpg")
 STATUS = RUN_DIR / "vision.status"
 EVENTS = pathlib.Path("data/logs/events.csv")
 PIDFILE = RUN_DIR / "panel.pid"
+HEALTH_PORT = int(os.getenv("VISION_HEALTH_PORT", "8765") or 0) or None  # El servicio de src/service.py usa 8766
+MAX_FRAME_AGE_S = 5.0  # Más viejo que esto = productor colgado aunque el PID viva
 
 def read_status():
     try: return STATUS.read_text(encoding="utf-8")
@@ -84,17 +87,37 @@ with st.sidebar:
     c1, c2, c3 = st.columns(3)
     with c1:
         if st.button("Aplicar", use_container_width=True):
-            stop_worker(PIDFILE); start_worker(PIDFILE, prefer=prefer, url=url, cam_idx=int(cam)); st.success("Productor aplicado")
+            modo = switch_source(PIDFILE, prefer=prefer, url=url, cam_idx=int(cam), health_port=HEALTH_PORT); pid_productor.clear()
+            st.success("Fuente cambiada en caliente" if modo == "hot" else "Productor aplicado")
     with c2:
         if st.button("Reiniciar", use_container_width=True):
-            stop_worker(PIDFILE); start_worker(PIDFILE, prefer=prefer, url=url, cam_idx=int(cam)); st.info("Productor reiniciado")
+            stop_worker(PIDFILE); pid_productor.clear(); start_worker(PIDFILE, prefer=prefer, url=url, cam_idx=int(cam), health_port=HEALTH_PORT); st.info("Productor reiniciado")
     with c3:
         if st.button("Detener", use_container_width=True):
-            stop_worker(PIDFILE); st.warning("Productor detenido")
+            stop_worker(PIDFILE); pid_productor.clear(); st.warning("Productor detenido")
+
+    # Controles en caliente (requieren el canal de control del productor)
+    c4, c5, c6 = st.columns(3)
+    with c4:
+        if st.button("Pausar", use_container_width=True):
+            st.info("Pausado" if control_command(RUN_DIR, "pause") else "Canal de control no disponible")
+    with c5:
+        if st.button("Reanudar", use_container_width=True):
+            st.info("Reanudado" if control_command(RUN_DIR, "resume") else "Canal de control no disponible")
+    with c6:
+        if st.button("Galería", use_container_width=True, help="Recargar la galería sin reiniciar"):
+            st.info("Recarga pedida" if control_command(RUN_DIR, "reload_gallery") else "Canal de control no disponible")
+    with st.expander("Umbrales"):
+        thresh = st.slider("Distancia máxima (THRESH)", 0.30, 0.70, 0.50, 0.01)
+        margin = st.slider("Margen sobre el segundo (MARGIN)", 0.00, 0.20, 0.07, 0.01)
+        if st.button("Aplicar umbrales", use_container_width=True):
+            ok_set = control_command(RUN_DIR, "set", thresh=float(thresh), margin=float(margin))
+            st.success("Umbrales aplicados") if ok_set else st.warning("Canal de control no disponible")
 
 # Autolanzar si no hay PID
-if not get_pid(PIDFILE):
-    start_worker(PIDFILE, prefer=prefer, url=url, cam_idx=int(cam))
+if not pid_productor(str(PIDFILE)):
+    start_worker(PIDFILE, prefer=prefer, url=url, cam_idx=int(cam), health_port=HEALTH_PORT)
+    pid_productor.clear()
 
 # Header
 col_logo, col_title = st.columns([1,6])
@@ -104,14 +127,26 @@ with col_title:
     st.markdown(f"## {APP_TITLE}")
     st.caption(APP_SUBTITLE)
 
-ok, backend, size = parse_status(read_status())
+def estado_productor():
+    ok, backend, size = parse_status(read_status())
+    # Si el productor expone /status, confío en él: detecta productores vivos pero congelados
+    health = salud_productor(str(RUN_DIR))
+    if health is not None:
+        age = health.get("last_frame_age_s")
+        ok = ok and bool(health.get("ready")) and age is not None and age < MAX_FRAME_AGE_S
+    return ok, backend, size, health
+
+def badge(ok):
+    st.markdown(f'<span class="badge {"live" if ok else "off"}>{"En vivo" if ok else "Sin señal"}</span>', unsafe_allow_html=True)
 
-# KPIs
+# KPIs (se refrescan solos, sin re-ejecutar el resto de la página)
+@fragment(run_every=REFRESH_KPI_MS/1000.0)
 def kpi_row():
+    ok, backend, size, _ = estado_productor()
     col1, col2, col3, col4 = st.columns([1.3,1,1,1])
     with col1:
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown(f'<span class="badge {"live" if ok else "off"}>{"En vivo" if ok else "Sin señal"}</span>', unsafe_allow_html=True)
+        badge(ok)
         st.caption(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
         st.markdown("</div>", unsafe_allow_html=True)
     with col2:
@@ -119,79 +154,87 @@ def kpi_row():
     with col3:
         st.markdown('<div class="card"><div class="kpi">{}</div><div class="kpi-label">Resolución</div></div>'.format(size), unsafe_allow_html=True)
     with col4:
-        host = socket.gethostbyname(socket.gethostname())
         st.markdown('<div class="card"><div class="kpi">localhost</div><div class="kpi-label">URL: http://localhost:8581</div></div>', unsafe_allow_html=True)
-        st.caption(f"LAN: http://{host}:8581")
+        st.caption(f"LAN: http://{lan_host()}:8581")
+    # Conteos del día (agregados incrementales, no recorren el CSV)
+    hoy = resumen_hoy(EVENTS)
+    cols = st.columns(5)
+    for col, (valor, etiqueta) in zip(cols, [(hoy["total"], "Detecciones hoy"), (hoy["conocidos"], "Autorizados"),
+                                             (hoy["desconocidos"], "Desconocidos"), (hoy["personas"], "Personas distintas"),
+                                             (hoy["rafagas"], "Ráfagas de desconocidos")]):
+        with col:
+            st.markdown(f'<div class="card"><div class="kpi">{valor}</div><div class="kpi-label">{etiqueta}</div></div>', unsafe_allow_html=True)
 kpi_row()
 st.divider()
 
 # Tabs
 tab_live, tab_id, tab_events, tab_diag = st.tabs(["En vivo", "Identidad", "Eventos", "Diagnóstico"])
 
-with tab_live:
-    col_live, col_side =st.columns([3.2,1.8])
-    with col_live:
-        st.markdown('<div class="card">',unsafe_allow_html=True)
-        #--- Inicio del cambio
-        image_data = None
-        if ok:
-            path_str =  get_frame_path()
-            if path_str:
-                try:
-                    # Al leer los bytes (.read_bytes()), Streamlit entiende que es 
-                    # una imagen NUEVA y la actualiza obligatoriamente.
-                    image_data = pathlib.Path(path_str).read_bytes()    
-                except Exception:
-                    # Si el archivo se está escribiendo justo ahora, ignoramos el error
-                    pass
-        if image_data:
-            st.image(image_data, use_container_width=True)
-        else:
-            st.info("Esperando frames del productor o revisa la fuente en la barra lateral.")
-        #--- Fin del cambio
-        st.markdown("</div>", unsafe_allow_html=True)
-     
-     
-     
-    with col_side:
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown("#### Resumen instantáneo")
-        st.markdown(f'<span class="badge {"live" if ok else "off"}>{"En vivo" if ok else "Sin señal"}</span>', unsafe_allow_html=True)
-        st.write("Backend:", backend); st.write("Resolución:", size)
-        st.write("Hora:", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        st.markdown("</div>", unsafe_allow_html=True)
-        # Timeline simple
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown("#### Últimos reconocidos")
-        df = leer_eventos(EVENTS)
-        if not df.empty:
-            rec = recientes(df, 8)
-            cA, cB = st.columns(2)
-            for i, row in rec.iterrows():
-                target = cA if (i % 2 == 0) else cB
-                with target:
-                    snap = row.get("snapshot_path","")
-                    if isinstance(snap,str) and len(snap)>0 and pathlib.Path(snap).exists():
-                        st.image(snap, use_container_width=True)
-                    nm = row.get("name","") or "Desconocido"
-                    dec = row.get("decision","rejected")
-                    st.write(nm, "🟢" if dec=="accepted" else "🔴")
-                    st.caption(str(row.get("timestamp","")))
-        else:
-            st.caption("Aún no hay eventos.")
-        st.markdown("</div>", unsafe_allow_html=True)
+@fragment(run_every=REFRESH_MS_DEFAULT/1000.0)
+def video_en_vivo():
+    ok, _, _, _ = estado_productor()
+    st.markdown('<div class="card">',unsafe_allow_html=True)
+    image_data = None
+    if ok:
+        path_str =  get_frame_path()
+        if path_str:
+            try:
+                # Al leer los bytes (.read_bytes()), Streamlit entiende que es 
+                # una imagen NUEVA y la actualiza obligatoriamente.
+                image_data = pathlib.Path(path_str).read_bytes()    
+            except Exception:
+                # Si el archivo se está escribiendo justo ahora, ignoramos el error
+                pass
+    if image_data:
+        st.image(image_data, use_container_width=True)
+    else:
+        marks = read_startup(RUN_DIR).get("marks", {})
+        fase = max(marks, key=marks.get) if marks else "iniciando"
+        st.info(f"Esperando frames del productor (fase: {fase}) o revisa la fuente en la barra lateral.")
+    st.markdown("</div>", unsafe_allow_html=True)
 
-with tab_id:
+@fragment(run_every=REFRESH_KPI_MS/1000.0)
+def resumen_y_timeline():
+    ok, backend, size, _ = estado_productor()
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("#### Resumen instantáneo")
+    badge(ok)
+    st.write("Backend:", backend); st.write("Resolución:", size)
+    st.write("Hora:", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    st.markdown("</div>", unsafe_allow_html=True)
+    # Timeline simple
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("#### Últimos reconocidos")
+    df = eventos(EVENTS)
+    if not df.empty:
+        rec = recientes(df, 8)
+        thumbs = miniaturas(); fotos = thumbs.index(rec)
+        cA, cB = st.columns(2)
+        for i, row in rec.iterrows():
+            target = cA if (i % 2 == 0) else cB
+            with target:
+                thumb = thumbs.by_event(fotos, row["event_id"])
+                if thumb:
+                    st.image(thumb, use_container_width=True)
+                nm = row.get("name","") or "Desconocido"
+                dec = row.get("decision","rejected")
+                st.write(nm, "🟢" if dec=="accepted" else "🔴")
+                st.caption(str(row.get("timestamp","")))
+    else:
+        st.caption("Aún no hay eventos.")
+    st.markdown("</div>", unsafe_allow_html=True)
+
+@fragment(run_every=REFRESH_EVENTS_MS/1000.0)
+def identidad():
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("#### Identidad predominante")
-    df = leer_eventos(EVENTS)
-    last = ultimo_evento(df)
+    last = ultimo_evento(eventos(EVENTS))
     if last:
         cols = st.columns([1.2,2])
         with cols[0]:
-            sp = last.get("snapshot_path","")
-            if isinstance(sp,str) and len(sp)>0 and pathlib.Path(sp).exists():
-                st.image(sp, use_container_width=True)
+            thumb = miniaturas().get(last.get("snapshot_path",""))
+            if thumb:
+                st.image(thumb, use_container_width=True)
         with cols[1]:
             nm = last.get("name","") or "Desconocido"
             dec = last.get("decision","rejected")
@@ -203,16 +246,20 @@ with tab_id:
         st.caption("Aún no hay identificaciones.")
     st.markdown("</div>", unsafe_allow_html=True)
 
-with tab_events:
+@fragment(run_every=REFRESH_EVENTS_MS/1000.0)
+def tabla_eventos():
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("#### Eventos")
-    df = leer_eventos(EVENTS)
+    # La versión del archivo decide si hay algo nuevo: si no cambió, el DataFrame
+    # sale de la caché y el filtrado es sobre datos ya parseados.
+    version = file_version(EVENTS)
+    df = eventos(EVENTS)
     if not df.empty:
         c1, c2, c3 = st.columns([2,1,1])
         with c1:
             q = st.text_input("Filtrar por nombre o código", "")
             if q:
-                df = df[df["name"].fillna("").str.contains(q, case=False) | df["codigo"].fillna("").str.contains(q, case=False)]
+                df = df[df["name"].fillna("").str.contains(q, case=False) | df["codigo"].fillna("").astype(str).str.contains(q, case=False)]
         with c2:
             estado = st.selectbox("Estado", ["Todos","accepted","rejected"])
             if estado != "Todos": df = df[df["decision"] == estado]
@@ -220,22 +267,57 @@ with tab_events:
             quality = st.selectbox("Quality", ["Todas","high","mid"])
             if quality != "Todas": df = df[df["quality"] == quality]
         st.dataframe(df, use_container_width=True, height=420)
-        st.download_button("Descargar CSV", data=EVENTS.read_bytes(), file_name="events.csv", mime="text/csv", use_container_width=True)
+        if st.session_state.get("events_version") != version:
+            st.session_state["events_version"] = version
+            st.session_state["events_bytes"] = EVENTS.read_bytes()
+        st.download_button("Descargar CSV", data=st.session_state["events_bytes"], file_name="events.csv", mime="text/csv", use_container_width=True)
     else:
         st.info("Aún no hay eventos.")
     st.markdown("</div>", unsafe_allow_html=True)
 
+def consulta_rango():
+    # Fuera del fragmento de la tabla: no se re-ejecuta cada pocos segundos
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("#### Consulta por rango de hora")
+    c1, c2, c3, c4 = st.columns([1.4,1,1,1])
+    with c1: dia = st.date_input("Día", datetime.date.today(), key="rango_dia")
+    with c2: h1 = st.time_input("Desde", datetime.time(7, 0), key="rango_desde")
+    with c3: h2 = st.time_input("Hasta", datetime.time(7, 15), key="rango_hasta")
+    with c4: cam = st.text_input("Cámara", "", key="rango_cam").strip()
+    if st.button("Buscar", key="rango_buscar"):
+        desde, hasta = f"{dia} {h1:%H:%M}", f"{dia} {h2:%H:%M}"
+        df, leidos = eventos_rango(EVENTS, desde, hasta, cam or None)
+        st.caption(f"{len(df)} eventos · leídos {leidos/1024:.1f} KB del CSV")
+        st.dataframe(df, use_container_width=True, height=300)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+with tab_live:
+    col_live, col_side =st.columns([3.2,1.8])
+    with col_live:
+        video_en_vivo()
+    with col_side:
+        resumen_y_timeline()
+
+with tab_id:
+    identidad()
+
+with tab_events:
+    tabla_eventos()
+    consulta_rango()
+
 with tab_diag:
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("#### Diagnóstico")
     st.write("Run dir:", RUN_DIR.resolve())
-    st.write("PID productor:", get_pid(PIDFILE))
+    st.write("PID productor:", pid_productor(str(PIDFILE)))
     st.code(read_status())
+    st.write("Arranque del productor (s):", read_startup(RUN_DIR).get("marks", {}))
+    st.write("Salud del productor:")
+    health = salud_productor(str(RUN_DIR))
+    st.json(health if health is not None else {"endpoint": "no disponible"})
     st.write("Archivos:", str(LAST.resolve()), str(PREV.resolve()))
     st.markdown("</div>", unsafe_allow_html=True)
 
 st.divider()
 st.markdown('<div class="footer">Neuromech Labs • Panel con Streamlit • Accede vía localhost; 0.0.0.0 es solo dirección de enlace.</div>', unsafe_allow_html=True)
-
-time.sleep(REFRESH_MS_DEFAULT/1000.0)
-st.rerun()
+# Ya no hay st.rerun() global: cada fragmento se refresca solo con su propio intervalo.
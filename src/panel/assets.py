@@ -4,7 +4,9 @@ ASSETS_DIR = Path(__file__).resolve().parent / "assets"
 
 APP_TITLE = "Panel de Reconocimiento Facial"
 APP_SUBTITLE = "Video en vivo y eventos recientes"
-REFRESH_MS_DEFAULT = 1500  # 1.5 s
+REFRESH_MS_DEFAULT = 1500  # 1.5 s (video en vivo)
+REFRESH_KPI_MS = 3000      # KPIs, resumen y últimos reconocidos
+REFRESH_EVENTS_MS = 5000   # Tabla de eventos e identidad
 
 LOGO = ASSETS_DIR / "logo.png"  # opcional
 
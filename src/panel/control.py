@@ -1,7 +1,8 @@
 from __future__ import annotations
 from pathlib import Path
-import subprocess, sys, os, time, signal
-from typing import Optional
+import subprocess, sys, os, time, signal, json
+import urllib.request
+from typing import Dict, Optional
 
 def _write_pid(pidfile: Path, pid: int):
     pidfile.parent.mkdir(parents=True, exist_ok=True)
@@ -36,13 +37,63 @@ def _read_cam_idx(run_dir: Path) -> int:
         except: return 0
     return 0
 
+def _read_health_port(run_dir: Path) -> Optional[int]:
+    p = run_dir / "vision.port"
+    if not p.exists(): return None
+    try: return int(p.read_text(encoding="utf-8").strip())
+    except Exception: return None
+
+def worker_health(run_dir: Path, timeout: float = 0.5) -> Optional[Dict]:
+    """
+    Consulta /status del productor (si arrancó con --health-port).
+    None si no hay endpoint o no responde: el llamador decide con el PID/status de siempre.
+    """
+    port = _read_health_port(run_dir)
+    if not port: return None
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/status", timeout=timeout) as r:
+            return json.loads(r.read().decode("utf-8"))
+    except Exception:
+        return None
+
+def control_command(run_dir: Path, cmd: str, **params) -> Optional[Dict]:
+    """
+    Manda un comando al productor vivo por su socket de control (data/run/vision.sock).
+    None si no hay canal (productor viejo, Windows sin AF_UNIX, o caído).
+    """
+    from src.control_socket import send_command
+    reply = send_command({"cmd": cmd, **params}, path=run_dir / "vision.sock")
+    return reply if reply and reply.get("ok") else None
+
+def switch_source(pidfile: Path, prefer: str = "local", url: str = "", cam_idx: int | None = None,
+                  health_port: int | None = None) -> str:
+    """
+    Cambia la fuente del productor. Si está vivo y tiene canal de control, el cambio
+    es en caliente (solo cuesta abrir la cámara); si no, reinicio el proceso.
+    Devuelve 'hot' o 'restart'.
+    """
+    if get_pid(pidfile) and control_command(pidfile.parent, "switch_source", prefer=prefer,
+                                            url=url.strip(), cam=cam_idx):
+        return "hot"
+    stop_worker(pidfile)
+    start_worker(pidfile, prefer=prefer, url=url, cam_idx=cam_idx, health_port=health_port)
+    return "restart"
+
+def read_startup(run_dir: Path) -> Dict:
+    """Hitos de arranque que escribe el productor en data/run/vision.startup."""
+    try: return json.loads((run_dir / "vision.startup").read_text(encoding="utf-8"))
+    except Exception: return {}
+
 def start_worker(pidfile: Path, module: str = "src.recognize",
-                 prefer: str = "local", url: str = "", cam_idx: int | None = None) -> Optional[int]:
+                 prefer: str = "local", url: str = "", cam_idx: int | None = None,
+                 health_port: int | None = None, timeout: float = 10.0) -> Optional[int]:
     """
     Lanza el productor si no existe PID activo.
     prefer: 'auto' | 'url' | 'local'
     url: fuente de red, si aplica
     cam_idx: índice de cámara local, si aplica
+    health_port: puerto local para el endpoint de salud (None = desactivado)
+    timeout: espera máxima a que el productor termine sus imports (hito 'import')
     """
     existing = get_pid(pidfile)
     if existing: return existing
@@ -56,6 +107,8 @@ def start_worker(pidfile: Path, module: str = "src.recognize",
         args += ["--url", url.strip()]
     if prefer in ("local","auto") and prefer != "url":
         args += ["--cam", str(cam_idx)]
+    if health_port:
+        args += ["--health-port", str(health_port)]
 
     proc = subprocess.Popen(
         args,
@@ -63,10 +116,17 @@ def start_worker(pidfile: Path, module: str = "src.recognize",
         creationflags=(subprocess.CREATE_NO_WINDOW if os.name=="nt" else 0)
     )
     _write_pid(pidfile, proc.pid)
-    time.sleep(0.8)
-    if not _pid_alive(proc.pid):
-        if pidfile.exists(): pidfile.unlink(missing_ok=True)
-        return None
+    # En vez de un sleep fijo, espero a que el propio proceso diga que arrancó
+    # (o a que muera, por ejemplo si falta el modelo).
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        if proc.poll() is not None:
+            if pidfile.exists(): pidfile.unlink(missing_ok=True)
+            return None
+        info = read_startup(run_dir)
+        if info.get("pid") == proc.pid and "import" in info.get("marks", {}):
+            break
+        time.sleep(0.1)
     return proc.pid
 
 def stop_worker(pidfile: Path, timeout: float = 5.0) -> bool:
@@ -87,6 +147,8 @@ def stop_worker(pidfile: Path, timeout: float = 5.0) -> bool:
             else:
                 os.kill(pid, signal.SIGKILL)
         if pidfile.exists(): pidfile.unlink(missing_ok=True)
+        (pidfile.parent / "vision.port").unlink(missing_ok=True)
+        (pidfile.parent / "vision.sock").unlink(missing_ok=True)
         return True
     except Exception:
         return False
@@ -0,0 +1,93 @@
+# src/panel/data.py
+# Capa de datos del panel con caché.
+# Streamlit re-ejecuta el script en cada refresco; aquí me aseguro de que leer
+# el CSV, resolver el host o consultar al productor solo cueste de verdad cuando
+# algo cambió. La caché es del proceso del panel, así que varios supervisores
+# conectados comparten el mismo DataFrame ya parseado.
+
+import datetime, socket
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from src.panel.control import get_pid, worker_health
+from src.panel.helpers import leer_eventos
+from src.event_index import EventIndex
+from src.rollups import actualizar
+from src.thumbs import ThumbnailService
+
+def file_version(path: Path) -> Tuple[int, int]:
+    """(mtime_ns, tamaño) del archivo; (0, 0) si no existe. Es la llave de la caché."""
+    try:
+        s = Path(path).stat()
+        return s.st_mtime_ns, s.st_size
+    except OSError:
+        return 0, 0
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _eventos(path_str: str, version: Tuple[int, int], max_rows: int) -> pd.DataFrame:
+    return leer_eventos(Path(path_str), max_rows=max_rows)
+
+def eventos(path: Path, max_rows: int = 5000) -> pd.DataFrame:
+    """
+    Eventos parseados, compartidos entre pestañas, reruns y sesiones.
+    Se devuelve el mismo objeto a todos: filtrar crea uno nuevo, pero no hay que
+    modificarlo en sitio.
+    """
+    return _eventos(str(path), file_version(path), max_rows)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _resumen_dia(path_str: str, version: Tuple[int, int], dia: str) -> Optional[Dict]:
+    return actualizar(events_csv=Path(path_str)).day(dia)
+
+def resumen_hoy(path: Path) -> Dict:
+    """KPIs del día desde los agregados (data/logs/rollups.json), sin releer el CSV."""
+    hoy = datetime.date.today().isoformat()
+    d = _resumen_dia(str(path), file_version(path), hoy) or {}
+    dec = d.get("decisions", {})
+    return {"total": d.get("total", 0), "conocidos": dec.get("accepted", 0),
+            "desconocidos": dec.get("rejected", 0), "personas": d.get("distinct", 0),
+            "rafagas": d.get("unknown_bursts", 0)}
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _indice(path_str: str) -> EventIndex:
+    return EventIndex(Path(path_str))
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _eventos_rango(path_str: str, version: Tuple[int, int], desde: str, hasta: str,
+                   cam: Optional[str]) -> Tuple[pd.DataFrame, int]:
+    idx = _indice(path_str)
+    rows = list(idx.query(desde, hasta, cam_id=cam))
+    return pd.DataFrame(rows, columns=idx.header or None), idx.bytes_read
+
+def eventos_rango(path: Path, desde: str, hasta: str, cam: Optional[str] = None) -> Tuple[pd.DataFrame, int]:
+    """
+    Eventos entre dos horas ('YYYY-MM-DD HH:MM') usando el índice events.csv.idx:
+    solo se leen los bloques del CSV que caen en la ventana. Devuelve (df, bytes leídos).
+    """
+    return _eventos_rango(str(path), file_version(path), desde, hasta, cam)
+
+@st.cache_resource(show_spinner=False)
+def miniaturas() -> ThumbnailService:
+    """Un solo servicio (y una sola LRU) para todas las sesiones del panel."""
+    return ThumbnailService(max_items=256)
+
+@st.cache_resource(show_spinner=False)
+def lan_host() -> str:
+    try: return socket.gethostbyname(socket.gethostname())
+    except Exception: return "127.0.0.1"
+
+@st.cache_data(ttl=2.0, show_spinner=False)
+def pid_productor(pidfile_str: str) -> Optional[int]:
+    return get_pid(Path(pidfile_str))
+
+@st.cache_data(ttl=1.0, show_spinner=False)
+def salud_productor(run_dir_str: str) -> Optional[Dict]:
+    return worker_health(Path(run_dir_str))
+
+def fragment(run_every: Optional[float] = None):
+    """st.fragment en versiones nuevas, st.experimental_fragment en las anteriores."""
+    deco = getattr(st, "fragment", None) or getattr(st, "experimental_fragment")
+    return deco(run_every=run_every)
@@ -7,6 +7,8 @@ from PIL import Image
 import io
 
 COLUMNS = ["timestamp","cam_id","name","codigo","grado","distancia","decision","quality","snapshot_path"]
+# event_id = hash del contenido de la fila: no depende de la posición, así no cambia
+# cuando on_bad_lines='skip' descarta líneas rotas más arriba
 
 def leer_eventos(csv_path: Path, max_rows: int = 5000) -> pd.DataFrame:
     if not csv_path.exists():
@@ -20,6 +22,7 @@ def leer_eventos(csv_path: Path, max_rows: int = 5000) -> pd.DataFrame:
         for c in COLUMNS:
             if c not in df.columns:
                 df[c] = None
+        df["event_id"] = pd.util.hash_pandas_object(df[COLUMNS].astype(str), index=False)
                 
         # Limpieza de tipos
         df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
@@ -0,0 +1,71 @@
+# src/preprocess.py
+# Preprocesamiento del frame sin asignar memoria en cada vuelta.
+# Antes, cada frame procesado creaba un frame reducido nuevo y una copia RGB nueva.
+# Aquí los buffers se crean una vez por resolución de la fuente y cv2.resize /
+# cv2.cvtColor escriben dentro de ellos (parámetro dst). Si la fuente cambia de
+# tamaño (otra cámara, reconexión) se vuelven a crear y queda contado.
+#
+# Los contadores (buffers creados, reusos, bytes, y cuántas veces la captura
+# entregó un array nuevo en vez de reusar el anterior) salen en /metrics.
+
+import gc
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+class FramePreprocessor:
+    """
+    frame BGR (tamaño completo) -> RGB reducido, listo para detectar.
+    El array devuelto se SOBREESCRIBE en la siguiente llamada: quien lo necesite
+    después debe copiarlo. No es seguro entre hilos (uno por bucle de visión).
+    """
+    def __init__(self, scale: float = 0.25, interpolation: int = cv2.INTER_LINEAR):
+        self.scale = scale
+        self.interpolation = interpolation
+        self._src_shape: Optional[Tuple[int, ...]] = None
+        self._small: Optional[np.ndarray] = None
+        self._rgb: Optional[np.ndarray] = None
+        self._last_input_ptr = 0
+        self.stats: Dict[str, int] = {"buffer_allocs": 0, "buffer_reuses": 0, "buffer_bytes": 0,
+                                      "capture_allocs": 0}
+
+    def _ensure(self, shape: Tuple[int, ...]):
+        if shape == self._src_shape:
+            self.stats["buffer_reuses"] += 1
+            return
+        h, w = shape[:2]
+        # Mismo redondeo que cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        sh, sw = max(1, int(round(h * self.scale))), max(1, int(round(w * self.scale)))
+        self._small = np.empty((sh, sw, 3), dtype=np.uint8)
+        self._rgb = np.empty((sh, sw, 3), dtype=np.uint8)
+        self._src_shape = shape
+        self.stats["buffer_allocs"] += 1
+        self.stats["buffer_bytes"] = self._small.nbytes + self._rgb.nbytes
+
+    def track_input(self, frame: np.ndarray):
+        """Cuenta cuándo la captura entrega un array distinto (no reusó su buffer)."""
+        ptr = frame.__array_interface__["data"][0]
+        if ptr != self._last_input_ptr:
+            self.stats["capture_allocs"] += 1
+            self._last_input_ptr = ptr
+
+    def __call__(self, frame_bgr: np.ndarray) -> np.ndarray:
+        self._ensure(frame_bgr.shape)
+        cv2.resize(frame_bgr, (self._small.shape[1], self._small.shape[0]), dst=self._small,
+                   interpolation=self.interpolation)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        return self._rgb
+
+    def export(self, metrics):
+        """Vuelca los contadores (y las colecciones del GC) como gauges de StageMetrics."""
+        for k, v in self.stats.items():
+            metrics.set(f"prep_{k}", v)
+        for gen, st in enumerate(gc.get_stats()):
+            metrics.set(f"gc_collections_gen{gen}", st.get("collections", 0))
+
+def crop_view(frame: np.ndarray, box: Tuple[int, int, int, int]) -> np.ndarray:
+    """Recorte (top, right, bottom, left) como VISTA del frame, sin copiar; vacío si cae fuera."""
+    h, w = frame.shape[:2]
+    top, right, bottom, left = box
+    return frame[max(0, top):min(h, bottom), max(0, left):min(w, right)]
@@ -0,0 +1,152 @@
+# src/quantize.py
+# Galería cuantizada: la búsqueda recorre códigos chicos en memoria y solo los mejores
+# candidatos se comparan en precisión completa.
+#   int8    -> 128 bytes por encoding (centro y escala por dimensión)
+#   float16 -> 256 bytes por encoding
+# contra 1 KB en float64. Con 1M de encodings: ~128 MB en vez de ~1 GB.
+#
+# Archivos (junto al pickle):
+#   embeddings_mtcnn.int8.npz -> códigos, escala, centro, nombres y prototipos
+#   embeddings_mtcnn.f64.npy  -> encodings completos; se abren con mmap, así que solo
+#                                se leen del disco las filas que se re-rankean
+# Para usarla en vivo: VISION_GALLERY=models/embeddings_mtcnn.int8.npz (o --gallery).
+#
+# Uso:
+#   python -m src.quantize --mode int8            # escribe los archivos y compara decisiones
+#   python -m src.quantize --mode float16 --sample 5000
+
+import argparse, os, time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+from src.gallery import ENCODING_DIM, Gallery, load_gallery
+
+MODEL_PATH = Path("models/embeddings_mtcnn.pkl")
+MODES = ("int8", "float16")
+RERANK = 32          # Candidatos que pasan a la comparación exacta
+SCAN_BLOCK = 65536   # Filas por bloque al recorrer los códigos (acota la memoria temporal)
+
+class QuantizedCodes:
+    """
+    x ≈ center + codes * scale  (por dimensión). La distancia aproximada es
+    Σ w (c - q')² con w = scale² y q' = (q - center) / scale, calculada como
+    ||c||²_w - 2 c·(w q') + ||q'||²_w para recorrer los códigos con un producto matricial.
+    """
+    def __init__(self, codes: np.ndarray, scale: np.ndarray, center: np.ndarray):
+        self.codes = codes
+        self.scale = scale.astype(np.float32)
+        self.center = center.astype(np.float32)
+        self._w = self.scale ** 2
+        self._norms = np.concatenate([
+            (self.codes[a:a+SCAN_BLOCK].astype(np.float32) ** 2) @ self._w
+            for a in range(0, len(codes), SCAN_BLOCK)]) if len(codes) else np.empty((0,), np.float32)
+
+    @property
+    def mode(self) -> str:
+        return "int8" if self.codes.dtype == np.int8 else "float16"
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self._norms.nbytes + self.scale.nbytes + self.center.nbytes
+
+    @classmethod
+    def fit(cls, x: np.ndarray, mode: str = "int8") -> "QuantizedCodes":
+        if mode not in MODES:
+            raise ValueError(f"Modo de cuantización desconocido: {mode} (opciones: {', '.join(MODES)})")
+        if mode == "float16":
+            return cls(x.astype(np.float16), np.ones(ENCODING_DIM), np.zeros(ENCODING_DIM))
+        center = (x.max(axis=0) + x.min(axis=0)) / 2.0
+        scale = np.maximum(np.abs(x - center).max(axis=0), 1e-12) / 127.0
+        codes = np.clip(np.rint((x - center) / scale), -127, 127).astype(np.int8)
+        return cls(codes, scale, center)
+
+    def candidates(self, q: np.ndarray, k: int = RERANK) -> np.ndarray:
+        """Índices (ordenados) de los k códigos más cercanos a q según la distancia aproximada."""
+        n = len(self.codes)
+        if n <= k: return np.arange(n)
+        qp = ((np.asarray(q, dtype=np.float32) - self.center) / self.scale) * self._w
+        d = np.empty(n, dtype=np.float32)
+        for a in range(0, n, SCAN_BLOCK):
+            d[a:a+SCAN_BLOCK] = self._norms[a:a+SCAN_BLOCK] - 2.0 * (self.codes[a:a+SCAN_BLOCK].astype(np.float32) @ qp)
+        return np.sort(np.argpartition(d, k - 1)[:k])
+
+def paths_for(model: Path, mode: str) -> Tuple[Path, Path]:
+    model = Path(model)
+    return model.with_suffix(f".{mode}.npz"), model.with_suffix(".f64.npy")
+
+def save_quantized(g: Gallery, model: Path, mode: str = "int8") -> Tuple[Path, Path]:
+    npz, full = paths_for(model, mode)
+    q = QuantizedCodes.fit(g.encodings, mode)
+    # Primero los vectores completos: el .npz (el que vigila el bucle) se escribe al final
+    tmp = full.with_suffix(".tmp.npy")
+    np.save(tmp, np.ascontiguousarray(g.encodings, dtype=np.float64)); os.replace(tmp, full)
+    extra = {}
+    if g.prototypes is not None:
+        extra = {"prototypes": g.prototypes, "proto_names": np.asarray(g.proto_names)}
+    tmp = npz.with_suffix(".tmp.npz")
+    np.savez(tmp, codes=q.codes, scale=q.scale, center=q.center, names=np.asarray(g.names),
+             full=np.asarray(full.name), encoder=np.asarray(g.encoder), **extra)
+    os.replace(tmp, npz)
+    return npz, full
+
+def load_quantized(path: Path) -> Gallery:
+    path = Path(path)
+    with np.load(path) as z:
+        codes, scale, center = z["codes"], z["scale"], z["center"]
+        names = z["names"].tolist()
+        full = path.parent / str(z["full"])
+        prototypes = z["prototypes"] if "prototypes" in z.files else None
+        proto_names = z["proto_names"].tolist() if "proto_names" in z.files else None
+        encoder = str(z["encoder"]) if "encoder" in z.files else "small"
+    enc = np.load(full, mmap_mode="r")  # No se lee: solo las filas que se re-rankean
+    return Gallery(enc, names, path=str(path), mtime=os.path.getmtime(path),
+                   prototypes=prototypes, proto_names=proto_names,
+                   quant=QuantizedCodes(codes, scale, center), encoder=encoder)
+
+def comparar(exacta: Gallery, cuant: Gallery, sample: int = 0, seed: int = 0) -> Tuple[int, int, float]:
+    """
+    Cada encoding (o una muestra) como consulta dejándose afuera a sí mismo, igual
+    que src.calibrate. Devuelve (consultas, diferencias en (idx, best, second), máximo |Δ|).
+    Con el mismo top-2 exacto, la regla THRESH/MARGIN decide lo mismo con cualquier umbral.
+    """
+    n = len(exacta)
+    idx = np.arange(n)
+    if sample and sample < n:
+        idx = np.random.default_rng(seed).choice(n, sample, replace=False)
+    diff, max_delta = 0, 0.0
+    for i in idx:
+        q = np.asarray(exacta.encodings[i])
+        a = exacta.nearest(q, exclude=int(i))
+        b = cuant.nearest(q, exclude=int(i))
+        delta = max(abs(a[1] - b[1]), abs(a[2] - b[2]))
+        max_delta = max(max_delta, delta)
+        if a[0] != b[0] or delta > 1e-9: diff += 1
+    return len(idx), diff, max_delta
+
+def main():
+    ap = argparse.ArgumentParser(description="Guarda la galería cuantizada (int8/float16) con re-ranking exacto")
+    ap.add_argument("--model", default=str(MODEL_PATH))
+    ap.add_argument("--mode", choices=MODES, default="int8")
+    ap.add_argument("--sample", type=int, default=0, help="Consultas para comparar decisiones (0 = todas)")
+    ap.add_argument("--no-check", action="store_true", help="No comparar contra la galería exacta")
+    args = ap.parse_args()
+
+    g = load_gallery(args.model)
+    g.validate()
+    npz, full = save_quantized(g, Path(args.model), args.mode)
+    cuant = load_quantized(npz)
+    print(f"[OK] {len(g)} encodings -> {npz} ({cuant.quant.nbytes/2**20:.1f} MB en memoria, "
+          f"antes {g.encodings.nbytes/2**20:.1f} MB) + {full} (mmap)")
+    if args.no_check: return
+    t0 = time.perf_counter()
+    n, diff, max_delta = comparar(g, cuant, sample=args.sample)
+    print(f"[INFO] {n} consultas en {time.perf_counter()-t0:.1f}s | diferencias: {diff} | máx |Δd|: {max_delta:.2e}")
+    if diff:
+        print(f"[WARN] Decisiones distintas en {diff} consultas: sube RERANK (ahora {RERANK}) o usa --mode float16.")
+    else:
+        print(f"✅ Mismas decisiones que la galería exacta. Usar con VISION_GALLERY={npz}")
+
+if __name__ == "__main__":
+    main()
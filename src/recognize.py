@@ -1,37 +1,121 @@
-import argparse, time, csv, os
+import time
+_T0 = time.perf_counter()  # Inicio del arranque, para la línea de tiempo
+import argparse, atexit, csv, functools, os, signal, sys, threading
 from datetime import datetime
 from collections import deque, Counter
 import cv2
 import numpy as np
-import face_recognition
-import pickle
 from pathlib import Path
-from scipy.spatial import distance as dist
-from src.config import LAST_FRAME, EVENTS_CSV, SNAP_DIR, RUN_DIR
+from src.config import LAST_FRAME, EVENTS_CSV, EVENTS_RAW_CSV, SNAP_DIR, RUN_DIR, STUDENTS_CSV, STUDENTS_DB
 from src.capture_faces import open_any, read_loop
+from src.metrics import StageMetrics, StartupTimeline
+from src.health import HealthState, serve_health
+from src.gallery import load_gallery, GalleryWatcher
+from src.lazy import lazy_import
+from src.control_socket import ControlServer
+from src.detectors import DETECTORS, get_detector
+import src.landmarks as lm
+from src.preprocess import FramePreprocessor, crop_view
+from src.vision_pool import SharedFramePool
+from src.repositories import open_student_repository
+from src.rollups import Rollups
+from src.shards import ShardConfig, ShardedGallery
+from src.event_index import EventIndex
+from src.sessions import SessionAggregator, append_session
+from src.thumbs import write_thumbnail_cv2
 import src.analytics as analytics  # Tu módulo de inteligencia
 
-# --- 1. CARGA DEL MODELO ---
-MODEL_PATH = os.path.join("models", "embeddings_mtcnn.pkl")
-if not os.path.exists(MODEL_PATH):
-    raise FileNotFoundError("No se encontró el modelo entrenado.")
-with open(MODEL_PATH, "rb") as f:
-    data = pickle.load(f)
-
-known_encodings = data["encodings"]
-known_names = data["names"]
-print(f"✅ Base cargada con {len(known_names)} rostros registrados.")
+# dlib carga sus modelos al importarse: lo difiero hasta la primera detección
+face_recognition = lazy_import("face_recognition")
+
+# --- 1. CARGA DEL MODELO (diferida) ---
+# El .pkl del entrenamiento o su versión cuantizada (src/quantize.py, *.int8.npz)
+MODEL_PATH = os.getenv("VISION_GALLERY", os.path.join("models", "embeddings_mtcnn.pkl"))
+_gallery = None
+_gallery_lock = threading.Lock()
+
+def get_gallery():
+    """Carga la galería la primera vez que se necesita (no al importar el módulo)."""
+    global _gallery
+    if _gallery is None:
+        with _gallery_lock:
+            if _gallery is None:
+                _gallery = load_gallery(MODEL_PATH)
+                print(f"✅ Base cargada con {len(_gallery)} rostros registrados.")
+    return _gallery
+
+_students = None
+
+def get_students():
+    """Repositorio de estudiantes (SQLite + caché LRU), abierto la primera vez que se usa."""
+    global _students
+    if _students is None:
+        try:
+            _students = open_student_repository(STUDENTS_DB, STUDENTS_CSV)
+        except Exception as e:
+            print(f"[WARN] Sin datos de estudiantes, los eventos no se enriquecen: {e}")
+            _students = False
+    return _students or None
+
+def enriquecer(identidad):
+    """
+    'codigo_Nombre_Apellido' de la galería -> (nombre, codigo, grado) del repositorio.
+    Si el estudiante no está en la base, dejo lo que traía la galería.
+    """
+    if identidad == "DESCONOCIDO":
+        return identidad, identidad, ""
+    codigo = identidad.split("_")[0] if "_" in identidad else identidad
+    repo = get_students()
+    info = repo.get(codigo) if repo is not None else None
+    if not info:
+        return identidad, codigo, ""
+    nombre = f"{info['nombre']} {info['apellido']}".strip() or identidad
+    return nombre, codigo, info["grado"]
+
+def set_gallery(gallery):
+    """Reemplazo atómico: el bucle toma la galería una vez por frame, nunca a medias."""
+    global _gallery
+    _gallery = gallery
+
+# Galería por cámara (src/shards.py, data/camaras.json): se arma cuando cambia la galería
+_shard_cfg = None
+_shards = None
+
+def galerias_para(cam=None):
+    """(galería que busca esta cámara, galería de respaldo o None)."""
+    global _shard_cfg, _shards
+    g = get_gallery()
+    if _shard_cfg is None:
+        _shard_cfg = ShardConfig.load()
+    if not _shard_cfg.camaras:
+        return g, None
+    sh = _shards
+    if sh is None or sh.gallery is not g:
+        codigos = {n.split("_")[0] if "_" in n else n for n in g.identities}
+        repo = get_students()
+        info = repo.get_many(codigos) if repo is not None else {}
+        sh = _shards = ShardedGallery(g, {c: i.get("grado", "") for c, i in info.items()}, _shard_cfg)
+        print(f"[OK] Galería por grupos: {sh.sizes()}")
+    return sh.para(cam)
 
 # --- 2. CONFIGURACIÓN ---
 THRESH = 0.50
 MARGIN = 0.07
-DETECTOR_MODEL = "hog"
+DETECTOR_MODEL = os.getenv("VISION_DETECTOR", "hog")  # hog | cnn | mtcnn | cascade (ver src/detectors.py)
 VOTES_WINDOW = 7
 VERBOSE = True
 SNAPSHOT_COOLDOWN = 20.0
 MAX_SNAPSHOTS = 10
 FRAME_SKIP = 2
 EYE_AR_THRESH = 0.25 # Umbral de parpadeo
+METRICS_EVERY = 5.0  # Segundos entre exportaciones de data/run/vision.prom
+EMOTION_ENABLED = os.getenv("VISION_EMOTION", "1") != "0"  # DeepFace solo se importa si está activo
+WORKERS = int(os.getenv("VISION_WORKERS", "0") or 0)  # Procesos para detección/encoding (0 = en el mismo proceso)
+RAW_EVENTS = os.getenv("VISION_RAW_EVENTS", "0") == "1"     # Además de las sesiones, una fila por frame en events_raw.csv
+GALLERY_WATCH_S = 2.0  # Cada cuánto reviso si el entrenamiento dejó una galería nueva
+RELOAD_FLAG = RUN_DIR / "reload_gallery"  # Crear este archivo fuerza una recarga
+REOPEN_RETRY_S = 15.0  # Sin fuente: cada cuánto reintento abrirla
+ROLLUP_EVERY_S = 30.0  # Cada cuánto se pasan los eventos nuevos a data/logs/rollups.json
 
 def log(msg):
     if VERBOSE: print(msg)
@@ -40,17 +124,20 @@ def write_status(text):
     try: (RUN_DIR / "vision.status").write_text(str(text), encoding="utf-8")
     except Exception: pass
 
-def ensure_csv_header():
-    if not EVENTS_CSV.exists():
-        EVENTS_CSV.parent.mkdir(parents=True, exist_ok=True)
-        with EVENTS_CSV.open("w", newline="", encoding="utf-8") as f:
-            csv.writer(f).writerow(["timestamp","cam_id","name","codigo","grado","distancia","decision","quality","snapshot_path"])
+EVENT_COLUMNS = ["timestamp","cam_id","name","codigo","grado","distancia","decision","quality","snapshot_path"]
 
-def append_event(cam_id, name, codigo, grado, distancia, decision, quality, snapshot_path):
-    ensure_csv_header()
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+def ensure_csv_header(path=EVENTS_CSV):
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow(EVENT_COLUMNS)
+
+def append_event(cam_id, name, codigo, grado, distancia, decision, quality, snapshot_path, ts=None, path=EVENTS_CSV):
+    # ts: epoch del evento (por defecto ahora); las sesiones usan su primera vez
+    ensure_csv_header(path)
+    ts = datetime.fromtimestamp(ts if ts is not None else time.time()).strftime("%Y-%m-%d %H:%M:%S")
     try:
-        with EVENTS_CSV.open("a", newline="", encoding="utf-8") as f:
+        with path.open("a", newline="", encoding="utf-8") as f:
             csv.writer(f).writerow([ts, cam_id, name, codigo, grado, distancia, decision, quality, snapshot_path])
     except Exception: pass
 
@@ -78,189 +165,420 @@ def save_snapshot(face_bgr, codigo="NA"):
     name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{safe_cod}.jpg"
     path = SNAP_DIR / name
     cv2.imwrite(str(path), face_bgr)
+    # La miniatura sale de la imagen que ya tengo en memoria: el panel no lee el original
+    try: write_thumbnail_cv2(face_bgr, path)
+    except Exception: pass
     return str(path)
 
+@functools.lru_cache(maxsize=1)
 def _placeholder_frame():
+    # Siempre el mismo array (nadie lo modifica): no se crea uno por segundo sin cámara
     frame_bgr = np.zeros((480, 640, 3), dtype=np.uint8)
     frame_bgr[:] = (0, 140, 255)
     cv2.putText(frame_bgr, "Esperando video...", (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (20,20,20), 2)
     return frame_bgr
 
-def decidir_identidad(encoding):
-    if len(known_encodings) == 0:
-        return "DESCONOCIDO", None, 1.0
-    distances = face_recognition.face_distance(known_encodings, encoding)
-    order = np.argsort(distances)
-    best_idx = int(order[0])
-    best_dist = float(distances[best_idx])
-    second_best = float(distances[order[1]]) if len(order) > 1 else 1.0
-    
-    if (best_dist <= THRESH) and ((second_best - best_dist) >= MARGIN):
-        return known_names[best_idx], best_dist, second_best
-    return "DESCONOCIDO", best_dist, second_best
+def decidir_identidad(encoding, gallery=None, fallback=None, metrics=None):
+    """(nombre, distancia, segunda). La distancia siempre es un número (1.0 si no hubo contra qué comparar)."""
+    gallery = gallery if gallery is not None else get_gallery()
+    name, best_dist, second_best = "DESCONOCIDO", 1.0, 1.0
+    if len(gallery) > 0:
+        best_idx, best_dist, second_best = gallery.nearest(encoding)
+        if (best_dist <= THRESH) and ((second_best - best_dist) >= MARGIN):
+            return gallery.names[best_idx], best_dist, second_best
+    # Sin identificación en los grupos de la cámara: se busca en los demás
+    if fallback is not None and len(fallback) > 0:
+        if metrics is not None: metrics.inc("shard_fallback_total")
+        name_fb, d_fb, s_fb = decidir_identidad(encoding, fallback)
+        if name_fb != "DESCONOCIDO":
+            if metrics is not None: metrics.inc("shard_fallback_hits_total")
+        return name_fb, d_fb, s_fb
+    return name, best_dist, second_best
 
 def eye_aspect_ratio(eye):
-    A = dist.euclidean(eye[1], eye[5])
-    B = dist.euclidean(eye[2], eye[4])
-    C = dist.euclidean(eye[0], eye[3])
+    # Misma fórmula que con scipy.spatial.distance, sin pagar el import de scipy
+    eye = np.asarray(eye, dtype=np.float64)
+    A = np.linalg.norm(eye[1] - eye[5])
+    B = np.linalg.norm(eye[2] - eye[4])
+    C = np.linalg.norm(eye[0] - eye[3])
     return (A + B) / (2.0 * C)
 
-def loop_panel(cam_id=None, url=None, prefer="auto", sleep_s=0.001):
-    recent_votes = deque(maxlen=VOTES_WINDOW)
-    ensure_csv_header()
-    last_snap_time = {} 
-    snap_counts = {}
-    liveness_states = {} 
-
-    frame_count = 0
-    last_draw_info = [] 
-
+_PREP = FramePreprocessor(scale=0.25)
+
+def extraer_rostros(frame, metrics, prep=None, with_points=True):
+    """
+    La parte pesada: detección, landmarks y encodings. Es lo mismo que corre cada
+    worker de src/vision_pool.py; el resultado tiene el mismo formato.
+    with_points=False no devuelve los puntos (solo hacen falta para parpadeo y pose).
+    """
+    with metrics.stage("resize"):
+        # Buffers reutilizados: rgb_small_frame se sobreescribe en el próximo frame
+        rgb_small_frame = (prep or _PREP)(frame)
+    with metrics.stage("detect"):
+        locations = get_detector(DETECTOR_MODEL).detect(rgb_small_frame)
+    # Un solo shape predictor (68 puntos) por cara: sirve al encoding, al parpadeo y a la pose
+    with metrics.stage("landmarks"):
+        shapes = lm.shapes(rgb_small_frame, locations)
+        points_list = [lm.points(sh) for sh in shapes] if with_points else []
+    with metrics.stage("encode"):
+        encodings = lm.descriptors(rgb_small_frame, shapes)
+    return {"locations": locations, "encodings": encodings, "points": points_list}
+
+def analizar_frame(frame, recent_votes, liveness_states, metrics, with_emotion=None, prep=None, extraido=None,
+                   cam=None):
+    """
+    Pipeline de reconocimiento de un frame BGR: detección, encoding, identidad con
+    votación, parpadeo, pose y emoción. No escribe nada a disco: devuelve una lista
+    de dicts (uno por rostro) para que el llamador decida snapshots, CSV y dibujo.
+    Lo comparten el bucle en vivo y el procesamiento offline (src/offline.py).
+    extraido: resultado de extraer_rostros ya calculado (p. ej. por el pool de procesos).
+    cam: llave de la cámara para buscar solo en sus grupos (data/camaras.json).
+    """
+    if with_emotion is None: with_emotion = EMOTION_ENABLED
+    gallery, fallback = galerias_para(cam)  # Una sola galería por frame, aunque haya recarga en curso
+    if extraido is None:
+        extraido = extraer_rostros(frame, metrics, prep)
+    locations, encodings, points_list = extraido["locations"], extraido["encodings"], extraido["points"]
+    h_orig, w_orig = frame.shape[:2]
+    metrics.faces_in_frame(len(locations))
+
+    results = []
+    for (encoding, loc, pts) in zip(encodings, locations, points_list):
+        # 1. IDENTIDAD
+        with metrics.stage("match"):
+            candidate, best_dist, _ = decidir_identidad(encoding, gallery, fallback, metrics)
+        recent_votes.append(candidate)
+        final_name, votes = Counter(recent_votes).most_common(1)[0]
+        
+        # 2. LIVENESS (PARPADEO)
+        try:
+            leftEye, rightEye = lm.eyes(pts)
+            ear = (eye_aspect_ratio(leftEye) + eye_aspect_ratio(rightEye)) / 2.0
+            if ear < EYE_AR_THRESH: liveness_states[final_name] = True
+        except: pass
+        
+        is_alive = liveness_states.get(final_name, False)
+
+        # 3. COORDENADAS ORIGINALES
+        top, right, bottom, left = loc
+        top *= 4; right *= 4; bottom *= 4; left *= 4
+
+        # 4. ANALITICA AVANZADA
+        with metrics.stage("pose"):
+            shape = lm.pose_points(pts, scale=4)
+            attn_status, attn_color, nose_pt = analytics.get_head_pose(shape, w_orig, h_orig)
+
+        # 5. EMOCIÓN
+        face_crop = crop_view(frame, (top, right, bottom, left))  # Vista, sin copiar
+        emotion = "-"
+        if with_emotion and face_crop.size > 0:
+            with metrics.stage("emotion"):
+                emotion = analytics.get_emotion(final_name, face_crop)
+
+        # --- DECISIÓN ---
+        if final_name == "DESCONOCIDO":
+            main_color = (0, 165, 255) # Naranja
+            label_top = f"ALERTA: {final_name}"
+            label_bot = "NO AUTORIZADO"
+            decision = "ALERTA"
+        elif not is_alive:
+            main_color = (0, 255, 255) # Amarillo
+            label_top = f"{final_name} ({emotion})"
+            label_bot = "PARPADEE POR FAVOR"
+            decision = "LIVENESS"
+        else:
+            main_color = attn_color 
+            label_top = f"{final_name} | {emotion}"
+            label_bot = f"ACCESO | {attn_status}"
+            decision = "ACCESO"
+
+        results.append({
+            "name": final_name,
+            "dist": best_dist,
+            "decision": decision,
+            "attn_status": attn_status,
+            "emotion": emotion,
+            "crop": face_crop,
+            "draw": {
+                "rect": (left, top, right, bottom),
+                "color": main_color,
+                "top_text": label_top,
+                "bot_text": label_bot,
+                "nose": nose_pt,
+                "status": attn_status
+            },
+        })
+    return results
+
+def _abrir_fuente(cam_id=None, url=None, prefer="auto"):
+    """Abre la fuente según la estrategia. Devuelve (cam_sel, cap, backend, reopen_args)."""
     preferred = [cam_id] if cam_id is not None else None
-    orig_url = url
     open_url_first = (prefer == "url") or (prefer == "auto" and url)
     open_local = (prefer == "local") or (prefer == "auto" and not url)
     
     cam_sel, cap, be_name = None, None, ""
     if open_url_first and url: cam_sel, cap, be_name = open_any(url=url, prefer_w=640, prefer_h=480, verbose=True)
     if cap is None and open_local: cam_sel, cap, be_name = open_any(url=None, prefer_w=640, prefer_h=480, preferred_indices=preferred, verbose=True)
-    
-    if cap is None:
-        write_status("cam=None backend=None size=0x0")
-        while True: save_frame_atomic(_placeholder_frame()); time.sleep(0.9)
         
-    if cam_sel is None and url: reopen_args = (orig_url, 640, 480, None, 8, True)
+    if cam_sel is None and url: reopen_args = (url, 640, 480, None, 8, True)
     else: reopen_args = (None, 640, 480, [cam_sel], 8, True)
+    return cam_sel, cap, be_name, reopen_args
 
-    try:
-        w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)); h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        write_status(f"cam={cam_sel if cam_sel is not None else 'IP'} backend={be_name} size={w}x{h}")
-    except: pass
+def loop_panel(cam_id=None, url=None, prefer="auto", sleep_s=0.001, health_port=None):
+    recent_votes = deque(maxlen=VOTES_WINDOW)
+    ensure_csv_header()
+    last_snap_time = {} 
+    snap_counts = {}
+    liveness_states = {} 
 
-    # --- BUCLE PRINCIPAL ---
-    for ok, frame in read_loop(cap, open_any, reopen_args, max_misses=15, delay_s=0.005, verbose=True):
-        if not ok:
+    frame_count = 0
+    last_draw_info = [] 
+    metrics = StageMetrics()
+    # El pool se crea antes que cualquier hilo (los workers nacen de este proceso)
+    pool = SharedFramePool(workers=WORKERS, detector=DETECTOR_MODEL) if WORKERS > 0 else None
+    if pool is not None:
+        atexit.register(pool.close)
+        print(f"[OK] Pool de visión con {WORKERS} procesos")
+    health = HealthState()
+    health.update(fps_fn=metrics.fps, metrics_fn=metrics.render)
+    if health_port: serve_health(health, health_port)
+
+    if not os.path.exists(MODEL_PATH):
+        raise FileNotFoundError("No se encontró el modelo entrenado.")
+    startup = StartupTimeline(t0=_T0)
+    startup.mark("import")
+
+    # La galería y dlib se cargan en paralelo con la apertura/calentamiento de la cámara
+    watchers = []
+    def _precargar():
+        try:
+            g = get_gallery()
+            health.update(model_loaded=True, gallery_size=len(g))
+            startup.mark("gallery")
+            get_students()
+            galerias_para()  # Reparto por grupos de grado si hay data/camaras.json
+            get_detector(DETECTOR_MODEL)  # fuerza el import de dlib (o del backend elegido) y sus modelos
+            startup.mark("models")
+        except Exception as e:
+            print(f"[ERROR] No pude cargar la galería: {e}")
+            return
+
+        # Recarga en caliente: nuevo entrenamiento, bandera en data/run o SIGHUP
+        def _swap(new):
+            set_gallery(new)
+            galerias_para()  # Reparto por grupos fuera del bucle (las sub-galerías se arman al usarse)
+            health.update(gallery_size=len(new))
+        watchers.append(GalleryWatcher(MODEL_PATH, g, _swap, interval=GALLERY_WATCH_S, flag_file=RELOAD_FLAG).start())
+    threading.Thread(target=_precargar, name="preload", daemon=True).start()
+    if hasattr(signal, "SIGHUP"):
+        # signal.signal solo se puede llamar desde el hilo principal
+        signal.signal(signal.SIGHUP, lambda *_: [w.request_reload() for w in watchers])
+
+    # Agregados diarios/horarios para el reporter y los KPIs del panel, al día con el CSV,
+    # y el índice por hora de events.csv (events.csv.idx) para las consultas por rango
+    def _rollups():
+        rollups = Rollups(events_csv=EVENTS_CSV)
+        index = EventIndex(EVENTS_CSV)
+        while True:
+            try: rollups.update()
+            except Exception as e: print(f"[WARN] No pude actualizar los agregados: {e}")
+            try: index.update()
+            except Exception as e: print(f"[WARN] No pude actualizar el índice de eventos: {e}")
+            time.sleep(ROLLUP_EVERY_S)
+    threading.Thread(target=_rollups, name="rollups", daemon=True).start()
+
+    # Sesiones de presencia: una fila en events.csv (y sessions.csv) cuando la persona se va
+    def _cerrar_sesion(sesion):
+        with metrics.stage("csv"):
+            nombre, codigo, grado = enriquecer(sesion.name)
+            append_session(sesion, nombre, codigo, grado)
+            append_event(sesion.cam_id, nombre, codigo, grado, f"{sesion.best_dist:.2f}", sesion.decision,
+                         sesion.quality, sesion.snapshot_path, ts=sesion.first_seen)
+        metrics.inc("sessions_closed_total")
+    sessions = SessionAggregator(on_close=_cerrar_sesion)
+    atexit.register(sessions.flush)
+    if hasattr(signal, "SIGTERM"):
+        # stop_worker manda SIGTERM: salgo ordenado para que atexit cierre las sesiones abiertas
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    # Canal de control: cambiar de fuente, pausar, umbrales y recarga sin reiniciar
+    control = ControlServer().start()
+    fuente = {"cam_id": cam_id, "url": url, "prefer": prefer}
+    paused = False
+
+    def _aplicar(cmd):
+        """Aplica un comando del canal de control. True si hay que cambiar de fuente."""
+        try:
+            return _aplicar_cmd(cmd)
+        except Exception as e:  # Un comando malo no tumba el bucle de captura
+            log(f"[WARN] Comando de control ignorado {cmd}: {e}")
+            metrics.inc("control_errors_total")
+            return False
+
+    def _aplicar_cmd(cmd):
+        nonlocal paused
+        global THRESH, MARGIN, EYE_AR_THRESH, FRAME_SKIP
+        log(f"[CONTROL] {cmd}")
+        if cmd["cmd"] == "switch_source":
+            fuente.update(prefer=cmd.get("prefer", "auto"), url=(cmd.get("url") or "").strip(),
+                          cam_id=cmd.get("cam", fuente["cam_id"]))
+            recent_votes.clear()  # Los votos de la cámara anterior no aplican a la nueva
+            return True
+        if cmd["cmd"] in ("pause", "resume"):
+            paused = cmd["cmd"] == "pause"
+            health.update(paused=paused)
+        elif cmd["cmd"] == "set":
+            THRESH = float(cmd.get("thresh", THRESH)); MARGIN = float(cmd.get("margin", MARGIN))
+            EYE_AR_THRESH = float(cmd.get("eye_ar_thresh", EYE_AR_THRESH))
+            FRAME_SKIP = int(cmd.get("frame_skip", FRAME_SKIP))
+        elif cmd["cmd"] == "reload_gallery":
+            if watchers: watchers[0].request_reload()
+            else: RELOAD_FLAG.touch()
+        return False
+
+    # Snapshots y sesiones de un frame ya analizado (sea en este proceso o en el pool)
+    def _registrar(faces):
+        """Snapshots y sesiones de los rostros de un frame analizado. Devuelve qué dibujar."""
+        if faces: startup.mark("first_detection")
+        current_draw_info = [] 
+
+        for face in faces:
+            final_name, decision = face["name"], face["decision"]
+            current_draw_info.append(face["draw"])
+
+            # SNAPSHOTS
+            snap_path = ""
+            current_count = snap_counts.get(final_name, 0)
+            if current_count < MAX_SNAPSHOTS and (decision in ["ALERTA", "ACCESO"]):
+                now = time.time()
+                if (now - last_snap_time.get(final_name, 0)) > SNAPSHOT_COOLDOWN:
+                    try:
+                        with metrics.stage("snapshot"):
+                            snap_path = save_snapshot(face["crop"], codigo=final_name)
+                        last_snap_time[final_name] = now 
+                        snap_counts[final_name] = current_count + 1
+                    except: pass
+
+            # CSV
+            if decision in ["ACCESO", "ALERTA"]:
+                extra_data = f"{face['attn_status']}|{face['emotion']}"
+                decision_csv = "accepted" if decision == "ACCESO" else "rejected"
+                sessions.observe(cam_key, final_name, decision_csv, face["dist"], extra_data, snap_path)
+                if RAW_EVENTS:
+                    with metrics.stage("csv"):
+                        nombre, codigo, grado = enriquecer(final_name)
+                        append_event(cam_key, nombre, codigo, grado, f"{face['dist']:.2f}", decision_csv,
+                                     extra_data, snap_path, path=EVENTS_RAW_CSV)
+        return current_draw_info
+
+    while True:
+        cam_sel, cap, be_name, reopen_args = _abrir_fuente(**fuente)
+        # Llave de la cámara en events.csv y en data/camaras.json: el índice local o la URL
+        cam_key = str(cam_sel) if cam_sel is not None else (fuente["url"] or "IP")
+
+        if cap is None:
+            # Sin fuente: espero un cambio de fuente por el canal de control y,
+            # mientras tanto, reintento abrir la misma cada REOPEN_RETRY_S
+            health.update(source_open=False)
             write_status("cam=None backend=None size=0x0")
-            save_frame_atomic(_placeholder_frame()); time.sleep(1.0); continue
-        if frame is None or frame.size == 0: continue
-
-        frame_count += 1
-        
-        # --- PROCESAMIENTO (1 de cada 3 frames) ---
-        if frame_count % (FRAME_SKIP + 1) == 0:
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            h_orig, w_orig = frame.shape[:2]
-
-            locations = face_recognition.face_locations(rgb_small_frame, model=DETECTOR_MODEL)
-            encodings = face_recognition.face_encodings(rgb_small_frame, locations)
-            landmarks_list = face_recognition.face_landmarks(rgb_small_frame, locations)
-
-            current_draw_info = [] 
-
-            for (encoding, loc, landmarks) in zip(encodings, locations, landmarks_list):
-                # 1. IDENTIDAD
-                candidate, best_dist, _ = decidir_identidad(encoding)
-                recent_votes.append(candidate)
-                final_name, votes = Counter(recent_votes).most_common(1)[0]
-                
-                # 2. LIVENESS (PARPADEO)
-                try:
-                    leftEye = landmarks['left_eye']
-                    rightEye = landmarks['right_eye']
-                    ear = (eye_aspect_ratio(leftEye) + eye_aspect_ratio(rightEye)) / 2.0
-                    if ear < EYE_AR_THRESH: liveness_states[final_name] = True
-                except: pass
+            retry_at = time.time() + REOPEN_RETRY_S
+            while time.time() < retry_at:
+                health.beat(); save_frame_atomic(_placeholder_frame())
+                cmd = control.get(timeout=0.9)
+                if cmd is not None and _aplicar(cmd): break
+            continue
+
+        try:
+            w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)); h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            write_status(f"cam={cam_sel if cam_sel is not None else 'IP'} backend={be_name} size={w}x{h}")
+        except: pass
+        health.update(source_open=True, source=str(fuente["url"] if cam_sel is None else cam_sel))
+        startup.mark("camera_open")
+        if EMOTION_ENABLED: analytics.precargar_emocion()
+
+        # --- BUCLE PRINCIPAL ---
+        t_prev = time.perf_counter()
+        frames = read_loop(cap, open_any, reopen_args, max_misses=15, delay_s=0.005, verbose=True,
+                           on_miss=lambda: metrics.inc("dropped_frames_total"),
+                           on_reconnect=lambda: metrics.inc("reconnects_total"), reuse_buffer=True)
+        for ok, frame in frames:
+            metrics.observe("grab", time.perf_counter() - t_prev)
+            # Comandos pendientes, siempre entre frames
+            if any([_aplicar(c) for c in control.drain()]):
+                break
+            health.set_queue("control", control.commands.qsize())
+            if not ok:
+                health.update(source_open=False); health.beat()
+                write_status("cam=None backend=None size=0x0")
+                save_frame_atomic(_placeholder_frame()); time.sleep(1.0)
+                t_prev = time.perf_counter(); continue
+            if frame is None or frame.size == 0:
+                metrics.inc("dropped_frames_total")
+                t_prev = time.perf_counter(); continue
+
+            frame_count += 1
+            _PREP.track_input(frame)
+            health.beat(frame=True)
+            startup.mark("first_frame")
+            
+            if paused:
+                last_draw_info = []
+                cv2.putText(frame, "PAUSADO", (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 255), 2)
+            
+            # --- PROCESAMIENTO (1 de cada 3 frames) ---
+            if not paused and frame_count % (FRAME_SKIP + 1) == 0:
+                if pool is None:
+                    last_draw_info = _registrar(analizar_frame(frame, recent_votes, liveness_states, metrics,
+                                                               cam=cam_key))
+                else:
+                    pool.submit(frame)  # Sin ranura libre = se salta este frame
+                health.set_queue("votes", len(recent_votes))
+            if pool is not None:
+                # Resultados del pool en orden; cada uno trae su propio frame (en memoria compartida)
+                for seq, frame_pool, res in pool.ready():
+                    if "error" in res:
+                        print(f"[WARN] El pool no pudo analizar un frame: {res['error']}")
+                        pool.release(seq)
+                        continue
+                    for etapa, seg in res["timings"].items(): metrics.observe(etapa, seg)
+                    try:
+                        last_draw_info = _registrar(analizar_frame(frame_pool, recent_votes, liveness_states,
+                                                                   metrics, extraido=res, cam=cam_key))
+                    finally:
+                        pool.release(seq)
+                health.set_queue("pool", pool.in_flight)
+                for k, v in pool.stats.items(): metrics.set(f"pool_{k}", v)
+            sessions.tick()
+            health.set_queue("sessions", len(sessions.open))
+
+            # --- DIBUJAR ---
+            with metrics.stage("draw"):
+                for info in last_draw_info:
+                    l, t, r, b = info["rect"]
+                    col = info["color"]
                 
-                is_alive = liveness_states.get(final_name, False)
-
-                # 3. COORDENADAS ORIGINALES
-                top, right, bottom, left = loc
-                top *= 4; right *= 4; bottom *= 4; left *= 4
-
-                # 4. ANALITICA AVANZADA
-                def to_orig(p): return (p[0]*4, p[1]*4)
-                shape = {
-                    30: to_orig(landmarks['nose_tip'][0]),
-                    8:  to_orig(landmarks['chin'][0]),
-                    36: to_orig(landmarks['left_eye'][0]),
-                    45: to_orig(landmarks['right_eye'][3]),
-                    48: to_orig(landmarks['top_lip'][0]),
-                    54: to_orig(landmarks['top_lip'][6])
-                }
+                    cv2.rectangle(frame, (l, t), (r, b), col, 2)
                 
-                attn_status, attn_color, nose_pt = analytics.get_head_pose(shape, w_orig, h_orig)
-
-                # 5. EMOCIÓN
-                face_crop = frame[max(0, top):min(h_orig, bottom), max(0, left):min(w_orig, right)]
-                emotion = "-"
-                if face_crop.size > 0:
-                    emotion = analytics.get_emotion(final_name, face_crop)
-
-                # --- DECISIÓN ---
-                if final_name == "DESCONOCIDO":
-                    main_color = (0, 165, 255) # Naranja
-                    label_top = f"ALERTA: {final_name}"
-                    label_bot = "NO AUTORIZADO"
-                    decision = "ALERTA"
-                elif not is_alive:
-                    main_color = (0, 255, 255) # Amarillo
-                    label_top = f"{final_name} ({emotion})"
-                    label_bot = "PARPADEE POR FAVOR"
-                    decision = "LIVENESS"
-                else:
-                    main_color = attn_color 
-                    label_top = f"{final_name} | {emotion}"
-                    label_bot = f"ACCESO | {attn_status}"
-                    decision = "ACCESO"
-
-                current_draw_info.append({
-                    "rect": (left, top, right, bottom),
-                    "color": main_color,
-                    "top_text": label_top,
-                    "bot_text": label_bot,
-                    "nose": nose_pt,
-                    "status": attn_status
-                })
-
-                # SNAPSHOTS
-                snap_path = ""
-                current_count = snap_counts.get(final_name, 0)
-                if current_count < MAX_SNAPSHOTS and (decision in ["ALERTA", "ACCESO"]):
-                    now = time.time()
-                    if (now - last_snap_time.get(final_name, 0)) > SNAPSHOT_COOLDOWN:
-                        try:
-                            snap_path = save_snapshot(face_crop, codigo=final_name)
-                            last_snap_time[final_name] = now 
-                            snap_counts[final_name] = current_count + 1
-                        except: pass
+                    # Etiquetas
+                    cv2.rectangle(frame, (l, t - 30), (r, t), col, cv2.FILLED)
+                    cv2.putText(frame, info["top_text"], (l + 5, t - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,0), 2)
                 
-                # CSV
-                if decision in ["ACCESO", "ALERTA"]:
-                    extra_data = f"{attn_status}|{emotion}"
-                    decision_csv = "accepted" if decision == "ACCESO" else "rejected"
-                    append_event(str(cam_sel), final_name, final_name, "", f"{best_dist:.2f}", decision_csv, extra_data, snap_path)
-
-            last_draw_info = current_draw_info
-
-        # --- DIBUJAR ---
-        for info in last_draw_info:
-            l, t, r, b = info["rect"]
-            col = info["color"]
-            
-            cv2.rectangle(frame, (l, t), (r, b), col, 2)
-            
-            # Etiquetas
-            cv2.rectangle(frame, (l, t - 30), (r, t), col, cv2.FILLED)
-            cv2.putText(frame, info["top_text"], (l + 5, t - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,0), 2)
-            
-            cv2.rectangle(frame, (l, b), (r, b + 25), (0,0,0), cv2.FILLED)
-            cv2.putText(frame, info["bot_text"], (l + 5, b + 18), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255,255,255), 1)
-
-            nose = info["nose"]
-            cv2.circle(frame, nose, 5, col, -1)
-
-        save_frame_atomic(frame)
-        time.sleep(sleep_s)
+                    cv2.rectangle(frame, (l, b), (r, b + 25), (0,0,0), cv2.FILLED)
+                    cv2.putText(frame, info["bot_text"], (l + 5, b + 18), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255,255,255), 1)
+
+                    nose = info["nose"]
+                    cv2.circle(frame, nose, 5, col, -1)
+
+            with metrics.stage("publish"):
+                save_frame_atomic(frame)
+            metrics.frame_done()
+            if frame_count % 30 == 0: _PREP.export(metrics)
+            metrics.maybe_export(METRICS_EVERY)
+            time.sleep(sleep_s)
+            t_prev = time.perf_counter()
+        # Fin de la fuente (cambio pedido o reconexión fallida): libero y vuelvo a abrir
+        frames.close()
+        sessions.flush()
 
 def main():
     ap = argparse.ArgumentParser()
@@ -268,9 +586,31 @@ def main():
     ap.add_argument("--cam", type=int, default=None)
     ap.add_argument("--url", type=str, default=os.getenv("CAM_URL", "").strip())
     ap.add_argument("--prefer", choices=["auto","url","local"], default="auto")
+    ap.add_argument("--no-emotion", action="store_true", help="Desactiva la emoción (no importa DeepFace/TensorFlow)")
+    ap.add_argument("--detector", choices=list(DETECTORS), default=None,
+                    help="Detector de rostros (por defecto VISION_DETECTOR o hog)")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Procesos para detección/encoding con memoria compartida (0 = sin pool)")
+    ap.add_argument("--gallery", default=None,
+                    help="Galería a usar (por defecto VISION_GALLERY o models/embeddings_mtcnn.pkl)")
+    ap.add_argument("--raw-events", action="store_true",
+                    help="Además de las sesiones, registrar cada frame en data/logs/events_raw.csv")
+    ap.add_argument("--health-port", type=int, default=int(os.getenv("VISION_HEALTH_PORT", "0") or 0),
+                    help="Puerto local para /healthz, /readyz y /status (0 = desactivado)")
     args = ap.parse_args()
     if args.url: os.environ["CAM_URL"] = args.url
-    loop_panel(cam_id=args.cam, url=args.url, prefer=args.prefer)
+    global EMOTION_ENABLED, RAW_EVENTS, DETECTOR_MODEL, WORKERS, MODEL_PATH
+    if args.gallery:
+        MODEL_PATH = args.gallery
+    if args.workers is not None:
+        WORKERS = max(0, args.workers)
+    if args.detector:
+        DETECTOR_MODEL = args.detector
+    if args.no_emotion:
+        EMOTION_ENABLED = False
+    if args.raw_events:
+        RAW_EVENTS = True
+    loop_panel(cam_id=args.cam, url=args.url, prefer=args.prefer, health_port=args.health_port or None)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
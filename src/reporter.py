@@ -1,9 +1,12 @@
 import ollama
-import pandas as pd
 from pathlib import Path
+import argparse
 import datetime
 import sys
 
+from src.event_index import EventIndex
+from src.rollups import actualizar
+
 # --- CONFIGURACIÓN ---
 # Ajusta esta ruta si tu CSV está en otro lado (ej: data/exports.csv)
 EVENTS_CSV = Path("data/logs/events.csv") 
@@ -12,44 +15,42 @@ EVENTS_CSV = Path("data/logs/events.csv")
 # Si descargaste llama3.2 usa "llama3.2". Si tienes gemma, pon "gemma:2b"
 MODELO = "llama3.2" 
 
-def generar_resumen_diario():
+def generar_resumen_diario(fecha=None, rollups=None):
     # 1. Verificar si hay datos
     if not EVENTS_CSV.exists():
         print(f" No encuentro el archivo de eventos en: {EVENTS_CSV}")
         print("Asegurate de que el sistema de reconocimiento haya guardado algo hoy.")
         return
 
+    # 2. Agregados del día (data/logs/rollups.json, solo se leen las filas nuevas del CSV)
+    hoy = fecha or datetime.datetime.now().strftime("%Y-%m-%d")
     try:
-        df = pd.read_csv(EVENTS_CSV)
+        rollups = rollups or actualizar(events_csv=EVENTS_CSV)
     except Exception as e:
         print(f" Error leyendo el CSV: {e}")
         return
+    dia = rollups.day(hoy)
 
-    # 2. Filtrar eventos de HOY
-    hoy = datetime.datetime.now().strftime("%Y-%m-%d")
-    # Convertimos la columna timestamp a string por seguridad
-    df['timestamp'] = df['timestamp'].astype(str)
-    df_hoy = df[df['timestamp'].str.contains(hoy, na=False)]
-    
-    if df_hoy.empty:
+    if dia is None:
         print(f" No hay registros con fecha de hoy ({hoy}).")
         return
 
-    # 3. Calcular Estadísticas
-    total = len(df_hoy)
+    # 3. Estadísticas (ya calculadas en los agregados)
+    total = dia["total"]
     # Contamos 'rejected' como desconocidos
-    desconocidos = df_hoy[df_hoy['decision'] == 'rejected'].shape[0]
+    desconocidos = dia["decisions"].get("rejected", 0)
     # Contamos 'accepted' como conocidos
-    conocidos = df_hoy[df_hoy['decision'] == 'accepted'].shape[0]
+    conocidos = dia["decisions"].get("accepted", 0)
     
-    # Obtener lista de nombres únicos (sin repetir y quitando vacíos)
-    nombres_vistos = df_hoy[df_hoy['decision'] == 'accepted']['name'].unique()
-    nombres_vistos = [n for n in nombres_vistos if str(n) != 'nan']
+    # Lista de nombres únicos (sin repetir y quitando vacíos)
+    nombres_vistos = dia["identities"]
     lista_nombres = ", ".join(nombres_vistos) if len(nombres_vistos) > 0 else "Ninguno"
+    camaras = ", ".join(f"cam {c}: {n}" for c, n in sorted(dia["cams"].items()))
+    hora_pico = max(dia["hours"], key=lambda h: dia["hours"][h]["total"]) if dia["hours"] else "-"
 
-    print(f" Analizando {total} eventos de hoy...")
+    print(f" Analizando {total} eventos de {hoy}...")
     print(f"   - Conocidos: {conocidos}")
-    print(f"   - Desconocidos/Intrusos: {desconocidos}")
+    print(f"   - Desconocidos/Intrusos: {desconocidos} ({dia['unknown_bursts']} ráfagas)")
 
     # 4. El Prompt para la IA
     prompt = f"""
@@ -60,6 +61,9 @@ def generar_resumen_diario():
     TOTAL DETECCIONES: {total}
     PERSONAS AUTORIZADAS: {lista_nombres}
     ALERTA INTRUSOS (Desconocidos): {desconocidos}
+    RÁFAGAS DE DESCONOCIDOS: {dia['unknown_bursts']}
+    DETECCIONES POR CÁMARA: {camaras}
+    HORA CON MÁS ACTIVIDAD: {hora_pico}:00
     
     Instrucciones:
     - Escribe un solo párrafo resumen.
@@ -87,5 +91,33 @@ def generar_resumen_diario():
         print(f"\n Error conectando con Ollama: {e}")
         print("Sugerencia: ¿Está abierta la aplicación de Ollama? ¿Descargaste el modelo?")
 
+def generar_rango(desde, hasta):
+    """Un reporte por cada día con eventos en [desde, hasta] (los agregados se cargan una vez)."""
+    rollups = actualizar(events_csv=EVENTS_CSV)
+    for dia in rollups.days(desde, hasta):
+        generar_resumen_diario(dia["date"], rollups=rollups)
+
+def quienes_pasaron(desde, hasta, cam_id=None):
+    """Quién pasó por una cámara entre dos horas; lee solo esa ventana del CSV (events.csv.idx)."""
+    idx = EventIndex(EVENTS_CSV)
+    filas = [r for r in idx.query(desde, hasta, cam_id=cam_id) if r.get("decision") == "accepted"]
+    print(f"\n Cámara {cam_id or 'todas'} | {desde} -> {hasta}: {len(filas)} identificaciones")
+    for r in filas:
+        print(f"  {r['timestamp']}  {r.get('name','')}  ({r.get('grado','')})")
+    return filas
+
 if __name__ == "__main__":
-    generar_resumen_diario()
\ No newline at end of file
+    ap = argparse.ArgumentParser(description="Reporte de seguridad con Ollama")
+    ap.add_argument("--fecha", help="Día YYYY-MM-DD (por defecto hoy)")
+    ap.add_argument("--desde", help="Generar un reporte por día desde YYYY-MM-DD")
+    ap.add_argument("--hasta", help="... hasta YYYY-MM-DD (inclusive)")
+    ap.add_argument("--ventana", nargs=2, metavar=("DESDE", "HASTA"),
+                    help="Listar quién pasó entre 'YYYY-MM-DD HH:MM' y 'YYYY-MM-DD HH:MM' (sin Ollama)")
+    ap.add_argument("--cam", help="Cámara para --ventana")
+    args = ap.parse_args()
+    if args.ventana:
+        quienes_pasaron(*args.ventana, cam_id=args.cam)
+    elif args.desde or args.hasta:
+        generar_rango(args.desde, args.hasta)
+    else:
+        generar_resumen_diario(args.fecha)
\ No newline at end of file
@@ -1,11 +1,22 @@
+# Manejo de datos de estudiantes (CSV o SQLite)
 # src/repositories.py
-import csv
-from typing import Dict, Optional
+import csv, os, queue, sqlite3, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
 
 class StudentRepository:
     def get(self, codigo: str) -> Optional[Dict]:
         raise NotImplementedError
 
+    def get_many(self, codigos: Iterable[str]) -> Dict[str, Dict]:
+        out = {}
+        for c in codigos:
+            row = self.get(c)
+            if row is not None: out[c] = row
+        return out
+
 class CSVStudentRepository(StudentRepository):
     def __init__(self, csv_path: str):
         self._data = {}
@@ -23,13 +34,141 @@ class CSVStudentRepository(StudentRepository):
     def get(self, codigo: str) -> Optional[Dict]:
         return self._data.get(codigo)
 
+def _parse_dsn(dsn: str) -> Tuple[str, str]:
+    """'sqlite:///data/estudiantes.db' -> ('sqlite', 'data/estudiantes.db'). Sin esquema = sqlite."""
+    if "://" not in dsn:
+        return "sqlite", dsn
+    scheme, rest = dsn.split("://", 1)
+    if scheme == "sqlite" and rest.startswith("/"):
+        rest = rest[1:]  # sqlite:///ruta/relativa  |  sqlite:////ruta/absoluta
+    return scheme, rest
+
+_MISSING = object()
+
 class DBStudentRepository(StudentRepository):
-    def __init__(self, dsn: str):
-        # dsn: cadena de conexión (PostgreSQL/MySQL/SQL Server etc.)
+    """
+    Repositorio sobre base de datos. Hoy implementado para SQLite; el DSN deja
+    la puerta abierta a otros motores (solo habría que cambiar _connect y el
+    marcador de parámetros).
+    Delante de `get` hay una caché LRU acotada: en el bucle de visión el mismo
+    código se consulta muchas veces seguidas, así que casi siempre es un acierto
+    en memoria (microsegundos) y no toca la base.
+    """
+    def __init__(self, dsn: str, pool_size: int = 4, cache_size: int = 2048):
+        # dsn: cadena de conexión, ej: sqlite:///data/estudiantes.db
         self._dsn = dsn
-        # TODO: inicializa pool/conexión aquí
+        self._scheme, self._target = _parse_dsn(dsn)
+        if self._scheme != "sqlite":
+            raise NotImplementedError(f"Motor no soportado todavía: {self._scheme}")
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        self._cache: "OrderedDict[str, object]" = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        self._ensure_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._target != ":memory:":
+            Path(self._target).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self._target, check_same_thread=False, timeout=5.0)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def _ensure_schema(self):
+        with self._conn() as c:
+            c.execute("""CREATE TABLE IF NOT EXISTS estudiantes (
+                codigo TEXT PRIMARY KEY, nombre TEXT, apellido TEXT, grado TEXT, ruta TEXT)""")
+            c.commit()
+
+    @staticmethod
+    def _row(r) -> Dict:
+        return {"nombre": r["nombre"] or "", "apellido": r["apellido"] or "",
+                "grado": r["grado"] or "", "ruta": r["ruta"] or ""}
+
+    def _cache_put(self, codigo: str, value):
+        with self._cache_lock:
+            self._cache[codigo] = value
+            self._cache.move_to_end(codigo)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    def import_csv(self, csv_path) -> int:
+        """Carga masiva desde data/estudiantes.csv (reemplaza códigos existentes)."""
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = [(r["codigo"], r.get("nombre", ""), r.get("apellido", ""), r.get("grado", ""),
+                     r.get("ruta_carpeta", "")) for r in csv.DictReader(f)]
+        with self._conn() as c:
+            c.executemany("INSERT OR REPLACE INTO estudiantes (codigo, nombre, apellido, grado, ruta) "
+                          "VALUES (?, ?, ?, ?, ?)", rows)
+            c.commit()
+        self.clear_cache()
+        return len(rows)
+
+    def count(self) -> int:
+        with self._conn() as c:
+            return int(c.execute("SELECT COUNT(*) FROM estudiantes").fetchone()[0])
 
     def get(self, codigo: str) -> Optional[Dict]:
-        # TODO: consulta SQL real
-        # SELECT nombre, apellido, grado FROM estudiantes WHERE codigo = %s
-        return None
+        with self._cache_lock:
+            hit = self._cache.get(codigo, _MISSING)
+            if hit is not _MISSING:
+                self._cache.move_to_end(codigo)
+                return hit
+        with self._conn() as c:
+            r = c.execute("SELECT nombre, apellido, grado, ruta FROM estudiantes WHERE codigo = ?",
+                          (codigo,)).fetchone()
+        value = self._row(r) if r is not None else None
+        self._cache_put(codigo, value)  # También cacheo los "no existe"
+        return value
+
+    def get_many(self, codigos: Iterable[str]) -> Dict[str, Dict]:
+        out, faltan = {}, []
+        with self._cache_lock:
+            for cod in dict.fromkeys(codigos):
+                hit = self._cache.get(cod, _MISSING)
+                if hit is _MISSING: faltan.append(cod)
+                elif hit is not None: out[cod] = hit
+        # Una sola consulta por bloque (SQLite limita los parámetros por sentencia)
+        for i in range(0, len(faltan), 500):
+            bloque = faltan[i:i+500]
+            marks = ",".join("?" * len(bloque))
+            with self._conn() as c:
+                rows = c.execute(f"SELECT codigo, nombre, apellido, grado, ruta FROM estudiantes "
+                                 f"WHERE codigo IN ({marks})", bloque).fetchall()
+            found = {r["codigo"]: self._row(r) for r in rows}
+            for cod in bloque:
+                self._cache_put(cod, found.get(cod))
+            out.update(found)
+        return out
+
+    def close(self):
+        while not self._pool.empty():
+            try: self._pool.get_nowait().close()
+            except Exception: pass
+
+def open_student_repository(db_path, csv_path=None) -> StudentRepository:
+    """
+    Repositorio por defecto: SQLite en db_path, reimportando el CSV si es más
+    nuevo que la base (así editar estudiantes.csv sigue funcionando como antes).
+    """
+    db_path = Path(db_path)
+    is_new = not db_path.exists()
+    repo = DBStudentRepository(f"sqlite:///{db_path}")
+    if csv_path is not None and Path(csv_path).exists():
+        if is_new or os.path.getmtime(csv_path) > os.path.getmtime(db_path) or repo.count() == 0:
+            repo.import_csv(csv_path)
+    return repo
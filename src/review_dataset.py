@@ -1,43 +1,247 @@
 import cv2
 import os
 import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.gallery import ENCODER_MODEL
 
 # --- CONFIGURACIÓN ---
 SNAPSHOTS_DIR = Path("data/snapshots")
 DATASET_DIR = Path("data/dataset")
+MODEL_PATH = Path("models/embeddings_mtcnn.pkl")
+CLUSTER_THRESH = 0.42   # Dos desconocidos a menos de esto se consideran la misma persona
+MONTAGE_MAX = 24        # Fotos que se muestran por grupo
+MONTAGE_CELL = 120
+IMG_EXTS = ('.jpg', '.jpeg', '.png')
 # ---------------------
 
 def safe_name(name):
     return "".join([c for c in name if c.isalnum() or c in (' ','_')]).strip().replace(' ','_')
 
+def _norm(name):
+    return name.lower().replace("_", " ")
+
+class FolderIndex:
+    """
+    Carpetas de data/dataset leídas UNA vez: diccionario exacto (nombre normalizado
+    y solo el ID) y, si no hay acierto, búsqueda por subcadena sobre la lista ya
+    cargada (sin volver a listar el disco por cada foto).
+    """
+    def __init__(self, base_path: Path):
+        self.base_path = base_path
+        self._exact: Dict[str, Path] = {}
+        self._folders: List[Tuple[str, Path]] = []
+        if base_path.exists():
+            for entry in os.scandir(base_path):
+                if entry.is_dir():
+                    self.add(Path(entry.path))
+
+    def add(self, folder: Path):
+        norm = _norm(folder.name)
+        self._folders.append((norm, folder))
+        self._exact.setdefault(norm, folder)
+        # "10001_Aldis_Perez" también se encuentra por "10001"
+        self._exact.setdefault(norm.split(" ", 1)[0], folder)
+
+    def find(self, partial_name) -> Optional[Path]:
+        search = _norm(partial_name)
+        if not search: return None
+        hit = self._exact.get(search)
+        if hit is not None: return hit
+        for folder_norm, folder in self._folders:
+            if search in folder_norm:
+                return folder
+        return None
+
 def find_existing_folder(partial_name, base_path):
     """Busca una carpeta que contenga el nombre, para respetar los IDs (ej: 10001_Nombre)"""
-    if not base_path.exists(): return None
-    
-    # Normalizamos para comparar (minusculas, sin espacios)
-    search = partial_name.lower().replace("_", " ")
-    
-    for folder in os.listdir(base_path):
-        if os.path.isdir(base_path / folder):
-            # Comparamos si el nombre buscado está dentro del nombre de la carpeta
-            folder_norm = folder.lower().replace("_", " ")
-            if search in folder_norm:
-                return base_path / folder
-    return None
+    return FolderIndex(base_path).find(partial_name)
 
-def main():
-    if not SNAPSHOTS_DIR.exists():
-        print(f"No existe la carpeta {SNAPSHOTS_DIR}")
-        return
+def predecir_por_nombre(filename):
+    # Formato esperado: YYYYMMDD_HHMMSS_Nombre_Apellido.jpg
+    parts = filename.split('_')
+    if len(parts) >= 3:
+        return os.path.splitext("_".join(parts[2:]))[0]
+    return "Desconocido"
 
-    # Filtramos solo imagenes
-    files = [f for f in os.listdir(SNAPSHOTS_DIR) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-    
-    if not files:
-        print("¡No hay snapshots nuevos para revisar!")
-        return
+def mover(file_path: Path, final_folder_path: Path, index: Optional[FolderIndex] = None) -> bool:
+    is_new = not final_folder_path.exists()
+    final_folder_path.mkdir(parents=True, exist_ok=True)
+    if is_new and index is not None: index.add(final_folder_path)
+    try:
+        shutil.move(str(file_path), str(final_folder_path / file_path.name))
+        return True
+    except Exception as e:
+        print(f" Error moviendo archivo: {e}")
+        return False
+
+# ---------- PRE-PASADA EN LOTE ----------
+def _codificar(path_str: str) -> Tuple[str, Optional[np.ndarray]]:
+    """Embedding de un snapshot (corre en un proceso del pool)."""
+    import face_recognition
+    img = cv2.imread(path_str)
+    if img is None: return path_str, None
+    rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    boxes = face_recognition.face_locations(rgb, number_of_times_to_upsample=1, model="hog")
+    if not boxes:
+        # El snapshot ya es el recorte de la cara: uso la imagen entera
+        h, w = rgb.shape[:2]
+        boxes = [(0, w, h, 0)]
+    encs = face_recognition.face_encodings(rgb, known_face_locations=boxes[:1], model=ENCODER_MODEL)
+    return path_str, (encs[0] if encs else None)
+
+def codificar_todos(files: List[Path], workers: Optional[int] = None) -> Dict[Path, np.ndarray]:
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    out = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for n, (p, enc) in enumerate(pool.map(_codificar, [str(f) for f in files], chunksize=16), 1):
+            if enc is not None: out[Path(p)] = enc
+            if n % 200 == 0: print(f"   {n}/{len(files)} codificadas...")
+    return out
+
+def agrupar_desconocidos(encs: np.ndarray, thresh: float = CLUSTER_THRESH) -> List[List[int]]:
+    """
+    Componentes conexas del grafo "distancia < thresh" (union-find sobre la matriz
+    de distancias por bloques). Devuelve los grupos más grandes primero.
+    """
+    n = len(encs)
+    parent = list(range(n))
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]; i = parent[i]
+        return i
+    sq = (encs ** 2).sum(axis=1)
+    for a in range(0, n, 512):
+        blk = encs[a:a+512]
+        d2 = sq[a:a+512, None] + sq[None, :] - 2.0 * blk @ encs.T
+        ii, jj = np.nonzero(d2 < thresh * thresh)
+        for i, j in zip(ii + a, jj):
+            if j > i:
+                ri, rj = root(i), root(int(j))
+                if ri != rj: parent[ri] = rj
+    groups: Dict[int, List[int]] = {}
+    for i in range(n):
+        groups.setdefault(root(i), []).append(i)
+    return sorted(groups.values(), key=len, reverse=True)
+
+def preparar_grupos(files: List[Path], workers: Optional[int] = None) -> List[Dict]:
+    """
+    Codifica todo en paralelo, asigna a la galería lo que coincide con claridad
+    (mismo criterio que el reconocimiento en vivo) y agrupa el resto por embedding.
+    """
+    from src.gallery import load_gallery
+    from src.recognize import THRESH, MARGIN
+
+    print(f"[INFO] Codificando {len(files)} snapshots...")
+    encodings = codificar_todos(files, workers)
+    sin_cara = [f for f in files if f not in encodings]
+    try:
+        gallery = load_gallery(str(MODEL_PATH))
+    except Exception as e:
+        print(f"[WARN] Sin galería ({e}): todo se agrupa como desconocido.")
+        gallery = None
+
+    conocidos: Dict[str, List[Tuple[Path, float]]] = {}
+    pendientes: List[Path] = []
+    for f, enc in encodings.items():
+        if gallery is not None and len(gallery) > 0:
+            idx, best, second = gallery.nearest(enc)
+            if best <= THRESH and (second - best) >= MARGIN:
+                conocidos.setdefault(gallery.names[idx], []).append((f, best))
+                continue
+        pendientes.append(f)
+
+    grupos = [{"files": [f for f, _ in sorted(v, key=lambda x: x[1])], "suggest": name, "known": True}
+              for name, v in sorted(conocidos.items(), key=lambda kv: -len(kv[1]))]
+    if pendientes:
+        idx_groups = agrupar_desconocidos(np.stack([encodings[f] for f in pendientes]).astype(np.float64))
+        for g in idx_groups:
+            gfiles = [pendientes[i] for i in g]
+            # Si las fotos traen nombre en el archivo, sugiero el más frecuente
+            nombres = [predecir_por_nombre(f.name) for f in gfiles]
+            sug = max(set(nombres), key=nombres.count)
+            grupos.append({"files": gfiles, "suggest": sug, "known": False})
+    if sin_cara:
+        grupos.append({"files": sin_cara, "suggest": None, "known": False, "no_face": True})
+    return grupos
+
+def montaje(files: List[Path], titulo: str):
+    cells = []
+    for f in files[:MONTAGE_MAX]:
+        img = cv2.imread(str(f))
+        if img is not None:
+            cells.append(cv2.resize(img, (MONTAGE_CELL, MONTAGE_CELL)))
+    if not cells: return None
+    cols = min(6, len(cells))
+    rows = (len(cells) + cols - 1) // cols
+    canvas = np.zeros((rows * MONTAGE_CELL + 40, cols * MONTAGE_CELL, 3), dtype=np.uint8)
+    for k, c in enumerate(cells):
+        r, q = divmod(k, cols)
+        canvas[40 + r*MONTAGE_CELL:40 + (r+1)*MONTAGE_CELL, q*MONTAGE_CELL:(q+1)*MONTAGE_CELL] = c
+    cv2.putText(canvas, titulo, (8, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    return canvas
+
+def revisar_por_grupos(files: List[Path], index: FolderIndex, workers: Optional[int] = None) -> int:
+    grupos = preparar_grupos(files, workers)
+    print(f"--- {len(files)} FOTOS EN {len(grupos)} GRUPOS ---")
+    print("TECLAS DE CONTROL (por grupo):")
+    print(" [ENTER] : Confirmar el grupo completo en la carpeta sugerida.")
+    print(" [n]     : Corregir nombre manualmente para todo el grupo.")
+    print(" [u]     : Revisar este grupo foto por foto.")
+    print(" [d]     : Borrar todo el grupo.")
+    print(" [s]     : Saltar.   [q] : Salir.")
+    print("-" * 40)
+
+    count = 0
+    for gi, g in enumerate(grupos, 1):
+        gfiles = [f for f in g["files"] if f.exists()]
+        if not gfiles: continue
+        sug = g["suggest"]
+        folder = index.find(sug) if sug else None
+        destino = folder.name if folder else (safe_name(sug) if sug else "(sin sugerencia)")
+        etiqueta = "SIN CARA" if g.get("no_face") else ("GALERÍA" if g["known"] else "AGRUPADO")
+        titulo = f"[{gi}/{len(grupos)}] {etiqueta}: {len(gfiles)} fotos -> {destino}"
+        img = montaje(gfiles, titulo)
+        if img is None: continue
+        cv2.imshow("Revisor por grupos", img)
+        print(f"\n{titulo} {'(EXISTENTE)' if folder else '(NUEVA)' if sug else ''}")
+        key = cv2.waitKey(0)
+
+        final_folder_path = None
+        if key == ord('q'):
+            break
+        elif key == ord('s'):
+            continue
+        elif key == ord('u'):
+            count += revisar_uno_a_uno(gfiles, index)
+            continue
+        elif key == ord('d'):
+            for f in gfiles: os.remove(f)
+            print(f" {len(gfiles)} fotos borradas.")
+            continue
+        elif key == ord('n'):
+            new_name = input("Escribe el nombre o ID correcto para el grupo: ").strip()
+            if not new_name: continue
+            final_folder_path = index.find(new_name) or DATASET_DIR / safe_name(new_name)
+        elif (key == 13 or key == ord('y')) and sug:
+            final_folder_path = folder or DATASET_DIR / safe_name(sug)
+        else:
+            print("Tecla no reconocida, saltando...")
+            continue
+
+        movidas = sum(mover(f, final_folder_path, index) for f in gfiles)
+        print(f" {movidas} movidas a: {final_folder_path.name}")
+        count += movidas
+    cv2.destroyAllWindows()
+    return count
 
+# ---------- REVISIÓN CLÁSICA (una por una) ----------
+def revisar_uno_a_uno(files: List[Path], index: FolderIndex) -> int:
     print(f"--- INICIANDO REVISIÓN DE {len(files)} FOTOS ---")
     print("TECLAS DE CONTROL:")
     print(" [ENTER] : Confirmar (Mueve a la carpeta detectada).")
@@ -47,22 +251,13 @@ def main():
     print("-" * 40)
 
     count = 0
-    for filename in files:
-        file_path = SNAPSHOTS_DIR / filename
-        
-        # Intentamos extraer el nombre del archivo del snapshot
-        # Formato esperado: YYYYMMDD_HHMMSS_Nombre_Apellido.jpg
-        parts = filename.split('_')
-        predicted_name = "Desconocido"
-        
-        # Si tiene mas de 2 partes, asumimos que lo que sigue a la fecha/hora es el nombre
-        if len(parts) >= 3:
-            raw_name = "_".join(parts[2:]).replace(".jpg","").replace(".png","")
-            predicted_name = raw_name
-        
-        # BÚSQUEDA INTELIGENTE DE CARPETA
-        existing_folder = find_existing_folder(predicted_name, DATASET_DIR)
-        
+    for file_path in files:
+        filename = file_path.name
+        predicted_name = predecir_por_nombre(filename)
+
+        # BÚSQUEDA INTELIGENTE DE CARPETA (en el índice, sin listar el disco)
+        existing_folder = index.find(predicted_name)
+
         # Si encontramos la carpeta con ID (ej: 10001_Aldis...), sugerimos esa
         if existing_folder:
             target_folder_name = existing_folder.name
@@ -75,59 +270,78 @@ def main():
         img = cv2.imread(str(file_path))
         if img is None: continue
         display_img = cv2.resize(img, (0,0), fx=2.0, fy=2.0)
-        
+
         # Agregar texto informativo en la imagen (opcional)
-        cv2.putText(display_img, f"Sugerencia: {target_folder_name}", (10, 30), 
+        cv2.putText(display_img, f"Sugerencia: {target_folder_name}", (10, 30),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        
+
         cv2.imshow("Revisor (Presiona ENTER, D o N)", display_img)
-        
+
         print(f"\nFoto: {filename}")
         print(f"--> Destino sugerido: [{target_folder_name}] {'(NUEVA)' if is_new_folder else '(EXISTENTE)'}")
-        
+
         key = cv2.waitKey(0)
 
         final_folder_path = None
 
         if key == ord('q'): # Salir
             break
-        
+
         elif key == ord('d'): # Delete
             os.remove(file_path)
             print(" Foto borrada.")
             continue
-            
+
         elif key == ord('n'): # Rename
             new_name = input("Escribe el nombre o ID correcto: ").strip()
             # Buscamos de nuevo por si el usuario escribió el nombre real
-            found = find_existing_folder(new_name, DATASET_DIR)
+            found = index.find(new_name)
             if found:
                 final_folder_path = found
             else:
                 final_folder_path = DATASET_DIR / safe_name(new_name)
-            
+
         elif key == 13 or key == ord('y'): # Enter
             if existing_folder:
                 final_folder_path = existing_folder
             else:
                 final_folder_path = DATASET_DIR / target_folder_name
-            
+
         else:
             print("Tecla no reconocida, saltando...")
             continue
 
         # MOVER EL ARCHIVO
-        if final_folder_path:
-            final_folder_path.mkdir(parents=True, exist_ok=True)
-            try:
-                shutil.move(str(file_path), str(final_folder_path / filename))
-                print(f" Movido a: {final_folder_path.name}")
-                count += 1
-            except Exception as e:
-                print(f" Error moviendo archivo: {e}")
+        if final_folder_path and mover(file_path, final_folder_path, index):
+            print(f" Movido a: {final_folder_path.name}")
+            count += 1
 
     cv2.destroyAllWindows()
+    return count
+
+def main():
+    ap = argparse.ArgumentParser(description="Revisión de snapshots hacia data/dataset")
+    ap.add_argument("--uno-a-uno", action="store_true", help="Revisión clásica, foto por foto (sin pre-pasada)")
+    ap.add_argument("--workers", type=int, default=None, help="Procesos para codificar (por defecto núcleos-1)")
+    args = ap.parse_args()
+
+    if not SNAPSHOTS_DIR.exists():
+        print(f"No existe la carpeta {SNAPSHOTS_DIR}")
+        return
+
+    # Filtramos solo imagenes
+    files = sorted(SNAPSHOTS_DIR / f for f in os.listdir(SNAPSHOTS_DIR) if f.lower().endswith(IMG_EXTS))
+
+    if not files:
+        print("¡No hay snapshots nuevos para revisar!")
+        return
+
+    index = FolderIndex(DATASET_DIR)
+    if args.uno_a_uno:
+        count = revisar_uno_a_uno(files, index)
+    else:
+        count = revisar_por_grupos(files, index, args.workers)
     print(f"\nResumen: {count} fotos procesadas.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
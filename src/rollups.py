@@ -0,0 +1,181 @@
+# src/rollups.py
+# Agregados por día y por hora de data/logs/events.csv, mantenidos de forma incremental.
+# Guardo en data/logs/rollups.json cuántos bytes del CSV ya procesé; cada
+# actualización solo lee lo que se agregó desde entonces (el CSV solo crece por el
+# final). Si el CSV se achica (lo borraron o rotaron) se reconstruye desde cero.
+#
+# Por día:  total, conteo por decisión, identidades distintas, totales por cámara,
+#           ráfagas de desconocidos y, dentro, el mismo desglose por hora.
+# Ráfaga de desconocidos: BURST_MIN o más 'rejected' seguidos en la misma cámara
+# sin huecos mayores a BURST_GAP_S.
+#
+# Uso:
+#   python -m src.rollups             # actualiza
+#   python -m src.rollups --rebuild   # reconstruye todo
+
+import argparse, csv, io, json, os, tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.config import EVENTS_CSV, LOGS_DIR
+
+ROLLUP_FILE = LOGS_DIR / "rollups.json"
+ROLLUP_VERSION = 1
+BURST_GAP_S = 30.0
+BURST_MIN = 3
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+UNKNOWN_NAMES = ("", "DESCONOCIDO", "nan")
+
+def _empty_bucket() -> Dict:
+    return {"total": 0, "decisions": {}, "cams": {}, "unknown_bursts": 0}
+
+def _empty_state(source: Path) -> Dict:
+    return {"version": ROLLUP_VERSION, "source": str(source), "offset": 0,
+            "header": None, "days": {}, "bursts": {}}
+
+def _inc(d: Dict, key: str, n: int = 1):
+    d[key] = d.get(key, 0) + n
+
+class Rollups:
+    """
+    Estado de los agregados. Las identidades del día se guardan como lista en el
+    JSON y como set en memoria.
+    """
+    def __init__(self, path: Path = ROLLUP_FILE, events_csv: Path = EVENTS_CSV):
+        self.path = Path(path)
+        self.events_csv = Path(events_csv).resolve()
+        self.state = _empty_state(self.events_csv)
+        self._ids: Dict[str, set] = {}
+        self._load()
+
+    # ---------- persistencia ----------
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") != ROLLUP_VERSION or data.get("source") != str(self.events_csv):
+            return  # Formato viejo u otro CSV: se reconstruye
+        self.state = data
+        self._ids = {d: set(v.pop("identities", [])) for d, v in data["days"].items()}
+
+    def save(self):
+        days = {d: dict(v, identities=sorted(self._ids.get(d, ()))) for d, v in self.state["days"].items()}
+        payload = dict(self.state, days=days)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Temporal con nombre único: el worker y el panel pueden guardar a la vez
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.path.parent, prefix=self.path.name + ".",
+                                         suffix=".tmp", delete=False) as f:
+            f.write(json.dumps(payload, ensure_ascii=False))
+        try:
+            os.replace(f.name, self.path)
+        except OSError:
+            Path(f.name).unlink(missing_ok=True)
+            raise
+
+    def rebuild(self) -> int:
+        self.state = _empty_state(self.events_csv)
+        self._ids = {}
+        return self.update()
+
+    # ---------- ingesta incremental ----------
+    def update(self) -> int:
+        """Procesa las filas nuevas del CSV. Devuelve cuántos eventos se agregaron."""
+        try:
+            size = self.events_csv.stat().st_size
+        except OSError:
+            return 0
+        if size < self.state["offset"]:
+            print("[INFO] events.csv se achicó: reconstruyo los agregados.")
+            self.state = _empty_state(self.events_csv)
+            self._ids = {}
+        if size == self.state["offset"]:
+            return 0
+        with open(self.events_csv, "rb") as f:
+            f.seek(self.state["offset"])
+            chunk = f.read(size - self.state["offset"])
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            return 0  # Solo hay una línea a medio escribir
+        chunk = chunk[:end + 1]
+        rows = csv.reader(io.StringIO(chunk.decode("utf-8", errors="replace")))
+        if self.state["header"] is None:
+            self.state["header"] = next(rows, None)
+        cols = {c: i for i, c in enumerate(self.state["header"] or [])}
+        n = 0
+        for row in rows:
+            if row and self._add(row, cols): n += 1
+        self.state["offset"] += len(chunk)
+        self.save()
+        return n
+
+    def _add(self, row: List[str], cols: Dict[str, int]) -> bool:
+        def col(name):
+            i = cols.get(name)
+            return row[i] if i is not None and i < len(row) else ""
+        ts = col("timestamp")
+        if len(ts) < 13 or ts[4] != "-":
+            return False  # Línea corrupta o encabezado repetido
+        day, hour = ts[:10], ts[11:13]
+        decision, cam, name = col("decision") or "-", col("cam_id") or "-", col("name")
+
+        d = self.state["days"].setdefault(day, dict(_empty_bucket(), hours={}, first_ts=ts, last_ts=ts))
+        h = d["hours"].setdefault(hour, _empty_bucket())
+        for b in (d, h):
+            b["total"] += 1
+            _inc(b["decisions"], decision)
+            _inc(b["cams"], cam)
+        d["first_ts"], d["last_ts"] = min(d["first_ts"], ts), max(d["last_ts"], ts)
+        if decision == "accepted" and name not in UNKNOWN_NAMES:
+            self._ids.setdefault(day, set()).add(name)
+        if decision == "rejected" and self._burst(cam, ts):
+            d["unknown_bursts"] += 1
+            h["unknown_bursts"] += 1
+        return True
+
+    def _burst(self, cam: str, ts: str) -> bool:
+        """True justo cuando una racha de desconocidos en `cam` llega a BURST_MIN."""
+        try:
+            t = datetime.strptime(ts[:19], TS_FORMAT).timestamp()
+        except ValueError:
+            return False
+        b = self.state["bursts"].get(cam)
+        if b is None or t - b["last"] > BURST_GAP_S:
+            b = {"last": t, "n": 0}
+        b["last"], b["n"] = t, b["n"] + 1
+        self.state["bursts"][cam] = b
+        return b["n"] == BURST_MIN
+
+    # ---------- consultas ----------
+    def day(self, day: str) -> Optional[Dict]:
+        """Resumen de un día 'YYYY-MM-DD' (None si no hubo eventos)."""
+        d = self.state["days"].get(day)
+        if d is None:
+            return None
+        ids = self._ids.get(day, set())
+        return dict(d, identities=sorted(ids), distinct=len(ids))
+
+    def days(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """Resúmenes de los días en [start, end], ordenados."""
+        keys = sorted(k for k in self.state["days"] if (start is None or k >= start) and (end is None or k <= end))
+        return [dict(self.day(k), date=k) for k in keys]
+
+def actualizar(path: Path = ROLLUP_FILE, events_csv: Path = EVENTS_CSV) -> Rollups:
+    """Carga los agregados y los pone al día con el CSV."""
+    r = Rollups(path, events_csv)
+    r.update()
+    return r
+
+def main():
+    ap = argparse.ArgumentParser(description="Agregados diarios/horarios de events.csv")
+    ap.add_argument("--rebuild", action="store_true", help="Reconstruir desde cero")
+    ap.add_argument("--events", default=str(EVENTS_CSV))
+    ap.add_argument("--out", default=str(ROLLUP_FILE))
+    args = ap.parse_args()
+    r = Rollups(Path(args.out), Path(args.events))
+    n = r.rebuild() if args.rebuild else r.update()
+    print(f"[OK] {n} eventos nuevos; {len(r.state['days'])} días en {args.out}")
+
+if __name__ == "__main__":
+    main()
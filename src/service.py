@@ -0,0 +1,374 @@
+# src/service.py
+# Servicio local de reconocimiento: un proceso con la galería y dlib ya cargados
+# para los kioscos de inscripción y las herramientas de administración, en vez de
+# pagar el arranque en frío en cada script.
+#
+# POST /recognize
+#   - cuerpo = una imagen (Content-Type image/jpeg, image/png ...)   -> {"faces": [...]}
+#   - JSON {"images": ["<base64>", ...], "cam": "0"}                  -> {"results": [{"faces": [...]}, ...]}
+#   ?cam=<llave> usa los grupos de esa cámara (data/camaras.json), igual que en vivo.
+# GET /healthz, /status, /metrics
+#
+# Las imágenes que llegan se encolan; un solo hilo arma micro-lotes: toma la primera
+# y espera hasta BATCH_WINDOW_MS (o hasta MAX_BATCH imágenes) por más. El lote se
+# detecta/codifica junto (en paralelo con --workers, vía src/vision_pool.py) y todas
+# sus caras se comparan contra la galería en una sola pasada (Gallery.nearest_many).
+# Cada respuesta trae cuánto esperó en la cola y el tamaño del lote en que entró.
+#
+# Puertos locales: 8765 es el /healthz del worker en vivo (VISION_HEALTH_PORT, lo
+# activa el panel); este servicio usa 8766 (VISION_SERVICE_PORT) para que puedan
+# correr juntos.
+#
+# Uso:
+#   python -m src.service --port 8766 --workers 2
+#   python -m src.service --client foto1.jpg foto2.jpg     # prueba contra el servicio
+
+import argparse, base64, json, os, queue, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from src.config import RUN_DIR
+from src.metrics import StageMetrics
+
+PORT = int(os.getenv("VISION_SERVICE_PORT", "8766") or 8766)  # 8765 es del health del worker
+PORT_FILE = RUN_DIR / "service.port"
+BATCH_WINDOW_MS = 15.0   # Espera máxima por más imágenes desde la primera del lote
+MAX_BATCH = 16           # Imágenes por lote
+QUEUE_MAX = 256          # Imágenes esperando; más que esto -> 503
+MAX_BODY = 20 * 2**20    # Bytes por pedido
+REQUEST_TIMEOUT_S = 30.0
+SCALE = 0.5              # Las fotos de kiosco son más chicas que un frame de cámara: reduzco menos
+MAX_SHAPE = (1080, 1920, 3)  # Imágenes más grandes se reducen antes de procesar
+
+class Job:
+    """Un pedido HTTP: sus imágenes, la cámara y dónde dejar los resultados."""
+    __slots__ = ("images", "cam", "results", "done", "t_in", "batch_size", "queue_ms")
+
+    def __init__(self, images: List[Optional[np.ndarray]], cam: Optional[str]):
+        self.images = images
+        self.cam = cam
+        self.results: List[Dict] = [{} for _ in images]
+        self.done = threading.Event()
+        self.t_in = time.monotonic()
+        self.batch_size = 0
+        self.queue_ms = 0.0
+
+class RecognitionService:
+    def __init__(self, workers: int = 0, window_ms: float = BATCH_WINDOW_MS, max_batch: int = MAX_BATCH,
+                 scale: float = SCALE):
+        # Importo aquí: el cliente (--client) no necesita cargar nada de esto
+        from src import recognize
+        from src.preprocess import FramePreprocessor
+        self.rz = recognize
+        self.window_s = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.scale = scale
+        self.metrics = StageMetrics()
+        self.prep = FramePreprocessor(scale=scale)
+        self.pool = None
+        if workers > 0:
+            from src.vision_pool import SharedFramePool
+            self.pool = SharedFramePool(workers=workers, max_shape=MAX_SHAPE, slots=max(workers * 2, max_batch),
+                                        detector=recognize.DETECTOR_MODEL, scale=scale, with_points=False)
+        self.q: "queue.Queue[Job]" = queue.Queue()
+        self.pending = 0  # Imágenes en cola (para el límite)
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.ready = False
+
+    # ---------- arranque ----------
+    def warm(self):
+        """Galería, base de estudiantes, detector y dlib cargados antes del primer pedido."""
+        t0 = time.perf_counter()
+        g = self.rz.get_gallery()
+        self.rz.get_students()
+        self.rz.galerias_para()
+        self._procesar_imagenes([np.zeros((240, 320, 3), dtype=np.uint8)])
+        self.ready = True
+        print(f"[OK] Servicio listo en {time.perf_counter()-t0:.1f}s | galería: {len(g)} encodings")
+
+    def start(self):
+        threading.Thread(target=self._batcher, name="service-batcher", daemon=True).start()
+        return self
+
+    # ---------- cola y micro-lotes ----------
+    def submit(self, job: Job) -> bool:
+        with self._lock:
+            if self.pending + len(job.images) > QUEUE_MAX:
+                self.metrics.inc("service_rejected_total")
+                return False
+            self.pending += len(job.images)
+        self.q.put(job)
+        return True
+
+    def _batcher(self):
+        while True:
+            job = self.q.get()
+            batch, n = [job], len(job.images)
+            deadline = time.monotonic() + self.window_s
+            while n < self.max_batch:
+                rem = deadline - time.monotonic()
+                if rem <= 0: break
+                try: j = self.q.get(timeout=rem)
+                except queue.Empty: break
+                batch.append(j); n += len(j.images)
+            try:
+                self._procesar_lote(batch, n)
+            except Exception as e:
+                print(f"[WARN] Falló un lote del servicio: {e}")
+                for j in batch:
+                    j.results = [{"error": str(e)} for _ in j.images]
+            finally:
+                with self._lock: self.pending -= n
+                for j in batch: j.done.set()
+
+    def _procesar_lote(self, batch: List[Job], n: int):
+        t0 = time.monotonic()
+        self.metrics.inc("service_batches_total")
+        self.metrics.set("service_last_batch_size", n)
+        for j in batch:
+            j.batch_size, j.queue_ms = n, (t0 - j.t_in) * 1000
+
+        imgs = [img for j in batch for img in j.images]
+        with self.metrics.stage("extract"):
+            extraidos = self._procesar_imagenes(imgs)
+
+        # Todas las caras del lote, agrupadas por cámara (cada una busca en su alcance)
+        por_cam: Dict[Optional[str], List] = {}
+        k = 0
+        for j in batch:
+            for slot in range(len(j.images)):
+                ex = extraidos[k]; k += 1
+                if ex is None or "error" in ex:
+                    j.results[slot] = {"error": ex["error"] if ex else "imagen inválida"}
+                    continue
+                j.results[slot] = {"faces": []}
+                for loc, enc in zip(ex["locations"], ex["encodings"]):
+                    por_cam.setdefault(j.cam, []).append((j.results[slot]["faces"], loc, enc, ex["factor"]))
+        with self.metrics.stage("match"):
+            for cam, caras in por_cam.items():
+                self._decidir(cam, caras)
+        self.metrics.inc("service_images_total", n)
+
+    def _procesar_imagenes(self, imgs: List[Optional[np.ndarray]]) -> List[Optional[Dict]]:
+        """extraer_rostros de cada imagen (en el pool si hay), con el factor para volver a píxeles originales."""
+        listos: List[Optional[Dict]] = [None] * len(imgs)
+        entradas = []
+        for i, img in enumerate(imgs):
+            if img is None: continue
+            factor = 1.0
+            h, w = img.shape[:2]
+            if h > MAX_SHAPE[0] or w > MAX_SHAPE[1]:
+                factor = max(h / MAX_SHAPE[0], w / MAX_SHAPE[1])
+                img = cv2.resize(img, (int(w / factor), int(h / factor)), interpolation=cv2.INTER_AREA)
+            entradas.append((i, np.ascontiguousarray(img), factor / self.scale))
+        if self.pool is None:
+            for i, img, factor in entradas:
+                listos[i] = dict(self.rz.extraer_rostros(img, self.metrics, self.prep, with_points=False), factor=factor)
+            return listos
+        # Con pool: todo el lote en paralelo; los resultados vuelven en orden de envío.
+        # Un solo plazo para enviar y recoger: si el pool no da ranuras, el lote no se queda colgado.
+        seqs = {}
+        t_lim = time.monotonic() + REQUEST_TIMEOUT_S
+        for i, img, factor in entradas:
+            enviado = self.pool.submit(img)
+            while not enviado and time.monotonic() < t_lim:
+                self._recoger(seqs, listos)
+                time.sleep(0.001)
+                enviado = self.pool.submit(img)
+            if enviado:
+                seqs[self.pool.last_seq] = (i, factor)
+            else:
+                listos[i] = {"error": "sin ranura libre en el pool de visión"}
+                self.metrics.inc("service_pool_timeouts_total")
+        while seqs and time.monotonic() < t_lim:
+            self._recoger(seqs, listos)
+            if seqs: time.sleep(0.001)
+        for i, _ in seqs.values():
+            listos[i] = {"error": "el pool de visión no respondió a tiempo"}
+        return listos
+
+    def _recoger(self, seqs: Dict, listos: List):
+        for seq, _frame, res in self.pool.ready():
+            i, factor = seqs.pop(seq, (None, 1.0))
+            if i is not None: listos[i] = dict(res, factor=factor)
+            self.pool.release(seq)
+        # Los que el pool dio por perdidos no van a volver
+        for seq in [s for s in seqs if not self.pool.waiting(s)]:
+            listos[seqs.pop(seq)[0]] = {"error": "el pool de visión perdió la imagen"}
+
+    def _decidir(self, cam: Optional[str], caras: List):
+        rz = self.rz
+        gallery, fallback = rz.galerias_para(cam)
+        encs = [enc for _, _, enc, _ in caras]
+        vecinos = gallery.nearest_many(encs) if len(gallery) else [(-1, 1.0, 1.0)] * len(encs)
+        for (faces, loc, enc, factor), (idx, best, second) in zip(caras, vecinos):
+            if idx >= 0 and best <= rz.THRESH and (second - best) >= rz.MARGIN:
+                name = gallery.names[idx]
+            elif fallback is not None:
+                name, d_fb, s_fb = rz.decidir_identidad(enc, fallback)
+                if name != "DESCONOCIDO": best, second = d_fb, s_fb
+            else:
+                name = "DESCONOCIDO"
+            nombre, codigo, grado = rz.enriquecer(name)
+            top, right, bottom, left = loc
+            faces.append({
+                "box": [int(round(v * factor)) for v in (top, right, bottom, left)],
+                "identity": name, "nombre": nombre, "codigo": codigo, "grado": grado,
+                "distancia": round(float(best), 4), "segunda": round(float(second), 4),
+                "decision": "accepted" if name != "DESCONOCIDO" else "rejected",
+            })
+
+    def status(self) -> Dict:
+        c = self.metrics.counters
+        batches = c.get("service_batches_total", 0)
+        return {
+            "ready": self.ready,
+            "uptime_s": round(time.time() - self.started, 1),
+            "queue": self.pending,
+            "images_total": c.get("service_images_total", 0),
+            "batches_total": batches,
+            "avg_batch": round(c.get("service_images_total", 0) / batches, 2) if batches else 0.0,
+            "rejected_total": c.get("service_rejected_total", 0),
+            "gallery_size": len(self.rz.get_gallery()) if self.ready else 0,
+            "workers": self.pool.workers if self.pool is not None else 0,
+        }
+
+def _decode(data: bytes) -> Optional[np.ndarray]:
+    if not data: return None
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+def _make_handler(svc: RecognitionService):
+    class Handler(BaseHTTPRequestHandler):
+        def _json(self, code: int, payload: Dict):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/healthz":
+                self._json(200 if svc.ready else 503, {"ready": svc.ready})
+            elif path in ("/", "/status"):
+                self._json(200, svc.status())
+            elif path == "/metrics":
+                body = svc.metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/recognize":
+                return self._json(404, {"error": "not found"})
+            n = int(self.headers.get("Content-Length") or 0)
+            if n <= 0: return self._json(400, {"error": "cuerpo vacío"})
+            if n > MAX_BODY: return self._json(413, {"error": f"más de {MAX_BODY} bytes"})
+            body = self.rfile.read(n)
+            cam = (parse_qs(url.query).get("cam") or [None])[0]
+            ctype = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+            lote = ctype == "application/json"
+            try:
+                if lote:
+                    data = json.loads(body.decode("utf-8"))
+                    cam = str(data["cam"]) if data.get("cam") is not None else cam
+                    images = [_decode(base64.b64decode(b)) for b in data.get("images", [])]
+                else:
+                    images = [_decode(body)]
+            except (ValueError, KeyError, TypeError) as e:
+                return self._json(400, {"error": f"pedido inválido: {e}"})
+            if not images: return self._json(400, {"error": "sin imágenes"})
+            if len(images) > QUEUE_MAX: return self._json(413, {"error": f"más de {QUEUE_MAX} imágenes"})
+
+            job = Job(images, cam)
+            svc.metrics.inc("service_requests_total")
+            if not svc.submit(job):
+                return self._json(503, {"error": "servicio ocupado, reintentar"})
+            if not job.done.wait(REQUEST_TIMEOUT_S):
+                return self._json(504, {"error": "tiempo de espera agotado"})
+            meta = {"batch_size": job.batch_size, "queue_ms": round(job.queue_ms, 1),
+                    "total_ms": round((time.monotonic() - job.t_in) * 1000, 1)}
+            if lote:
+                self._json(200, {"results": job.results, **meta})
+            else:
+                r = job.results[0]
+                self._json(400 if "error" in r else 200, {**r, **meta})
+
+        def log_message(self, *args):
+            pass
+    return Handler
+
+def serve(svc: RecognitionService, port: int = PORT, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _make_handler(svc))
+    server.daemon_threads = True
+    try: PORT_FILE.write_text(str(server.server_address[1]), encoding="utf-8")
+    except Exception: pass
+    print(f"[OK] Servicio de reconocimiento en http://{host}:{server.server_address[1]}/recognize")
+    return server
+
+# ---------- cliente (kioscos, scripts) ----------
+def reconocer(imagenes: List[bytes], cam: Optional[str] = None, port: Optional[int] = None,
+              timeout: float = REQUEST_TIMEOUT_S) -> Dict:
+    """Manda imágenes (bytes JPEG/PNG) al servicio local y devuelve el JSON de respuesta."""
+    import urllib.request
+    if port is None:
+        try: port = int(PORT_FILE.read_text(encoding="utf-8").strip())
+        except (OSError, ValueError): port = PORT
+    payload = {"images": [base64.b64encode(b).decode("ascii") for b in imagenes]}
+    if cam is not None: payload["cam"] = str(cam)
+    req = urllib.request.Request(f"http://127.0.0.1:{port}/recognize", data=json.dumps(payload).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(req, timeout=timeout) as r:
+        return json.loads(r.read().decode("utf-8"))
+
+def main():
+    ap = argparse.ArgumentParser(description="Servicio local de reconocimiento con micro-lotes")
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--workers", type=int, default=0, help="Procesos para detección/encoding (0 = en el hilo del lote)")
+    ap.add_argument("--window-ms", type=float, default=BATCH_WINDOW_MS, help="Espera máxima para armar un lote")
+    ap.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    ap.add_argument("--scale", type=float, default=SCALE)
+    ap.add_argument("--client", nargs="+", metavar="IMG", help="No levanta el servicio: manda estas imágenes")
+    ap.add_argument("--cam", default=None, help="Con --client: cámara cuyo alcance usar")
+    args = ap.parse_args()
+
+    if args.client:
+        r = reconocer([Path(p).read_bytes() for p in args.client], cam=args.cam, port=args.port)
+        print(json.dumps(r, ensure_ascii=False, indent=2))
+        return
+
+    svc = RecognitionService(workers=args.workers, window_ms=args.window_ms, max_batch=args.max_batch,
+                             scale=args.scale)
+    server = serve(svc, args.port, args.host)
+    svc.warm()
+    svc.start()
+
+    # Misma recarga en caliente que el productor: nuevo entrenamiento -> galería nueva sin reiniciar
+    from src.gallery import GalleryWatcher
+    rz = svc.rz
+    # (sin la bandera de data/run: esa es del productor y la consume quien la vea primero)
+    GalleryWatcher(rz.MODEL_PATH, rz.get_gallery(), rz.set_gallery, interval=rz.GALLERY_WATCH_S).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if svc.pool is not None: svc.pool.close()
+        PORT_FILE.unlink(missing_ok=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# src/sessions.py
+# Sesiones de presencia: junta las detecciones seguidas de la misma identidad en la
+# misma cámara y las emite UNA vez, cuando la persona se va.
+# Un estudiante parado 10 s frente a la puerta antes dejaba decenas de filas casi
+# iguales en events.csv; ahora deja una (primera vez, última vez, mejor distancia,
+# cantidad de frames y el mejor snapshot).
+#
+# Una sesión se cierra cuando:
+#   - pasan SESSION_GAP_S sin volver a ver a esa identidad en esa cámara, o
+#   - dura más de SESSION_MAX_S (alguien que se queda mucho rato genera varias), o
+#   - se cambia de fuente o se detiene el productor (flush).
+
+import csv, time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.config import SESSIONS_CSV
+
+SESSION_GAP_S = 3.0
+SESSION_MAX_S = 300.0
+SESSION_COLUMNS = ["first_seen","last_seen","duration_s","cam_id","name","codigo","grado",
+                   "best_dist","frames","decision","quality","snapshot_path"]
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+class PresenceSession:
+    __slots__ = ("cam_id", "name", "decision", "first_seen", "last_seen", "frames",
+                 "best_dist", "quality", "snapshot_path", "snap_dist")
+
+    def __init__(self, cam_id: str, name: str, decision: str, ts: float):
+        self.cam_id, self.name, self.decision = cam_id, name, decision
+        self.first_seen = self.last_seen = ts
+        self.frames = 0
+        self.best_dist = float("inf")
+        self.quality = ""
+        self.snapshot_path = ""
+        self.snap_dist = float("inf")
+
+    def add(self, ts: float, dist: float, quality: str = "", snapshot_path: str = ""):
+        self.last_seen = ts
+        self.frames += 1
+        if dist < self.best_dist:
+            self.best_dist, self.quality = dist, quality
+        # Me quedo con el snapshot del frame más parecido a la galería
+        if snapshot_path and dist < self.snap_dist:
+            self.snapshot_path, self.snap_dist = snapshot_path, dist
+
+    @property
+    def duration_s(self) -> float:
+        return self.last_seen - self.first_seen
+
+    def as_row(self, nombre: Optional[str] = None, codigo: str = "", grado: str = "") -> List:
+        return [datetime.fromtimestamp(self.first_seen).strftime(TS_FORMAT),
+                datetime.fromtimestamp(self.last_seen).strftime(TS_FORMAT),
+                f"{self.duration_s:.1f}", self.cam_id, nombre or self.name, codigo, grado,
+                f"{self.best_dist:.2f}", self.frames, self.decision, self.quality, self.snapshot_path]
+
+class SessionAggregator:
+    """
+    Una sesión abierta por (cámara, identidad, decisión). `on_close` recibe cada
+    PresenceSession al cerrarse. Se usa desde un solo hilo (el bucle de visión).
+    """
+    def __init__(self, on_close: Callable[[PresenceSession], None],
+                 gap_s: float = SESSION_GAP_S, max_s: float = SESSION_MAX_S):
+        self.on_close = on_close
+        self.gap_s, self.max_s = gap_s, max_s
+        self.open: Dict[Tuple[str, str, str], PresenceSession] = {}
+        self.closed_total = 0
+        self.observed_total = 0
+
+    def observe(self, cam_id: str, name: str, decision: str, dist: float, quality: str = "",
+                snapshot_path: str = "", ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        key = (str(cam_id), name, decision)
+        s = self.open.get(key)
+        if s is not None and (ts - s.last_seen > self.gap_s or ts - s.first_seen > self.max_s):
+            self._close(key)
+            s = None
+        if s is None:
+            s = self.open[key] = PresenceSession(str(cam_id), name, decision, ts)
+        s.add(ts, dist, quality, snapshot_path)
+        self.observed_total += 1
+
+    def tick(self, now: Optional[float] = None) -> int:
+        """Cierra las sesiones vencidas. Llamar en cada frame procesado (haya caras o no)."""
+        now = time.time() if now is None else now
+        vencidas = [k for k, s in self.open.items()
+                    if now - s.last_seen > self.gap_s or now - s.first_seen > self.max_s]
+        for k in vencidas:
+            self._close(k)
+        return len(vencidas)
+
+    def flush(self) -> int:
+        n = len(self.open)
+        for k in list(self.open):
+            self._close(k)
+        return n
+
+    def _close(self, key):
+        s = self.open.pop(key)
+        self.closed_total += 1
+        try: self.on_close(s)
+        except Exception as e: print(f"[WARN] No pude registrar la sesión {s.name}@{s.cam_id}: {e}")
+
+def ensure_sessions_header(path=SESSIONS_CSV):
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow(SESSION_COLUMNS)
+
+def append_session(session: PresenceSession, nombre: Optional[str] = None, codigo: str = "",
+                   grado: str = "", path=SESSIONS_CSV):
+    ensure_sessions_header(path)
+    with path.open("a", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(session.as_row(nombre, codigo, grado))
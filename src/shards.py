@@ -0,0 +1,113 @@
+# src/shards.py
+# Galería partida por grupos de grado (sede / primaria / bachillerato ...) y alcance
+# por cámara. La cámara de la puerta de primaria solo compara contra primaria; si ahí
+# no hay identificación, se busca en el resto (respaldo) antes de dar DESCONOCIDO.
+# Menos encodings por cara y menos confusiones entre sedes.
+#
+# data/camaras.json (opcional; sin él, o sin la cámara, se busca en toda la galería):
+#   {
+#     "grupos":  {"primaria": ["1","2","3","4","5"], "bachillerato": ["6","7","8","9","10","11"]},
+#     "camaras": {"0": ["bachillerato"], "http://192.168.1.20:4747/mjpegfeed": ["primaria"]},
+#     "respaldo": true
+#   }
+# El grupo de un estudiante sale de la columna `grado` de estudiantes.csv/la base:
+# "9-2" -> nivel "9" -> el grupo que lo contenga en "grupos" (o el nivel mismo si
+# ningún grupo lo nombra). En "camaras" se pueden usar grupos o niveles sueltos.
+# La llave de la cámara es la misma que va en la columna cam_id de events.csv: el
+# índice de la cámara local ("0") o la URL tal cual si la fuente es una cámara IP.
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import DATA_DIR
+from src.gallery import Gallery
+
+CAMERAS_JSON = DATA_DIR / "camaras.json"
+SIN_GRUPO = "sin_grupo"  # Estudiantes de la galería sin grado conocido
+
+def nivel(grado: str) -> str:
+    """'9-2' -> '9'; '' -> ''."""
+    return str(grado or "").split("-")[0].strip()
+
+class ShardConfig:
+    def __init__(self, grupos: Optional[Dict[str, List[str]]] = None,
+                 camaras: Optional[Dict[str, List[str]]] = None, respaldo: bool = True):
+        self.grupos = {g: [str(n) for n in niveles] for g, niveles in (grupos or {}).items()}
+        self.camaras = {str(c): [str(x) for x in alc] for c, alc in (camaras or {}).items()}
+        self.respaldo = bool(respaldo)
+        self._grupo_de_nivel = {n: g for g, niveles in self.grupos.items() for n in niveles}
+
+    @classmethod
+    def load(cls, path: Path = CAMERAS_JSON) -> "ShardConfig":
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            return cls(data.get("grupos"), data.get("camaras"), data.get("respaldo", True))
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"[WARN] {path} no es válido, busco en toda la galería: {e}")
+            return cls()
+
+    def grupo(self, grado: str) -> str:
+        n = nivel(grado)
+        if not n: return SIN_GRUPO
+        return self._grupo_de_nivel.get(n, n)
+
+    def alcance(self, cam) -> Optional[Tuple[str, ...]]:
+        """Grupos que busca la cámara, o None si busca en toda la galería."""
+        if cam is None: return None
+        alc = self.camaras.get(str(cam))
+        if not alc: return None
+        return tuple(sorted({self._grupo_de_nivel.get(x, x) for x in alc}))
+
+def _subset(g: Gallery, rows: np.ndarray) -> Gallery:
+    names = [g.names[int(i)] for i in rows]
+    protos, proto_names = None, None
+    if g.prototypes is not None:
+        keep = set(names)
+        sel = [i for i, n in enumerate(g.proto_names) if n in keep]
+        protos, proto_names = g.prototypes[sel], [g.proto_names[i] for i in sel]
+    return Gallery(np.asarray(g.encodings[rows]), names, path=g.path, mtime=g.mtime,
+                   prototypes=protos, proto_names=proto_names, encoder=g.encoder)
+
+class ShardedGallery:
+    """
+    Las sub-galerías de una galería ya cargada. Se arma de nuevo cuando la galería
+    se recarga; cada alcance (tupla de grupos) se construye una vez y queda en caché.
+    """
+    def __init__(self, gallery: Gallery, grado_por_codigo: Dict[str, str], cfg: ShardConfig):
+        self.gallery = gallery
+        self.cfg = cfg
+        grupos: Dict[str, List[int]] = {}
+        for i, n in enumerate(gallery.names):
+            codigo = n.split("_")[0] if "_" in n else n
+            grupos.setdefault(cfg.grupo(grado_por_codigo.get(codigo, "")), []).append(i)
+        self.rows = {k: np.asarray(v, dtype=np.intp) for k, v in grupos.items()}
+        self._cache: Dict[Tuple[str, ...], Tuple[Gallery, Optional[Gallery]]] = {}
+
+    def sizes(self) -> Dict[str, int]:
+        return {k: len(v) for k, v in sorted(self.rows.items())}
+
+    def para(self, cam) -> Tuple[Gallery, Optional[Gallery]]:
+        """(galería de la cámara, respaldo con los demás grupos o None)."""
+        alc = self.cfg.alcance(cam)
+        if alc is None:
+            return self.gallery, None
+        if alc not in self._cache:
+            dentro = [self.rows[k] for k in alc if k in self.rows]
+            fuera = [v for k, v in self.rows.items() if k not in alc]
+            rows_in = np.sort(np.concatenate(dentro)) if dentro else np.empty((0,), dtype=np.intp)
+            scoped = _subset(self.gallery, rows_in)
+            respaldo = None
+            if self.cfg.respaldo and fuera:
+                # Con índice ANN o galería cuantizada, el respaldo es la galería entera (ya indexada)
+                big = self.gallery.ann is not None or self.gallery.quant is not None
+                respaldo = self.gallery if big else _subset(self.gallery, np.sort(np.concatenate(fuera)))
+            self._cache[alc] = (scoped, respaldo)
+            print(f"[OK] Cámara {cam}: grupos {list(alc)} ({len(scoped)} encodings)"
+                  f" | respaldo: {len(respaldo) if respaldo is not None else 'no'}")
+        return self._cache[alc]
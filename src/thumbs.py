@@ -0,0 +1,103 @@
+# src/thumbs.py
+# Miniaturas de los snapshots para el panel.
+# El productor genera la miniatura al guardar el snapshot (con OpenCV); el panel,
+# si no la encuentra, la genera una sola vez a partir del original (con PIL).
+# En memoria quedan los bytes JPEG de las últimas N, así el timeline nunca
+# vuelve a tocar las fotos de tamaño completo.
+
+import io, threading, time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from src.config import THUMB_DIR
+
+THUMB_SIZE = (160, 160)  # Caja máxima (se respeta la proporción)
+THUMB_QUALITY = 80
+MISS_TTL_S = 10.0        # Un "no hay foto" se vuelve a buscar pasado este tiempo (el snapshot puede llegar después)
+
+def thumb_path_for(snapshot_path) -> Path:
+    """Ruta de la miniatura de un snapshot: data/thumbs/<nombre>.jpg"""
+    return THUMB_DIR / (Path(str(snapshot_path).replace("\\", "/")).stem + ".jpg")
+
+def write_thumbnail_cv2(face_bgr, snapshot_path) -> Optional[Path]:
+    """Versión para el productor (ya tiene la imagen en memoria, no la relee del disco)."""
+    import cv2
+    h, w = face_bgr.shape[:2]
+    if h == 0 or w == 0: return None
+    scale = min(THUMB_SIZE[0] / w, THUMB_SIZE[1] / h, 1.0)
+    small = cv2.resize(face_bgr, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    dst = thumb_path_for(snapshot_path)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    ok = cv2.imwrite(str(dst), small, [cv2.IMWRITE_JPEG_QUALITY, THUMB_QUALITY])
+    return dst if ok else None
+
+def _make_thumbnail_pil(src: Path, dst: Path) -> bytes:
+    from PIL import Image
+    with Image.open(src) as img:
+        img = img.convert("RGB")
+        img.thumbnail(THUMB_SIZE)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=THUMB_QUALITY)
+    data = buf.getvalue()
+    try:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(dst.name + ".tmp")
+        tmp.write_bytes(data)
+        tmp.replace(dst)
+    except OSError:
+        pass  # Si no puedo escribir en disco, al menos queda en memoria
+    return data
+
+class ThumbnailService:
+    """
+    Memoria (LRU) -> disco (data/thumbs) -> generar desde el original.
+    También cachea los "no hay foto" por MISS_TTL_S para no repetir el stat() en
+    cada refresco. Es compartido por todas las sesiones del panel: no guarda nada
+    de una sesión (el mapa event_id -> snapshot lo arma y lo pasa cada llamador).
+    """
+    def __init__(self, max_items: int = 256, miss_ttl: float = MISS_TTL_S):
+        self._lru: "OrderedDict[str, Tuple[Optional[bytes], float]]" = OrderedDict()
+        self._max = max_items
+        self._miss_ttl = miss_ttl
+        self._lock = threading.Lock()
+
+    def _put(self, key: str, value: Optional[bytes]):
+        with self._lock:
+            self._lru[key] = (value, time.monotonic())
+            self._lru.move_to_end(key)
+            while len(self._lru) > self._max:
+                self._lru.popitem(last=False)
+
+    def get(self, snapshot_path) -> Optional[bytes]:
+        if not isinstance(snapshot_path, str) or not snapshot_path:
+            return None
+        with self._lock:
+            hit = self._lru.get(snapshot_path)
+            if hit is not None:
+                data, t = hit
+                if data is not None or time.monotonic() - t < self._miss_ttl:
+                    self._lru.move_to_end(snapshot_path)
+                    return data
+        data = None
+        dst = thumb_path_for(snapshot_path)
+        try:
+            data = dst.read_bytes()
+        except OSError:
+            src = Path(snapshot_path)
+            if src.exists():
+                try: data = _make_thumbnail_pil(src, dst)
+                except Exception: data = None
+        self._put(snapshot_path, data)
+        return data
+
+    @staticmethod
+    def index(df) -> Dict[int, str]:
+        """event_id -> snapshot_path de las filas que traen foto."""
+        if df is None or df.empty or "event_id" not in df.columns: return {}
+        with_snap = df[df["snapshot_path"].fillna("").astype(str).str.len() > 0]
+        return {int(eid): str(snap) for eid, snap in zip(with_snap["event_id"], with_snap["snapshot_path"])}
+
+    def by_event(self, events: Dict[int, str], event_id) -> Optional[bytes]:
+        snap = events.get(int(event_id))
+        return self.get(snap) if snap else None
@@ -5,6 +5,8 @@ import face_recognition
 import pickle
 import numpy as np
 
+from src.gallery import ENCODER_MODEL
+
 # Rutas base
 DATASET_DIR = os.path.join("data", "dataset")
 MODELS_DIR = "models"
@@ -43,14 +45,14 @@ for student_folder in os.listdir(DATASET_DIR):
             continue
 
         # Obtener el embedding (vector del rostro)
-        encoding = face_recognition.face_encodings(image, face_locations)[0]
+        encoding = face_recognition.face_encodings(image, face_locations, model=ENCODER_MODEL)[0]
         known_encodings.append(encoding)
         known_names.append(f"{student_id}_{student_name}")
 
 print("\nGuardando modelo entrenado...")
 
 # Guardar embeddings
-data = {"encodings": known_encodings, "names": known_names}
+data = {"encodings": known_encodings, "names": known_names, "encoder": ENCODER_MODEL}
 with open(EMBEDDINGS_FILE, "wb") as f:
     pickle.dump(data, f)
 
@@ -4,7 +4,9 @@ import cv2
 import pickle
 import numpy as np
 import face_recognition
-from mtcnn.mtcnn import MTCNN
+
+from src.detectors import get_detector
+from src.gallery import ENCODER_MODEL
 
 # === CONFIGURACIONES ===
 DATASET_DIR = os.path.join("data", "dataset")
@@ -13,8 +15,8 @@ os.makedirs(MODELS_DIR, exist_ok=True)
 
 EMBEDDINGS_FILE = os.path.join(MODELS_DIR, "embeddings_mtcnn.pkl")
 
-# Inicializamos el detector MTCNN
-detector = MTCNN()
+# Inicializamos el detector (MTCNN por defecto; TRAIN_DETECTOR=hog|cnn|cascade para otro)
+detector = get_detector(os.getenv("TRAIN_DETECTOR", "mtcnn"))
 
 known_encodings = []
 known_names = []
@@ -45,18 +47,14 @@ for student_folder in os.listdir(DATASET_DIR):
         image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
 
         # === DETECCIÓN CON MTCNN ===
-        faces = detector.detect_faces(image)
-        if len(faces) == 0:
+        boxes = detector.detect(image)
+        if len(boxes) == 0:
             print(f"No se detectó rostro en: {image_file}")
             continue
 
-        for face in faces:
-            x, y, w, h = face['box']
-            x, y = max(0, x), max(0, y)
-            top, right, bottom, left = y, x + w, y + h, x
-
+        for top, right, bottom, left in boxes:
             # Generar encoding usando face_recognition
-            encodings = face_recognition.face_encodings(image, [(top, right, bottom, left)])
+            encodings = face_recognition.face_encodings(image, [(top, right, bottom, left)], model=ENCODER_MODEL)
             if len(encodings) == 0:
                 print(f" No se pudo generar encoding en: {image_file}")
                 continue
@@ -67,9 +65,19 @@ for student_folder in os.listdir(DATASET_DIR):
 print("\n Guardando modelo entrenado...")
 
 # === GUARDAR EMBEDDINGS ===
-data = {"encodings": known_encodings, "names": known_names}
-with open(EMBEDDINGS_FILE, "wb") as f:
+# Escribo a un temporal y reemplazo: el productor en vivo vigila este archivo
+# y nunca debe leer un pickle a medio escribir.
+data = {"encodings": known_encodings, "names": known_names, "encoder": ENCODER_MODEL}
+
+# Índice ANN para galerías grandes (con pocas fotos no se construye: búsqueda exacta).
+# Va ANTES del pickle: cuando el productor recarga, el índice nuevo ya está.
+from src.ann import build_for
+build_for(EMBEDDINGS_FILE, known_encodings, known_names)
+
+tmp_file = EMBEDDINGS_FILE + ".tmp"
+with open(tmp_file, "wb") as f:
     pickle.dump(data, f)
+os.replace(tmp_file, EMBEDDINGS_FILE)
 def main():
     # ... parse args
     global OUT_IMG_DIR, OUT_CSV_PATH
@@ -8,8 +8,9 @@ import numpy as np
 from pathlib import Path
 from datetime import datetime
 import face_recognition
-# Si prefieres MTCNN, activa USE_MTCNN=True
-# from mtcnn.mtcnn import MTCNN
+from src.detectors import get_detector
+from src.gallery import ENCODER_MODEL
+# Si prefieres MTCNN, activa USE_MTCNN=True (o elige otro en src/detectors.py)
 USE_MTCNN = False  # face_recognition.face_locations por defecto
 
 # ---------------- Configuración por defecto ----------------
@@ -59,21 +60,8 @@ def draw_and_label(image, box, label):
                 cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
 
 def detect_boxes(rgb_image):
-    if USE_MTCNN:
-        from mtcnn.mtcnn import MTCNN
-        detector = MTCNN()
-        faces = detector.detect_faces(rgb_image)
-        boxes = []
-        for f in faces:
-            x, y, w, h = f["box"]
-            top = max(0, y)
-            left = max(0, x)
-            bottom = top + max(0, h)
-            right = left + max(0, w)
-            boxes.append((top, right, bottom, left))
-        return boxes
-    else:
-        return face_recognition.face_locations(rgb_image, model="hog")
+    # El detector se crea una sola vez (antes se construía un MTCNN por imagen)
+    return get_detector("mtcnn" if USE_MTCNN else "hog").detect(rgb_image)
 
 def process_image(img_path: Path, known_encodings, known_names, students_info, threshold: float):
     image = cv2.imread(str(img_path))
@@ -82,7 +70,7 @@ def process_image(img_path: Path, known_encodings, known_names, students_info, t
     rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
 
     boxes = detect_boxes(rgb)
-    encs = face_recognition.face_encodings(rgb, boxes)
+    encs = face_recognition.face_encodings(rgb, boxes, model=ENCODER_MODEL)
 
     results_for_image = []
     for box, enc in zip(boxes, encs):
@@ -0,0 +1,198 @@
+# src/vision_pool.py
+# Pool de procesos para detección + landmarks + encoding (lo que más CPU gasta).
+# Un solo proceso de Python usa un núcleo; con N workers la PC de la puerta puede
+# analizar ~N frames a la vez.
+#
+# Los frames NO se serializan: el bucle copia cada frame a una ranura de memoria
+# compartida (multiprocessing.shared_memory) y al worker solo le manda
+# (seq, ranura, forma). El worker devuelve algo chico: cajas, encodings (128 float32
+# por cara), los 68 puntos y los tiempos por etapa.
+# Los resultados se entregan EN ORDEN de seq (buffer de reordenamiento) para que la
+# votación y el parpadeo vean los frames en la secuencia real. La ranura queda
+# reservada hasta que el bucle la libera, así el bucle puede recortar caras y
+# guardar snapshots del mismo frame que se analizó.
+
+import multiprocessing as mp
+import queue, time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+RESULT_TIMEOUT_S = 2.0  # Un resultado que no llega en este tiempo se da por perdido
+RESPAWN_MIN_S = 1.0     # Un worker caído se relanza, como mucho una vez por segundo
+
+def _worker(in_q, out_q, slot_names: List[str], slot_bytes: int, detector: str, scale: float,
+            with_points: bool = True, current=None, idx: int = 0):
+    # Cada worker carga su propio dlib y detector
+    from src.detectors import get_detector
+    from src.preprocess import FramePreprocessor
+    import src.landmarks as lm
+
+    shms = [shared_memory.SharedMemory(name=n) for n in slot_names]
+    prep = FramePreprocessor(scale=scale)
+    det = get_detector(detector)
+    try:
+        while True:
+            job = in_q.get()
+            if job is None: break
+            seq, slot, shape = job
+            if current is not None: current[idx] = seq  # Si el proceso muere, el pool sabe qué frame tenía
+            try:
+                frame = np.ndarray(shape, dtype=np.uint8, buffer=shms[slot].buf)
+                t = {}
+                t0 = time.perf_counter(); rgb = prep(frame); t["resize"] = time.perf_counter() - t0
+                t0 = time.perf_counter(); locations = det.detect(rgb); t["detect"] = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                shapes = lm.shapes(rgb, locations)
+                points = [lm.points(s).astype(np.int16) for s in shapes] if with_points else []
+                t["landmarks"] = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                encodings = [e.astype(np.float32) for e in lm.descriptors(rgb, shapes)]
+                t["encode"] = time.perf_counter() - t0
+                res = {"locations": list(locations), "encodings": encodings, "points": points, "timings": t}
+            except Exception as e:  # Un frame malo no tumba al worker
+                res = {"error": f"{type(e).__name__}: {e}"}
+            out_q.put((seq, slot, res))
+            if current is not None: current[idx] = -1
+    finally:
+        for s in shms: s.close()
+
+class SharedFramePool:
+    """
+    Uso desde el bucle (un solo hilo):
+        if pool.submit(frame): ...            # False = sin ranura libre (se salta el frame)
+        for seq, frame_view, res in pool.ready():
+            ...                               # frame_view vive hasta release
+            pool.release(seq)
+    Si el worker falló con ese frame, res es {"error": "..."} (sin cajas ni encodings).
+    Un worker que muere se relanza; el frame que tenía vuelve como error.
+    """
+    def __init__(self, workers: int = 2, max_shape: Tuple[int, int, int] = (1080, 1920, 3),
+                 slots: Optional[int] = None, detector: str = "hog", scale: float = 0.25,
+                 with_points: bool = True):
+        self.workers = max(1, int(workers))
+        self.max_shape = max_shape
+        self.slot_bytes = int(np.prod(max_shape))
+        n_slots = slots or self.workers * 2
+        self._shms = [shared_memory.SharedMemory(create=True, size=self.slot_bytes) for _ in range(n_slots)]
+        self._free = list(range(n_slots))
+        self._in = mp.Queue()
+        self._out = mp.Queue()
+        self._args = (detector, scale, with_points)  # with_points=False: sin los 68 puntos en el resultado
+        self._current = mp.Array("q", [-1] * self.workers, lock=False)  # seq en proceso por worker
+        self._procs = [self._spawn(i) for i in range(self.workers)]
+        self._spawned_at = [time.monotonic()] * self.workers
+        self._seq = 0
+        self._next = 0
+        self._pending: Dict[int, Tuple[int, Tuple[int, ...], float]] = {}   # seq -> (slot, shape, t_envío)
+        self._done: Dict[int, Dict] = {}
+        self._held: Dict[int, int] = {}                                     # seq entregado -> slot
+        self._lost: Dict[int, int] = {}                                     # seq vencido -> slot
+        self.stats = {"submitted": 0, "skipped": 0, "lost": 0, "oversize": 0, "errors": 0, "respawned": 0}
+
+    def _spawn(self, i: int) -> mp.Process:
+        p = mp.Process(target=_worker, name=f"vision-worker-{i}", daemon=True,
+                       args=(self._in, self._out, [s.name for s in self._shms], self.slot_bytes,
+                             *self._args, self._current, i))
+        p.start()
+        return p
+
+    def _check_workers(self):
+        """Relanza los workers muertos y resuelve el frame que cada uno tenía."""
+        for i, p in enumerate(self._procs):
+            if p.is_alive(): continue
+            seq = self._current[i]
+            self._current[i] = -1
+            if seq in self._pending and seq not in self._done:
+                self._done[seq] = {"error": f"worker {p.name} terminó (exitcode {p.exitcode})"}
+            elif seq in self._lost:
+                self._free.append(self._lost.pop(seq))  # Su resultado ya no va a llegar
+            if time.monotonic() - self._spawned_at[i] < RESPAWN_MIN_S: continue
+            print(f"[WARN] {p.name} terminó (exitcode {p.exitcode}): lo relanzo")
+            self._procs[i] = self._spawn(i)
+            self._spawned_at[i] = time.monotonic()
+            self.stats["respawned"] += 1
+
+    def submit(self, frame: np.ndarray) -> bool:
+        if frame.nbytes > self.slot_bytes:
+            self.stats["oversize"] += 1
+            return False
+        if not self._free:
+            self.stats["skipped"] += 1
+            return False
+        slot = self._free.pop()
+        dst = np.ndarray(frame.shape, dtype=np.uint8, buffer=self._shms[slot].buf)
+        np.copyto(dst, frame)  # La única copia del frame
+        seq = self._seq; self._seq += 1
+        self._pending[seq] = (slot, frame.shape, time.monotonic())
+        self._in.put((seq, slot, frame.shape))
+        self.stats["submitted"] += 1
+        return True
+
+    def _collect(self):
+        while True:
+            try: seq, slot, res = self._out.get_nowait()
+            except queue.Empty: return
+            if "error" in res: self.stats["errors"] += 1
+            if seq in self._pending: self._done[seq] = res
+            elif seq in self._lost: self._free.append(self._lost.pop(seq))  # Llegó tarde: la ranura ya se puede usar
+
+    def ready(self) -> List[Tuple[int, np.ndarray, Dict]]:
+        """Resultados listos, en orden de seq."""
+        self._collect()
+        self._check_workers()
+        out = []
+        while self._next < self._seq:
+            seq = self._next
+            if seq not in self._pending:
+                self._next += 1; continue
+            slot, shape, t_sent = self._pending[seq]
+            if seq in self._done:
+                res = self._done.pop(seq)
+                del self._pending[seq]
+                self._held[seq] = slot
+                out.append((seq, np.ndarray(shape, dtype=np.uint8, buffer=self._shms[slot].buf), res))
+                self._next += 1
+            elif time.monotonic() - t_sent > RESULT_TIMEOUT_S:
+                # Worker atascado: no frenar a los siguientes. La ranura no se reutiliza hasta
+                # que llegue su resultado o muera el worker (todavía la puede estar leyendo).
+                del self._pending[seq]
+                self._lost[seq] = slot
+                self.stats["lost"] += 1
+                self._next += 1
+            else:
+                break
+        return out
+
+    def release(self, seq: int):
+        slot = self._held.pop(seq, None)
+        if slot is not None: self._free.append(slot)
+
+    @property
+    def last_seq(self) -> int:
+        """seq del último frame aceptado por submit (-1 si ninguno)."""
+        return self._seq - 1
+
+    def waiting(self, seq: int) -> bool:
+        """True si el resultado de seq todavía puede salir de ready() (no se entregó ni se perdió)."""
+        return seq in self._pending
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def alive(self) -> int:
+        return sum(p.is_alive() for p in self._procs)
+
+    def close(self):
+        for _ in self._procs:
+            try: self._in.put_nowait(None)
+            except Exception: pass
+        for p in self._procs:
+            p.join(timeout=2.0)
+            if p.is_alive(): p.terminate()
+        for s in self._shms:
+            try: s.close(); s.unlink()
+            except Exception: pass
+        self._shms = []
@@ -0,0 +1,78 @@
+# Prueba del índice de events.csv con varios procesos escribiendo el mismo .idx
+# (worker, panel y reporter tienen cada uno su EventIndex).
+import csv
+
+from src.event_index import EventIndex
+
+COLUMNS = ["timestamp", "cam_id", "name", "codigo", "grado", "distancia", "decision", "quality", "snapshot_path"]
+
+def _append(path, n, start=0):
+    nuevo = not path.exists()
+    with path.open("a", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        if nuevo: w.writerow(COLUMNS)
+        for i in range(start, start + n):
+            w.writerow([f"2025-11-14 07:{i // 60:02d}:{i % 60:02d}", "0", f"S{i}", "", "", "0.4", "ok", "1", ""])
+
+def test_dos_escritores_no_duplican_bloques(tmp_path):
+    events = tmp_path / "events.csv"
+    _append(events, 120)
+    a, b = EventIndex(events, every=32), EventIndex(events, every=32)
+    assert a.update() == 3
+    assert b.update() == 0  # Ya estaban indexados por a
+
+    _append(events, 60, start=120)
+    assert b.update() == 2
+    assert a.update() == 0
+
+    c = EventIndex(events, every=32)
+    assert len(c.blocks) == 5
+    rows = list(c.query("2025-11-14 07:00", "2025-11-14 07:59", refresh=False))
+    assert len(rows) == 180
+    assert len({r["name"] for r in rows}) == 180
+
+def test_idx_con_bloques_repetidos_se_ignoran(tmp_path):
+    events = tmp_path / "events.csv"
+    _append(events, 120)
+    a = EventIndex(events, every=32)
+    a.update()
+    linea = a.path.read_text(encoding="utf-8").splitlines()[0]
+    with a.path.open("a", encoding="utf-8") as f:
+        f.write(linea + "\n")  # Como lo dejaba la versión anterior con dos escritores
+    c = EventIndex(events, every=32)
+    assert len(c.blocks) == 3
+    assert len(list(c.query("2025-11-14 07:00", "2025-11-14 07:59"))) == 120
+
+def test_ultima_linea_rota_se_reescribe(tmp_path):
+    events = tmp_path / "events.csv"
+    _append(events, 120)
+    a = EventIndex(events, every=32)
+    assert a.update() == 3
+    texto = a.path.read_text(encoding="utf-8")
+    lineas = texto.splitlines()
+    # Un proceso murió a mitad de escribir el último bloque
+    a.path.write_text("\n".join(lineas[:-1]) + "\n" + lineas[-1][:12], encoding="utf-8")
+
+    c = EventIndex(events, every=32)
+    assert len(c.blocks) == 2  # Los bloques buenos siguen visibles
+    assert c.update() == 1     # El roto se vuelve a indexar...
+    assert c.path.read_text(encoding="utf-8") == texto  # ...y el .idx queda como antes
+
+    _append(events, 60, start=120)
+    assert c.update() == 2
+    assert c.update() == 0
+    assert EventIndex(events, every=32).update() == 0  # Nada se vuelve a agregar en cada update
+    assert len(c.path.read_text(encoding="utf-8").splitlines()) == 5
+    assert len(list(c.query("2025-11-14 07:00", "2025-11-14 07:59"))) == 180
+
+def test_linea_basura_en_el_medio_no_esconde_lo_que_sigue(tmp_path):
+    events = tmp_path / "events.csv"
+    _append(events, 120)
+    a = EventIndex(events, every=32)
+    a.update()
+    lineas = a.path.read_text(encoding="utf-8").splitlines()
+    a.path.write_text("\n".join([lineas[0], "\x00\x00basura", *lineas[1:]]) + "\n", encoding="utf-8")
+    c = EventIndex(events, every=32)
+    assert len(c.blocks) == 3
+    assert c.update() == 0
+    assert c.path.read_text(encoding="utf-8").splitlines() == lineas
@@ -0,0 +1,66 @@
+# Cliente MJPEG (src/mjpeg.py) contra el servidor de prueba serve_fake en un puerto libre
+import asyncio, time
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("numpy")
+from src.mjpeg import MJPEGCapture, MJPEGHub, serve_fake
+
+@pytest.fixture
+def hub():
+    h = MJPEGHub()
+    h.servers = []
+    yield h
+    async def _cerrar():
+        await h._cancelar()
+        for srv in h.servers: srv.close()
+        await asyncio.sleep(0.2)  # Los handlers del servidor terminan al perder al cliente
+    asyncio.run_coroutine_threadsafe(_cerrar(), h.loop).result(timeout=5)
+    h.stop()
+
+def _url(hub, **kw) -> str:
+    server = asyncio.run_coroutine_threadsafe(serve_fake(0, **kw), hub.loop).result(timeout=5)
+    hub.servers.append(server)
+    return f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/mjpegfeed"
+
+@pytest.mark.parametrize("with_length", [True, False])
+def test_frames_con_y_sin_content_length(hub, with_length):
+    s = hub.add(_url(hub, fps=50, with_length=with_length), "cam")
+    assert s.wait_new(0, 5), s.last_error
+    seq, frame = s.latest()
+    assert frame is not None and frame.shape == (480, 640, 3)
+    assert s.wait_new(seq, 5)  # Siguen llegando partes
+    assert s.stats["errors"] == 0
+
+def test_solo_el_ultimo_y_solo_se_decodifica_lo_leido(hub):
+    cap = MJPEGCapture(_url(hub, fps=100), hub=hub)
+    ok, _ = cap.read()
+    assert ok
+    time.sleep(0.5)  # Llegan muchas partes que nadie lee
+    ok, _ = cap.read()
+    assert ok
+    st = cap.stream.stats
+    assert st["parts"] > 10
+    assert st["decoded"] == 2  # Las partes del medio nunca pasaron por imdecode
+    assert cap._last > 2       # El segundo read saltó directo a la parte más nueva
+    cap.release()
+
+def test_reconecta_cuando_el_servidor_corta(hub):
+    s = hub.add(_url(hub, fps=50, drop_after=3), "cam")
+    assert s.wait_new(3, 10), s.last_error  # Más de 3 partes = hubo una segunda conexión
+    assert s.stats["reconnects"] >= 1
+
+def test_respuesta_no_multipart_falla_en_el_acto(hub):
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: video/mp4\r\n\r\n" + b"\0" * 64)
+        await writer.drain()
+        writer.close()
+    server = asyncio.run_coroutine_threadsafe(asyncio.start_server(handle, "127.0.0.1", 0), hub.loop).result(5)
+    hub.servers.append(server)
+    s = hub.add(f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/video.mp4", "mp4")
+    t0 = time.monotonic()
+    assert not s.wait_new(0, 5)
+    assert time.monotonic() - t0 < 2
+    assert s.not_mjpeg
@@ -4,7 +4,8 @@ import pickle
 import numpy as np
 from pathlib import Path
 from datetime import datetime
-from mtcnn.mtcnn import MTCNN
+from src.detectors import get_detector
+from src.gallery import ENCODER_MODEL
 import csv
 
 # === Configuración ===
@@ -55,20 +56,12 @@ rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
 
 # === Detección de rostro ===
 print(" Detectando rostros...")
-detector = MTCNN()
-faces = detector.detect_faces(rgb_image)
-
-boxes_trbl = []
-for face in faces:
-    x, y, w, h = face['box']
-    top = max(0, y); left = max(0, x)
-    bottom = top + max(0, h); right = left + max(0, w)
-    boxes_trbl.append((top, right, bottom, left))
+boxes_trbl = get_detector("mtcnn").detect(rgb_image)
 
 if len(boxes_trbl) == 0:
     print("No se detectaron rostros en la imagen.")
 else:
-    encodings = face_recognition.face_encodings(rgb_image, boxes_trbl)
+    encodings = face_recognition.face_encodings(rgb_image, boxes_trbl, model=ENCODER_MODEL)
     for (top, right, bottom, left), encoding in zip(boxes_trbl, encodings):
         if encoding is None or encoding.shape[0] == 0:
             print("No se pudo obtener encoding del rostro detectado.")
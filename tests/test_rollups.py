@@ -0,0 +1,75 @@
+# Agregados incrementales de events.csv (src/rollups.py)
+import csv, json
+
+from src.rollups import BURST_MIN, Rollups
+
+COLUMNS = ["timestamp", "cam_id", "name", "codigo", "grado", "distancia", "decision", "quality", "snapshot_path"]
+
+def _append(path, filas):
+    nuevo = not path.exists()
+    with path.open("a", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        if nuevo: w.writerow(COLUMNS)
+        for ts, cam, name, decision in filas:
+            w.writerow([ts, cam, name, "", "", "0.4", decision, "1", ""])
+
+def test_agregados_por_dia_y_hora(tmp_path):
+    events = tmp_path / "events.csv"
+    _append(events, [("2025-11-14 07:00:01", "0", "S1", "accepted"),
+                     ("2025-11-14 07:30:00", "0", "S1", "accepted"),
+                     ("2025-11-14 08:05:00", "1", "S2", "accepted"),
+                     ("2025-11-14 08:06:00", "1", "DESCONOCIDO", "rejected"),
+                     ("2025-11-15 07:00:00", "0", "S3", "uncertain")])
+    r = Rollups(tmp_path / "rollups.json", events)
+    assert r.update() == 5
+    d = r.day("2025-11-14")
+    assert d["total"] == 4 and d["distinct"] == 2 and d["identities"] == ["S1", "S2"]
+    assert d["decisions"] == {"accepted": 3, "rejected": 1}
+    assert d["cams"] == {"0": 2, "1": 2}
+    assert d["hours"]["07"]["total"] == 2 and d["hours"]["08"]["cams"] == {"1": 2}
+    assert (d["first_ts"], d["last_ts"]) == ("2025-11-14 07:00:01", "2025-11-14 08:06:00")
+    assert r.day("2025-11-15")["distinct"] == 0  # 'uncertain' no cuenta como identidad
+    assert r.day("2025-11-16") is None
+    assert [x["date"] for x in r.days(start="2025-11-15")] == ["2025-11-15"]
+
+def test_solo_lee_lo_nuevo_y_persiste(tmp_path):
+    events, out = tmp_path / "events.csv", tmp_path / "rollups.json"
+    _append(events, [("2025-11-14 07:00:00", "0", "S1", "accepted")])
+    assert Rollups(out, events).update() == 1
+
+    _append(events, [("2025-11-14 07:01:00", "0", "S2", "accepted")])
+    with events.open("a", encoding="utf-8") as f:
+        f.write("2025-11-14 07:02:00,0,S3")  # Línea a medio escribir: se deja para después
+    r = Rollups(out, events)
+    assert r.update() == 1
+    assert r.update() == 0
+    assert r.day("2025-11-14")["identities"] == ["S1", "S2"]
+    assert json.loads(out.read_text(encoding="utf-8"))["offset"] < events.stat().st_size
+
+    with events.open("a", encoding="utf-8") as f:
+        f.write(",,,0.4,accepted,1,\n")
+    r = Rollups(out, events)
+    assert r.update() == 1
+    assert r.day("2025-11-14")["total"] == 3 and r.day("2025-11-14")["distinct"] == 3
+
+def test_csv_achicado_reconstruye(tmp_path):
+    events, out = tmp_path / "events.csv", tmp_path / "rollups.json"
+    _append(events, [(f"2025-11-14 07:00:{i:02d}", "0", f"S{i}", "accepted") for i in range(10)])
+    Rollups(out, events).update()
+    events.unlink()  # Rotado
+    _append(events, [("2025-11-20 09:00:00", "0", "S1", "accepted")])
+    r = Rollups(out, events)
+    assert r.update() == 1
+    assert [x["date"] for x in r.days()] == ["2025-11-20"]
+
+def test_rafagas_de_desconocidos(tmp_path):
+    events = tmp_path / "events.csv"
+    filas = [(f"2025-11-14 07:00:{i * 5:02d}", "0", "DESCONOCIDO", "rejected") for i in range(BURST_MIN + 2)]
+    filas += [("2025-11-14 07:10:00", "0", "DESCONOCIDO", "rejected")]  # Pasó BURST_GAP_S: racha nueva
+    filas += [(f"2025-11-14 07:00:{i:02d}", "1", "DESCONOCIDO", "rejected") for i in range(BURST_MIN - 1)]
+    _append(events, filas)
+    r = Rollups(tmp_path / "rollups.json", events)
+    r.update()
+    d = r.day("2025-11-14")
+    assert d["unknown_bursts"] == 1  # Una por racha, no una por fila; la cámara 1 no llegó al mínimo
+    assert d["hours"]["07"]["unknown_bursts"] == 1
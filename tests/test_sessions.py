@@ -0,0 +1,79 @@
+# Sesiones de presencia (src/sessions.py): cuándo se cierra una sesión y qué queda escrito
+import csv
+
+from src.sessions import SessionAggregator, append_session
+
+def _agg(**kw):
+    cerradas = []
+    return SessionAggregator(on_close=cerradas.append, **kw), cerradas
+
+def test_detecciones_seguidas_son_una_sesion():
+    agg, cerradas = _agg(gap_s=3.0)
+    for i, d in enumerate([0.45, 0.30, 0.38]):
+        agg.observe("0", "S1", "accepted", d, quality=f"q{i}", snapshot_path=f"s{i}.jpg", ts=100.0 + i)
+    assert agg.tick(now=103.0) == 0  # Todavía dentro del hueco
+    assert cerradas == []
+    s = agg.open[("0", "S1", "accepted")]
+    assert (s.frames, s.best_dist, s.quality, s.snapshot_path) == (3, 0.30, "q1", "s1.jpg")
+    assert s.duration_s == 2.0
+
+def test_hueco_cierra_la_sesion():
+    agg, cerradas = _agg(gap_s=3.0)
+    agg.observe("0", "S1", "accepted", 0.4, ts=100.0)
+    agg.observe("0", "S1", "accepted", 0.4, ts=101.0)
+    assert agg.tick(now=104.5) == 1
+    assert [(s.name, s.frames) for s in cerradas] == [("S1", 2)]
+    assert not agg.open
+
+    # Volver después del hueco abre una sesión nueva (también sin pasar por tick)
+    agg.observe("0", "S1", "accepted", 0.4, ts=110.0)
+    agg.observe("0", "S1", "accepted", 0.4, ts=114.0)
+    assert len(cerradas) == 2 and cerradas[1].first_seen == 110.0
+    assert agg.open[("0", "S1", "accepted")].first_seen == 114.0
+
+def test_duracion_maxima_parte_la_sesion():
+    agg, cerradas = _agg(gap_s=3.0, max_s=10.0)
+    for t in range(0, 25):  # Un frame por segundo, nunca hay hueco
+        agg.observe("0", "S1", "accepted", 0.4, ts=1000.0 + t)
+    assert [s.frames for s in cerradas] == [11, 11]
+    assert all(s.duration_s <= 10.0 for s in cerradas)
+    assert agg.tick(now=1024.0) == 0
+    assert agg.closed_total == 2 and agg.observed_total == 25
+
+def test_tick_cierra_por_duracion_maxima_sin_hueco():
+    agg, cerradas = _agg(gap_s=60.0, max_s=10.0)
+    agg.observe("0", "S1", "accepted", 0.4, ts=0.0)
+    agg.observe("0", "S1", "accepted", 0.4, ts=9.0)
+    assert agg.tick(now=10.0) == 0
+    assert agg.tick(now=11.0) == 1  # Visto hace 2 s, pero la sesión ya pasó max_s
+    assert cerradas[0].frames == 2
+
+def test_camaras_y_decisiones_separadas():
+    agg, _ = _agg()
+    agg.observe("0", "S1", "accepted", 0.4, ts=1.0)
+    agg.observe(1, "S1", "accepted", 0.4, ts=1.0)
+    agg.observe("0", "S1", "uncertain", 0.55, ts=1.0)
+    assert set(agg.open) == {("0", "S1", "accepted"), ("1", "S1", "accepted"), ("0", "S1", "uncertain")}
+
+def test_flush_al_salir_escribe_las_abiertas(tmp_path):
+    path = tmp_path / "sessions.csv"
+    agg = SessionAggregator(on_close=lambda s: append_session(s, "Ana", "C1", "5A", path=path))
+    agg.observe("0", "S1", "accepted", 0.35, ts=1_700_000_000.0)
+    agg.observe("http://cam/video", "S2", "accepted", 0.40, ts=1_700_000_001.0)
+    assert agg.flush() == 2
+    assert not agg.open and agg.flush() == 0
+    with path.open(newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["cam_id"] for r in rows] == ["0", "http://cam/video"]
+    assert (rows[0]["name"], rows[0]["codigo"], rows[0]["grado"]) == ("Ana", "C1", "5A")
+    assert rows[0]["best_dist"] == "0.35" and rows[0]["frames"] == "1"
+
+def test_error_en_on_close_no_corta_el_flush(capsys):
+    def falla(s):
+        raise OSError("disco lleno")
+    agg = SessionAggregator(on_close=falla)
+    agg.observe("0", "S1", "accepted", 0.4, ts=1.0)
+    agg.observe("0", "S2", "accepted", 0.4, ts=1.0)
+    assert agg.flush() == 2
+    assert not agg.open
+    assert capsys.readouterr().out.count("[WARN]") == 2
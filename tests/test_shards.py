@@ -0,0 +1,44 @@
+# Búsqueda por cámara (src/shards.py) y decisión con respaldo (recognize.decidir_identidad)
+import pytest
+
+pytest.importorskip("numpy")
+from src.shards import ShardConfig
+
+class _Galeria:
+    """Lo mínimo de Gallery que usa decidir_identidad: len, names y nearest."""
+    def __init__(self, names, best=1.0, second=1.0):
+        self.names, self._best, self._second = list(names), best, second
+
+    def __len__(self):
+        return len(self.names)
+
+    def nearest(self, encoding):
+        return 0, self._best, self._second
+
+def test_alcance_por_url():
+    url = "http://192.168.1.20:4747/mjpegfeed"
+    cfg = ShardConfig(grupos={"primaria": ["1", "2"]}, camaras={url: ["primaria"], "0": ["9"]})
+    assert cfg.alcance(url) == ("primaria",)
+    assert cfg.alcance("0") == ("9",)
+    assert cfg.alcance("None") is None
+    assert cfg.alcance(None) is None
+
+@pytest.fixture
+def recognize():
+    pytest.importorskip("cv2")
+    from src import recognize
+    return recognize
+
+def test_shard_vacio_sin_respaldo(recognize):
+    name, dist, second = recognize.decidir_identidad([0.0], _Galeria([]))
+    assert name == "DESCONOCIDO"
+    assert dist == 1.0 and second == 1.0
+
+def test_shard_vacio_con_respaldo_desconocido(recognize):
+    fallback = _Galeria(["S1"], best=0.9, second=0.95)
+    name, dist, second = recognize.decidir_identidad([0.0], _Galeria([]), fallback)
+    assert (name, dist, second) == ("DESCONOCIDO", 0.9, 0.95)
+
+def test_shard_vacio_con_respaldo_identificado(recognize):
+    fallback = _Galeria(["S1"], best=0.2, second=0.9)
+    assert recognize.decidir_identidad([0.0], _Galeria([]), fallback) == ("S1", 0.2, 0.9)